@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+
+"""
+Streaming, parallel rendering of zoom animations.
+
+The zoom schedule is computed up front, frames are rendered in parallel by a
+pool of worker processes and handed to the encoder in order as soon as they
+are ready. Only a bounded window of frames is held in memory; the frames of
+the loop-back segment are spooled to a temporary file on disk and read back
+in reverse order at the end.
+
+  animate(mand, -0.7436, 0.1318, 'zoom.gif', n_frames=300)
+  animate(mand, -0.7436, 0.1318, 'zoom.mp4', fps=30)   # needs imageio-ffmpeg
+
+Long zooms can also be made of keyframes, one per 2x zoom step, the frames in
+between being scaled and blended from the two nearest keyframes:
+
+  animate_keyframes(mand, -0.7436, 0.1318, 'zoom.mp4', zoom=1e6, fps=30)
+"""
+
+import copy
+import math
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import imageio
+import numpy as np
+from PIL import Image
+
+# View rendered by the worker processes, set by _init_worker
+_worker_view = None
+
+
+def zoom_scales(n_frames):
+    """Zoom scale of each frame: gaussian shape, from 0% (s=1) to 30%
+    (s=0.7), so the zoom speed increases, then decreases"""
+    x = np.linspace(-1, 1, n_frames)
+    sig = 1/2
+    return 1 - np.exp(-np.power(x, 2.) / (2 * np.power(sig, 2.)))*.3
+
+
+def zoom_schedule(mand, x, y, n_frames=150):
+    """Coordinates of the frames of a soft zoom at (x, y)
+
+    Args:
+        mand: Mandelbrot
+            view of the first frame, left unmodified
+        x, y: float
+            point to zoom at
+        n_frames: int
+            number of frames
+
+    Returns:
+        list: coord of each frame, the same as successive calls of szoom_at
+    """
+    view = copy.copy(mand)
+    view.coord = list(mand.coord)
+    scales = zoom_scales(n_frames)
+    schedule = [list(view.coord)]
+    for i in range(1, n_frames):
+        view.szoom_at(x, y, scales[i])
+        schedule.append(list(view.coord))
+    return schedule
+
+
+def loop_frames(n_frames):
+    """Indices of the frames played backward after the zoom (2x speed)"""
+    return list(range(n_frames - 1, -1, -2))
+
+
+def _init_worker(view):
+    """Worker process initialization: keep the view parameters"""
+    global _worker_view
+    _worker_view = view
+
+
+def _render_frame(coord, diag=None):
+    """Worker process job: render the frame at coord"""
+    _worker_view.coord = coord
+    _worker_view.diag = diag
+    return _worker_view.compute_rows(0, _worker_view.ypixels)
+
+
+def animate(mand, x, y, file_out, n_frames=150, loop=True, workers=None,
+            window=None, **writer_kwargs):
+    """Render a zoom animation to a GIF, MP4 or WebP file
+
+    Args:
+        mand: Mandelbrot
+            view and coloring parameters of the first frame, left unmodified
+        x, y: float
+            point to zoom at
+        file_out: str
+            output file, the format follows its extension
+        n_frames: int
+            number of frames of the zoom
+        loop: boolean
+            loop back to the first frame, one frame in two (2x speed)
+        workers: int
+            number of render processes, defaults to the number of CPUs
+        window: int
+            largest number of frames rendered ahead of the encoder, defaults
+            to twice the number of workers
+        writer_kwargs:
+            passed to imageio.get_writer (e.g. fps, duration, quality)
+
+    Returns:
+        list: coord of the frames of the zoom
+    """
+    schedule = zoom_schedule(mand, x, y, n_frames)
+    view = copy.copy(mand)
+    view.explorer = None
+    view.set = None
+    # Image files are top row first
+    view.origin = 'upper'
+    diag = view.diag
+    workers = workers or os.cpu_count() or 1
+    window = window or 2*workers
+
+    loop_indices = set(loop_frames(n_frames)) if loop else set()
+    spool = None
+    spool_slot = {}
+    frame_shape = (view.ypixels, view.xpixels, 3)
+    try:
+        if loop_indices:
+            # Disk spool of the frames played again backward
+            spool_file = tempfile.NamedTemporaryFile(suffix='.raw')
+            spool = np.memmap(spool_file, dtype=np.uint8, mode='w+',
+                              shape=(len(loop_indices),) + frame_shape)
+        with imageio.get_writer(file_out, mode='I', **writer_kwargs) as writer, \
+                ProcessPoolExecutor(max_workers=workers,
+                                    initializer=_init_worker,
+                                    initargs=(view,)) as pool:
+            pending = {}
+            submitted = 0
+            for i in range(n_frames):
+                # Keep at most `window` frames in flight
+                while submitted < n_frames and submitted < i + window:
+                    pending[submitted] = pool.submit(_render_frame,
+                                                     schedule[submitted],
+                                                     diag)
+                    submitted += 1
+                frame = pending.pop(i).result()
+                writer.append_data(frame)
+                if i in loop_indices:
+                    spool_slot[i] = len(spool_slot)
+                    spool[spool_slot[i]] = frame
+            # Loop back, from the spool
+            for i in loop_frames(n_frames) if loop else []:
+                writer.append_data(np.asarray(spool[spool_slot[i]]))
+    finally:
+        if spool is not None:
+            del spool
+            spool_file.close()
+    return schedule
+
+
+def feather_mask(width, height, feather):
+    """Blending mask of a keyframe: opaque, fading out near the borders
+
+    Args:
+        width, height: int
+            keyframe size, in pixels
+        feather: float
+            width of the fade, as a fraction of the smallest side
+
+    Returns:
+        PIL.Image: 'L' mask
+    """
+    ramp = max(1.0, feather * min(width, height))
+    x = np.minimum(np.arange(width), np.arange(width)[::-1]) + 0.5
+    y = np.minimum(np.arange(height), np.arange(height)[::-1]) + 0.5
+    alpha = np.minimum(np.minimum.outer(y, x) / ramp, 1)
+    return Image.fromarray((255*alpha).astype(np.uint8), 'L')
+
+
+def keyframe_views(mand, x, y, zoom, margin=1.25):
+    """Coordinates and shading diagonals of the keyframes of a zoom
+
+    Keyframe k is centered at (x, y), with a width of 1/2**k the width of
+    the view of mand, enlarged by margin on each axis. Its distance estimate
+    is normalized by the diagonal of the frame without margin, so that
+    keyframes are shaded as frames rendered by update_set.
+
+    Returns:
+        (list, (int, int)): (coord, diag) of each keyframe, and keyframe size
+
+    Raises:
+        ValueError: if zoom is not above 1
+    """
+    if not zoom > 1:
+        raise ValueError("zoom must be > 1")
+    width, height = mand.xpixels, mand.ypixels
+    kwidth = math.ceil(width * margin)
+    kheight = math.ceil(height * margin)
+    nkeys = math.ceil(math.log2(zoom)) + 1
+    # Frame pixel size at zoom 1 (linspace spacing of the view of mand)
+    pixel = (mand.coord[1] - mand.coord[0]) / (width - 1)
+    views = []
+    for k in range(nkeys):
+        step = pixel / 2**k
+        half_w = (kwidth - 1) / 2 * step
+        half_h = (kheight - 1) / 2 * step
+        diag = math.hypot((width - 1) * step, (height - 1) * step)
+        views.append(([x - half_w, x + half_w, y - half_h, y + half_h], diag))
+    return views, (kwidth, kheight)
+
+
+def _scaled(keyframe, ratio, size):
+    """Frame of size cut from the center of keyframe, ratio keyframe pixels
+    per frame pixel (affine transform, outside of the keyframe is black)"""
+    kwidth, kheight = keyframe.size
+    width, height = size
+    data = (ratio, 0, (kwidth - width*ratio) / 2,
+            0, ratio, (kheight - height*ratio) / 2)
+    return keyframe.transform(size, Image.AFFINE, data, Image.BILINEAR)
+
+
+def interpolate_frame(key, next_key, mask, scale, size):
+    """Frame between two keyframes
+
+    Args:
+        key, next_key: PIL.Image
+            keyframes k and k+1 (twice the zoom)
+        mask: PIL.Image
+            feather mask of the keyframes
+        scale: float
+            zoom of the frame relative to keyframe k, in [1, 2]
+        size: (int, int)
+            frame size
+
+    Returns:
+        PIL.Image: frame, keyframe k+1 where it covers the frame, blended
+        into the scaled keyframe k towards its borders
+    """
+    frame = _scaled(key, 1/scale, size)
+    overlay = _scaled(next_key, 2/scale, size)
+    alpha = _scaled(mask, 2/scale, size)
+    return Image.composite(overlay, frame, alpha)
+
+
+def animate_keyframes(mand, x, y, file_out, zoom, frames_per_octave=24,
+                      margin=1.25, feather=1/16, workers=None,
+                      **writer_kwargs):
+    """Render a zoom animation from one keyframe per 2x zoom step
+
+    Keyframes are rendered in parallel, slightly larger than the frames
+    (margin), and each frame is the keyframe of its octave, scaled, with the
+    next keyframe (twice as detailed) blended over its center. About three
+    full renders per decade of zoom, whatever the frame rate.
+
+    Args:
+        mand: Mandelbrot
+            coloring parameters and frame size; the width of its view is the
+            width of the first frame, left unmodified
+        x, y: float
+            zoom target, center of the frames
+        file_out: str
+            output file, the format follows its extension
+        zoom: float
+            zoom factor between the first and the last frames
+        frames_per_octave: int
+            number of frames per 2x zoom step
+        margin: float
+            size of the keyframes relative to the frames
+        feather: float
+            width of the blend at the borders of the keyframes, as a fraction
+            of their smallest side
+        workers: int
+            number of render processes, defaults to the number of CPUs
+        writer_kwargs:
+            passed to imageio.get_writer (e.g. fps, duration)
+
+    Returns:
+        int: number of keyframes rendered
+
+    Raises:
+        ValueError: if zoom is not above 1 (before any render)
+    """
+    views, ksize = keyframe_views(mand, x, y, zoom, margin)
+    size = (mand.xpixels, mand.ypixels)
+    view = copy.copy(mand)
+    view.explorer = None
+    view.set = None
+    view.origin = 'upper'
+    view.xpixels, view.ypixels = ksize
+    mask = feather_mask(*ksize, feather)
+    octaves = math.log2(zoom)
+    n_frames = round(octaves * frames_per_octave) + 1
+    workers = workers or os.cpu_count() or 1
+
+    with imageio.get_writer(file_out, mode='I', **writer_kwargs) as writer, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(view,)) as pool:
+        # Keyframes in flight, rendered ahead of the frames that need them
+        pending = {}
+        keys = {}
+
+        def keyframe(k):
+            for j in range(k, min(k + workers + 1, len(views))):
+                if j not in pending and j not in keys:
+                    pending[j] = pool.submit(_render_frame, *views[j])
+            if k not in keys:
+                keys[k] = Image.fromarray(pending.pop(k).result(), 'RGB')
+            return keys[k]
+
+        for i in range(n_frames):
+            t = min(i / frames_per_octave, octaves)
+            k = min(int(t), len(views) - 2)
+            # Keyframes before k are no longer needed
+            for j in [j for j in keys if j < k]:
+                del keys[j]
+            frame = interpolate_frame(keyframe(k), keyframe(k + 1), mask,
+                                      2**(t - k), size)
+            writer.append_data(np.asarray(frame))
+    return len(views)
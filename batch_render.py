@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Headless batch rendering of a JSONL file of render jobs.
+
+Each line of the job file is a JSON object describing one image: the output
+path and any of the Mandelbrot parameters, e.g.
+
+  {"output": "seahorse.png", "coord": [-0.75, -0.73, 0.1, 0.115],
+   "xpixels": 1920, "maxiter": 2000, "stripe_s": 2, "step_s": 5}
+
+Jobs run in a pool of worker processes, each compiling the kernels once at
+startup, and a status line is printed as each job completes. Neither
+matplotlib nor tkinter is imported.
+
+  python batch_render.py jobs.jsonl --workers 8 --out-dir renders/
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image
+
+from mandelbrot import Mandelbrot
+
+# Job keys passed to the Mandelbrot constructor
+MANDELBROT_KEYS = ('xpixels', 'maxiter', 'coord', 'ncycle', 'rgb_thetas',
+                   'oversampling', 'stripe_s', 'stripe_sig', 'step_s',
+                   'light', 'palette')
+# Other job keys: output path, explicit height, job name
+JOB_KEYS = MANDELBROT_KEYS + ('output', 'ypixels', 'id')
+# Lengths of the vector parameters (the kernels do not check bounds)
+VECTOR_LENGTHS = {'coord': 4, 'rgb_thetas': 3, 'light': 7}
+# Scalar parameters, checked before they reach the kernels
+INT_KEYS = ('xpixels', 'ypixels', 'maxiter', 'oversampling')
+NUMBER_KEYS = ('ncycle', 'stripe_s', 'stripe_sig', 'step_s')
+
+# Whether the worker processes compute on GPU, set by _init_worker
+_worker_gpu = False
+
+
+def _is_number(value):
+    """Whether a JSON value is a number (booleans are not)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_job(job):
+    """Check the keys and parameter types of a job
+
+    Raises:
+        ValueError: if the job is invalid
+    """
+    if not isinstance(job, dict):
+        raise ValueError("a job must be a JSON object")
+    if 'output' not in job:
+        raise ValueError("missing 'output'")
+    unknown = set(job) - set(JOB_KEYS)
+    if unknown:
+        raise ValueError(f"unknown keys: {', '.join(sorted(unknown))}")
+    if not isinstance(job['output'], str) or not job['output']:
+        raise ValueError("'output' must be a file path")
+    for key in INT_KEYS:
+        if key in job and not (isinstance(job[key], int) and
+                               not isinstance(job[key], bool) and
+                               job[key] > 0):
+            raise ValueError(f"'{key}' must be a positive integer")
+    for key in NUMBER_KEYS:
+        if key in job and not _is_number(job[key]):
+            raise ValueError(f"'{key}' must be a number")
+    for key, length in VECTOR_LENGTHS.items():
+        if key in job and not (isinstance(job[key], list) and
+                               len(job[key]) == length and
+                               all(_is_number(v) for v in job[key])):
+            raise ValueError(f"'{key}' needs {length} numbers")
+    if 'palette' in job and not isinstance(job['palette'], (str, list)):
+        raise ValueError("'palette' must be a name or a list of color stops")
+
+
+def read_jobs(lines):
+    """Parse render jobs from JSONL lines (blank and '#' lines skipped)
+
+    Returns:
+        list: (line number, job dict or None, error message or None)
+    """
+    jobs = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            job = json.loads(line)
+            check_job(job)
+        except ValueError as exc:
+            jobs.append((number, None, str(exc)))
+            continue
+        jobs.append((number, job, None))
+    return jobs
+
+
+def _init_worker(gpu):
+    """Worker process initialization: compile the kernels once"""
+    global _worker_gpu
+    _worker_gpu = gpu
+    Mandelbrot(xpixels=8, maxiter=10, oversampling=1, gpu=gpu,
+               compute=False).update_set()
+
+
+def render_job(job, out_dir=None):
+    """Render one job to its output file
+
+    Args:
+        job: dict
+            output path and Mandelbrot parameters
+        out_dir: str
+            directory of relative output paths
+
+    Returns:
+        dict: output path, status ('ok' or 'error'), render and total times
+        in seconds, and the error message if any
+    """
+    start = time.perf_counter()
+    output = job['output']
+    if out_dir is not None:
+        output = os.path.join(out_dir, output)
+    result = {'id': job.get('id', output), 'output': output}
+    try:
+        kwargs = {key: job[key] for key in MANDELBROT_KEYS if key in job}
+        mand = Mandelbrot(gpu=_worker_gpu, origin='upper', compute=False,
+                          **kwargs)
+        if 'ypixels' in job:
+            mand.ypixels = int(job['ypixels'])
+        mand.update_set()
+        result['render'] = time.perf_counter() - start
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if output.lower().endswith('.npy'):
+            np.save(output, mand.set)
+        else:
+            Image.fromarray(mand.set, 'RGB').save(output)
+        result['status'] = 'ok'
+        result['size'] = (mand.xpixels, mand.ypixels)
+    except Exception as exc:
+        result['status'] = 'error'
+        result['error'] = f"{type(exc).__name__}: {exc}"
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def format_status(done, total, result):
+    """One status line of a finished job"""
+    line = (f"[{done:>{len(str(total))}}/{total}] {result['status']:<5} "
+            f"{result['seconds']:8.3f}s  {result['output']}")
+    if result['status'] == 'ok':
+        line += f"  {result['size'][0]}x{result['size'][1]}"
+    else:
+        line += f"  {result['error']}"
+    return line
+
+
+def run_batch(jobs, workers=None, gpu=False, out_dir=None, skip_existing=False,
+              out=sys.stdout):
+    """Render jobs in a process pool, printing a line per finished job
+
+    Args:
+        jobs: list
+            output of read_jobs
+        workers: int
+            number of processes, defaults to the number of CPUs
+        gpu: boolean
+            use CUDA on GPU to compute the sets
+        out_dir: str
+            directory of relative output paths
+        skip_existing: boolean
+            do not render jobs whose output file exists
+        out: file
+            where status lines are written
+
+    Returns:
+        dict: number of jobs rendered, skipped and failed, and wall time
+    """
+    start = time.perf_counter()
+    total = len(jobs)
+    summary = {'ok': 0, 'skipped': 0, 'error': 0}
+    done = 0
+
+    def report(result):
+        nonlocal done
+        done += 1
+        summary[result['status']] += 1
+        print(format_status(done, total, result), file=out, flush=True)
+
+    pending = []
+    for number, job, error in jobs:
+        if job is None:
+            report({'output': f"line {number}", 'status': 'error',
+                    'seconds': 0.0, 'error': error})
+        elif skip_existing and os.path.exists(
+                os.path.join(out_dir or '', job['output'])):
+            summary['skipped'] += 1
+            done += 1
+        else:
+            pending.append(job)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(gpu,)) as pool:
+            futures = [pool.submit(render_job, job, out_dir)
+                       for job in pending]
+            for future in as_completed(futures):
+                report(future.result())
+
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render a JSONL file of Mandelbrot jobs")
+    parser.add_argument('jobs', help="JSONL job file, '-' for stdin")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes (default: CPU count)")
+    parser.add_argument('--gpu', action='store_true',
+                        help="compute on GPU with CUDA")
+    parser.add_argument('--out-dir', default=None,
+                        help="directory of relative output paths")
+    parser.add_argument('--skip-existing', action='store_true',
+                        help="do not render jobs whose output exists")
+    args = parser.parse_args(argv)
+
+    if args.jobs == '-':
+        jobs = read_jobs(sys.stdin)
+    else:
+        with open(args.jobs) as file:
+            jobs = read_jobs(file)
+    summary = run_batch(jobs, args.workers, args.gpu, args.out_dir,
+                        args.skip_existing)
+    print(f"{summary['ok']} rendered, {summary['skipped']} skipped, "
+          f"{summary['error']} failed in {summary['seconds']:.1f}s",
+          flush=True)
+    return 1 if summary['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark of the kernels over a fixed matrix of views and settings.
+
+Three targets are measured: the escape-time iteration alone (smooth_iter,
+through compute_escape_counts), the coloring kernel compute_set, and the full
+Mandelbrot.update_set (oversampling and quantization included). The matrix
+covers the home view and the GUI presets, maxiter from 500 to 50000,
+oversampling 1 to 3 and the shading features. JIT compile time and the time
+to load the compiled kernels from the Numba cache are measured separately from
+the steady-state time, each target in fresh processes with its own empty
+cache directory (targets share kernels). Results can be compared with a
+stored baseline to flag regressions. Iterations per second count the
+iterations actually done, as reported by the kernels (compute_set_stats).
+
+  python benchmark.py --quick --output bench.json
+  python benchmark.py --baseline bench.json     # exit code 1 on regression
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numba
+import numpy as np
+
+from escape_stats import EscapeStats
+from mandelbrot import (Mandelbrot, compute_escape_counts, compute_set,
+                        compute_set_stats)
+
+# Views: center and width in the complex plane
+VIEW_PRESETS = {
+    'Home': (-0.3775, 0.0, 4.445),
+    'Seahorse Valley': (-0.743643887, 0.131825904, 0.01),
+    'Lightning': (-0.170337, -1.06506, 0.005),
+    'Spiral': (-0.761574, -0.0847596, 0.004),
+    'Mini Mandelbrot': (-1.75488, 0.0, 0.04),
+    'Elephant Valley': (0.2925, 0.0165, 0.03),
+}
+
+MAXITERS = (500, 5000, 50000)
+OVERSAMPLINGS = (1, 2, 3)
+
+# Shading features: stripe and step densities, light opacity (0: no light)
+FEATURES = {
+    'plain': {'stripe_s': 0.0, 'step_s': 0.0, 'light_opacity': 0.0},
+    'stripe': {'stripe_s': 2.0, 'step_s': 0.0, 'light_opacity': 0.0},
+    'step': {'stripe_s': 0.0, 'step_s': 20.0, 'light_opacity': 0.0},
+    'light': {'stripe_s': 0.0, 'step_s': 0.0, 'light_opacity': 0.75},
+    'all': {'stripe_s': 2.0, 'step_s': 20.0, 'light_opacity': 0.75},
+}
+
+TARGETS = ('smooth_iter', 'compute_set', 'update_set')
+
+# Reduced matrix of --quick
+QUICK = {'maxiter': (500, 5000), 'oversampling': (1, 2),
+         'features': ('plain', 'all')}
+
+
+def make_view(view, maxiter, oversampling, features, xpixels=320,
+              gpu=False):
+    """Mandelbrot object of a case of the matrix (set not computed)"""
+    xc, yc, width = VIEW_PRESETS[view]
+    height = width * 9 / 16
+    feature = FEATURES[features]
+    light = (45., 45., feature['light_opacity'], .2, .5, .5, 20.)
+    return Mandelbrot(xpixels=xpixels, maxiter=maxiter,
+                      coord=(xc - width/2, xc + width/2,
+                             yc - height/2, yc + height/2),
+                      gpu=gpu, ncycle=32., oversampling=oversampling,
+                      stripe_s=feature['stripe_s'], stripe_sig=.9,
+                      step_s=feature['step_s'], light=light, compute=False)
+
+
+def _grid(mand):
+    """Oversampled grid of a view, as given to compute_set"""
+    creal = np.linspace(mand.coord[0], mand.coord[1], mand.xpixels*mand.os)
+    cim = np.linspace(mand.coord[2], mand.coord[3], mand.ypixels*mand.os)
+    return creal, cim
+
+
+def _runner(target, mand):
+    """Function running one pass of target on the view of mand"""
+    if target == 'update_set':
+        return mand.update_set
+    creal, cim = _grid(mand)
+    if target == 'smooth_iter':
+        return lambda: compute_escape_counts(creal, cim, mand.maxiter)
+    return lambda: compute_set(creal, cim, mand.maxiter, mand.colortable,
+                               math.sqrt(mand.ncycle), mand.stripe_s,
+                               mand.stripe_sig, mand.step_s,
+                               mand.frame_diag(), mand.light)
+
+
+def view_stats(mand):
+    """Escape statistics of a view (EscapeStats): iterations actually done
+    by the kernels, early bailouts inside the set included (counted on CPU)"""
+    creal, cim = _grid(mand)
+    stats = EscapeStats(mand.maxiter)
+    compute_set_stats(creal, cim, mand.maxiter, mand.colortable,
+                      math.sqrt(mand.ncycle), mand.stripe_s, mand.stripe_sig,
+                      mand.step_s, mand.frame_diag(), mand.light,
+                      stats.counts, stats.histogram)
+    return stats
+
+
+def first_call_overhead(target, gpu=False):
+    """First call minus a warm call of target, on a tiny view with the types
+    used by the matrix: JIT compile or cache load time, depending on the
+    state of the Numba cache"""
+    mand = make_view('Home', 50, 1, 'all', xpixels=8, gpu=gpu)
+    run = _runner(target, mand)
+    start = time.perf_counter()
+    run()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    run()
+    return first - (time.perf_counter() - start)
+
+
+def _first_call_process(target, gpu, cache_dir):
+    """first_call_overhead of target in a new process using cache_dir"""
+    args = [sys.executable, os.path.abspath(__file__), '--first-call', target]
+    if gpu:
+        args.append('--gpu')
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    out = subprocess.run(args, env=env, capture_output=True, text=True,
+                         check=True).stdout
+    return float(out.split()[-1])
+
+
+def compile_times(gpu=False):
+    """JIT compile and cache load times of each target
+
+    Each target is run in a process with an empty Numba cache directory
+    (compile time, the compiled kernels are then cached), then in a second
+    process with the same directory (cache load time).
+
+    Returns:
+        (dict, dict): compile and cache load seconds by target
+    """
+    compile_seconds, load_seconds = {}, {}
+    for target in TARGETS:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            compile_seconds[target] = _first_call_process(target, gpu,
+                                                          cache_dir)
+            load_seconds[target] = _first_call_process(target, gpu,
+                                                       cache_dir)
+    return compile_seconds, load_seconds
+
+
+def run_case(target, view, maxiter, oversampling, features, xpixels=320,
+             repeat=3, gpu=False):
+    """Steady-state measure of one case (best of repeat, after a warm-up)
+
+    Returns:
+        dict: case parameters, seconds, pixels and iterations per second,
+        fraction of points per exit (escape, maxiter, interior checks)
+    """
+    mand = make_view(view, maxiter, oversampling, features, xpixels, gpu)
+    run = _runner(target, mand)
+    run()
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    samples = mand.xpixels * mand.ypixels * mand.os**2
+    stats = view_stats(mand)
+    return {
+        'target': target, 'view': view, 'maxiter': maxiter,
+        'oversampling': oversampling, 'features': features,
+        'xpixels': mand.xpixels, 'ypixels': mand.ypixels,
+        'seconds': best,
+        'pixels_per_second': samples / best,
+        'iterations_per_second': stats['iterations'] / best,
+        'escape_fractions': stats.as_dict()['fractions'],
+    }
+
+
+def case_key(result):
+    """Identifier of a case, to match results with a baseline"""
+    return (result['target'], result['view'], result['maxiter'],
+            result['oversampling'], result['features'], result['xpixels'])
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Cases slower than the baseline by more than tolerance
+
+    Returns:
+        list: (result, baseline seconds, relative change) of regressions
+    """
+    reference = {case_key(r): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        seconds = reference.get(case_key(result))
+        if seconds is None:
+            continue
+        change = result['seconds'] / seconds - 1
+        if change > tolerance:
+            regressions.append((result, seconds, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mandelbrot benchmark")
+    parser.add_argument('--quick', action='store_true',
+                        help="reduced matrix: " + json.dumps(QUICK))
+    parser.add_argument('--targets', nargs='+', choices=TARGETS,
+                        default=list(TARGETS))
+    parser.add_argument('--views', nargs='+', choices=list(VIEW_PRESETS),
+                        default=list(VIEW_PRESETS))
+    parser.add_argument('--maxiter', nargs='+', type=int, default=None)
+    parser.add_argument('--oversampling', nargs='+', type=int, default=None)
+    parser.add_argument('--features', nargs='+', choices=list(FEATURES),
+                        default=None)
+    parser.add_argument('--xpixels', type=int, default=320,
+                        help="width of the views (default: 320)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs per case, the best is kept")
+    parser.add_argument('--gpu', action='store_true',
+                        help="update_set on GPU with CUDA")
+    parser.add_argument('--output', help="JSON file of the results")
+    parser.add_argument('--baseline', help="JSON results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="slowdown flagged as regression (default: 0.1)")
+    # Measure of compile_times, in its own process
+    parser.add_argument('--first-call', choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.first_call:
+        print(first_call_overhead(args.first_call, args.gpu))
+        return 0
+
+    maxiters = args.maxiter or (QUICK['maxiter'] if args.quick else MAXITERS)
+    oversamplings = args.oversampling or (
+        QUICK['oversampling'] if args.quick else OVERSAMPLINGS)
+    features = args.features or (
+        QUICK['features'] if args.quick else list(FEATURES))
+
+    compile_seconds, load_seconds = compile_times(args.gpu)
+    for target in TARGETS:
+        print(f"compile {target:<12} {compile_seconds[target]:8.3f}s "
+              f"(cache load {load_seconds[target]:.3f}s)", flush=True)
+
+    results = []
+    cases = list(itertools.product(args.targets, args.views, maxiters,
+                                   oversamplings, features))
+    for i, case in enumerate(cases, 1):
+        result = run_case(*case, xpixels=args.xpixels, repeat=args.repeat,
+                          gpu=args.gpu)
+        results.append(result)
+        print(f"[{i:>{len(str(len(cases)))}}/{len(cases)}] "
+              f"{result['target']:<12} {result['view']:<16} "
+              f"it {result['maxiter']:>5} os {result['oversampling']} "
+              f"{result['features']:<6} {result['seconds']:8.4f}s "
+              f"{result['pixels_per_second']/1e6:8.3f} Mpix/s "
+              f"{result['iterations_per_second']/1e6:9.1f} Mit/s",
+              flush=True)
+
+    report = {
+        'machine': {'platform': platform.platform(),
+                    'processor': platform.processor(),
+                    'python': platform.python_version(),
+                    'numba': numba.__version__, 'numpy': np.__version__},
+        'compile_seconds': compile_seconds,
+        'cache_load_seconds': load_seconds,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for result, seconds, change in regressions:
+            print(f"REGRESSION {result['target']} {result['view']} "
+                  f"it {result['maxiter']} os {result['oversampling']} "
+                  f"{result['features']}: {seconds:.4f}s -> "
+                  f"{result['seconds']:.4f}s (+{change:.0%})")
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,8 @@ Utility functions for deep zoom operations in fractal visualization.
 """
 
 import math
+import numpy as np
+from PIL import Image
 
 def estimate_required_iterations(zoom_level, base_iterations):
     """
@@ -28,6 +30,78 @@ def estimate_required_iterations(zoom_level, base_iterations):
     # Cap at some reasonable maximum (50,000 is a good limit for most GPUs)
     return min(estimated, 50000)
 
+def escape_statistics(niter, maxiter, near_cap=0.9):
+    """
+    Summarize the escape counts of a frame or of a probe.
+    
+    Args:
+        niter: ndarray
+            smooth escape counts, 0 for points that did not escape
+        maxiter: int
+            maximal number of iterations used to compute niter
+        near_cap: float
+            escape counts above near_cap * maxiter are considered close to
+            the iteration cap
+            
+    Returns:
+        dict: unescaped fraction of the points, fraction of the escaped points
+        close to the cap, and the 99th and 99.9th percentiles of the escape
+        counts of escaped points
+    """
+    escaped = niter[niter > 0]
+    stats = {
+        'unescaped_fraction': 1 - escaped.size / max(niter.size, 1),
+        'near_cap_fraction': 0.0,
+        'p99': 0.0,
+        'p999': 0.0,
+    }
+    if escaped.size:
+        stats['near_cap_fraction'] = float(np.mean(escaped > near_cap * maxiter))
+        stats['p99'], stats['p999'] = (float(v) for v in np.percentile(escaped, [99, 99.9]))
+    return stats
+
+def auto_iterations(probe, start_iterations, min_iterations=100,
+                    max_iterations=50000, tail_tolerance=1e-3, margin=1.5):
+    """
+    Choose the smallest maxiter that resolves a view, from escape statistics.
+    
+    The view is probed at start_iterations. While too many escaped points
+    are close to the cap (the view is under-iterated, e.g. near a minibrot),
+    the cap is raised and the view probed again. The chosen maxiter then
+    covers the 99.9th percentile of the escape counts with a margin, so
+    shallow-looking regions do not waste iterations.
+    
+    Args:
+        probe: function
+            probe(maxiter) returns the smooth escape counts of the view (0 for
+            points that did not escape), e.g. Mandelbrot.escape_probe
+        start_iterations: int
+            iteration cap of the first probe
+        min_iterations, max_iterations: int
+            bounds of the chosen maxiter
+        tail_tolerance: float
+            largest acceptable fraction of escaped points close to the cap
+        margin: float
+            multiplier applied to the 99.9th percentile of escape counts
+            
+    Returns:
+        (int, str): chosen maxiter and a short explanation of the choice
+    """
+    maxiter = max(int(start_iterations), min_iterations)
+    while True:
+        stats = escape_statistics(probe(maxiter), maxiter)
+        if stats['near_cap_fraction'] <= tail_tolerance or maxiter >= max_iterations:
+            break
+        maxiter = min(4 * maxiter, max_iterations)
+    
+    interior = f"{stats['unescaped_fraction']:.0%} interior"
+    if stats['near_cap_fraction'] > tail_tolerance:
+        reason = f"{interior}, {stats['near_cap_fraction']:.1%} escape near the cap: capped"
+        return max_iterations, reason
+    chosen = int(min(max(stats['p999'] * margin, min_iterations), max_iterations))
+    reason = f"{interior}, 99.9% escape by {stats['p999']:.0f}"
+    return chosen, reason
+
 def adjust_color_parameters(zoom_level):
     """
     Adjust color parameters based on zoom level to maintain visual interest.
@@ -87,3 +161,43 @@ def get_precision_at_zoom(zoom_level):
         'float64_max_digits': float64_max_digits,
         'precision_percent': min(100, decimal_digits_needed / float64_max_digits * 100)
     }
+
+def preview_zoomed_frame(image, old_coord, new_coord, origin='upper'):
+    """
+    Approximate a new view by transforming the previous frame.
+    
+    The part of the previous frame covered by the new view is cropped and
+    upscaled (zoom in), or the previous frame is downscaled and padded with
+    black (zoom out). Cheap enough to give feedback within one UI frame while
+    the real render runs.
+    
+    Args:
+        image: PIL.Image
+            previous frame
+        old_coord: (float, float, float, float)
+            coordinates of the previous frame
+        new_coord: (float, float, float, float)
+            coordinates of the new view
+        origin: str
+            'upper' if the first row of image is the maximal imaginary part
+            (display orientation), 'lower' if it is the minimal one
+            
+    Returns:
+        PIL.Image: preview of the new view, same size and orientation as image
+    """
+    width, height = image.size
+    x_scale = width / (old_coord[1] - old_coord[0])
+    y_scale = height / (old_coord[3] - old_coord[2])
+    # Rectangle of the new view in the pixel space of the previous frame
+    if origin == 'upper':
+        top = (old_coord[3] - new_coord[3]) * y_scale
+        bottom = (old_coord[3] - new_coord[2]) * y_scale
+    else:
+        top = (new_coord[2] - old_coord[2]) * y_scale
+        bottom = (new_coord[3] - old_coord[2]) * y_scale
+    extent = ((new_coord[0] - old_coord[0]) * x_scale, top,
+              (new_coord[1] - old_coord[0]) * x_scale, bottom)
+    # Nearest neighbor: several times faster than bilinear, and the preview
+    # is only shown until the real render arrives
+    return image.transform((width, height), Image.EXTENT, extent,
+                           resample=Image.NEAREST, fillcolor=(0, 0, 0))
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+Persistent on-disk cache of escape-time fields.
+
+The escape-time fields of a view (Mandelbrot.compute_fields) only depend on
+the view and the iteration parameters, not on the coloring. They are stored
+compressed, keyed by a hash of these parameters, so that a revisited view is
+only recolored, with any colortable, light or step shading. The cache is
+bounded in size, the least recently used entries being evicted first.
+
+  cache = EscapeFieldCache()
+  cache.render(mand)      # computes and stores the fields, or reuses them
+
+New entries are compressed and written by a background thread, so that a
+cache miss costs the render little more than the fields themselves. The
+fields are always computed on CPU, whatever mand.gpu.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from frame_timing import maybe_stage
+
+
+def default_cache_dir():
+    """Cache directory in the user cache ($XDG_CACHE_HOME or ~/.cache)"""
+    root = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(root, 'mandelbrot', 'escape_fields')
+
+
+def field_params(mand):
+    """Parameters that determine the escape-time fields of a view"""
+    params = mand.render_params()
+    return {
+        'coord': params['coord'],
+        'xpixels': params['xpixels'],
+        'ypixels': params['ypixels'],
+        'oversampling': params['oversampling'],
+        'maxiter': params['maxiter'],
+        'stripe_s': params['stripe_s'],
+        'stripe_sig': params['stripe_sig'],
+        'origin': params['origin'],
+    }
+
+
+class EscapeFieldCache:
+    """Size-bounded LRU disk cache of escape-time fields"""
+
+    def __init__(self, directory=None, max_bytes=2**30, dtype=np.float32,
+                 background=True):
+        """Size-bounded LRU disk cache of escape-time fields
+
+        Args:
+            directory: str
+                cache directory, defaults to default_cache_dir()
+            max_bytes: int
+                largest total size of the cache files
+            dtype: numpy float type
+                storage precision of the fields. float64 gives images
+                identical to Mandelbrot.update_set, float32 (half the size)
+                may shift a few colortable indices in deep zooms.
+            background: boolean
+                write the entries of render in a background thread (see
+                flush), instead of before coloring
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self.background = background
+        self._writes = queue.Queue()
+        self._writer = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, mand):
+        """Canonical hash of the view, iteration parameters and precision"""
+        params = dict(field_params(mand), dtype=self.dtype.str)
+        data = json.dumps(params, sort_keys=True).encode()
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, mand):
+        """Stored fields of the view of mand, None if not cached"""
+        path = self._path(self.key(mand))
+        try:
+            with np.load(path) as data:
+                fields = data['fields']
+        except (OSError, KeyError, ValueError):
+            # Missing, evicted meanwhile or unreadable entry
+            self.misses += 1
+            return None
+        # Mark as recently used
+        os.utime(path)
+        self.hits += 1
+        return fields
+
+    def put(self, mand, fields):
+        """Store the fields of the view of mand, then enforce the size cap"""
+        self._write(self._path(self.key(mand)), fields, field_params(mand))
+
+    def put_async(self, mand, fields):
+        """Store the fields of the view of mand in the background
+
+        The view is read now: mand can change meanwhile, fields must not.
+        """
+        self._writes.put((self._path(self.key(mand)), fields,
+                          field_params(mand)))
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop,
+                                            daemon=True)
+            self._writer.start()
+
+    def flush(self):
+        """Wait for the background writes to complete"""
+        self._writes.join()
+
+    def _write(self, path, fields, params):
+        """Write an entry atomically, then enforce the size cap"""
+        tmp_path = path + '.part'
+        with open(tmp_path, 'wb') as file:
+            np.savez_compressed(file, fields=fields.astype(self.dtype),
+                                params=json.dumps(params))
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def _write_loop(self):
+        """Writer thread: write queued entries"""
+        while True:
+            entry = self._writes.get()
+            try:
+                self._write(*entry)
+            except OSError:
+                # Lost entry (disk full, cache directory removed...)
+                pass
+            finally:
+                self._writes.task_done()
+
+    def _entries(self):
+        """Cache files as (last use, size, path), least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return sorted(entries)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until under the size cap"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def render(self, mand, dtype=np.uint8, timer=None):
+        """Image of the view of mand, from cached fields when possible
+
+        Sets mand.set, as mand.update_set would (fields are computed on CPU,
+        even if mand.gpu). On a miss the fields are stored in the background
+        if self.background.
+
+        Args:
+            timer: StageTimer
+                if given, records the duration of the load, fields, store and
+                coloring stages (store only for foreground writes)
+
+        Returns:
+            bool: whether the fields came from the cache
+        """
+        with maybe_stage(timer, 'load'):
+            fields = self.get(mand)
+        hit = fields is not None
+        if not hit:
+            with maybe_stage(timer, 'fields'):
+                fields = mand.compute_fields()
+            if self.background:
+                self.put_async(mand, fields)
+            else:
+                with maybe_stage(timer, 'store'):
+                    self.put(mand, fields)
+        mand.set = mand.color_fields(fields, dtype, timer)
+        return hit
+
+    def clear(self):
+        """Remove all entries"""
+        self.flush()
+        for _, _, path in self._entries():
+            os.remove(path)
+
+    @property
+    def hit_rate(self):
+        """Fraction of lookups found in the cache (no disk access)"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Hits, misses, hit rate, and number and total size of entries
+        (lists the cache directory)"""
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+        }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Escape statistics of the points of a frame.
+
+Filled by the compute_set_stats kernel: the number of iterations actually
+done, how the iteration of each point ended (escape, maxiter, or one of the
+interior checks of smooth_iter) and a histogram of the escape counts. Each
+frame or tile has its own counters, merged afterwards, so that parallel
+renders never share them.
+
+  mand.collect_stats = True
+  mand.update_set()
+  print(mand.stats.summary())
+"""
+
+import numpy as np
+
+# Counters, in the order of the kernel: total iterations, then one counter per
+# exit code (index 1 + EXIT_* of mandelbrot)
+COUNTERS = ('iterations', 'escaped', 'maxiter', 'periodic', 'slow')
+
+
+class EscapeStats:
+    """Iteration counters and escape count histogram of a frame or tile"""
+
+    def __init__(self, maxiter, bins=64):
+        """Empty statistics
+
+        Args:
+            maxiter: int
+                maximal number of iterations of the render
+            bins: int
+                number of histogram bins, evenly spread over [1, maxiter] on
+                a log scale
+        """
+        self.maxiter = maxiter
+        self.counts = np.zeros(len(COUNTERS), dtype=np.int64)
+        self.histogram = np.zeros(bins, dtype=np.int64)
+
+    def __getitem__(self, name):
+        """Counter by name, see COUNTERS"""
+        return int(self.counts[COUNTERS.index(name)])
+
+    @property
+    def points(self):
+        """Number of points computed (pixels times oversampling squared)"""
+        return int(self.counts[1:].sum())
+
+    def merge(self, other):
+        """Add the statistics of another tile of the same render"""
+        if (other.maxiter != self.maxiter
+                or len(other.histogram) != len(self.histogram)):
+            raise ValueError("Statistics of renders with different maxiter "
+                             "or bins cannot be merged")
+        self.counts += other.counts
+        self.histogram += other.histogram
+        return self
+
+    def bin_edges(self):
+        """Escape counts at the edges of the histogram bins (log scale)"""
+        return np.geomspace(1, self.maxiter + 1, len(self.histogram) + 1)
+
+    def as_dict(self):
+        """Counters, fractions of points per exit and histogram, as JSON
+        serializable values"""
+        points = self.points
+        result = {name: self[name] for name in COUNTERS}
+        result['points'] = points
+        result['maxiter_cap'] = self.maxiter
+        result['mean_iterations'] = (self['iterations'] / points
+                                     if points else 0.0)
+        result['fractions'] = {name: self[name] / points if points else 0.0
+                               for name in COUNTERS[1:]}
+        result['histogram'] = self.histogram.tolist()
+        return result
+
+    def summary(self):
+        """Compact one-line summary, e.g. '12.3 M it • escaped 81% • ...'"""
+        points = self.points
+        if not points:
+            return ""
+        parts = [f"{self['iterations']/1e6:.1f} M it"]
+        parts += [f"{name} {self[name]/points:.0%}" for name in COUNTERS[1:]]
+        return " • ".join(parts)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+"""
+Exponential-map (log-polar) rendering of deep zoom videos.
+
+The zoom is rendered once, as a tall strip in (log radius, angle) coordinates
+around the zoom target: row y is the circle of radius r0*exp(y*dlog), column x
+the angle 2*pi*x/nangle. With dlog = 2*pi/nangle, pixels of the strip are
+square, so every decade of zoom costs the same number of rows. Each video
+frame is then a cheap resampling of the strip, whatever the zoom depth.
+
+  strip = render_strip(mand, -0.743643887, 0.131825904, zoom=1e6)
+  exp_map_zoom(strip, 'zoom.mp4', n_frames=600, fps=30)
+
+The shading is the one of update_set, except that the distance estimate of a
+row is normalized by a diagonal proportional to its radius (diag_ratio*r), so
+that the shading is the same at every depth.
+"""
+
+import copy
+import math
+
+import imageio
+import numpy as np
+from numba import jit
+
+from mandelbrot import smooth_iter, color_pixel
+
+
+@jit(nogil=True, cache=True)
+def compute_exp_map(xc, yc, log_r0, dlog, theta0, y0, y1, nangle, maxiter,
+                    colortable, ncycle, stripe_s, stripe_sig, step_s,
+                    diag_ratio, light):
+    """ Compute and color rows of a log-polar strip (CPU)
+
+    Args:
+        xc, yc: float
+            center of the strip (zoom target)
+        log_r0: float
+            log radius of row 0
+        dlog: float
+            log radius step between rows
+        theta0: float
+            angle of column 0
+        y0, y1: int
+            first (inclusive) and last (exclusive) rows to compute
+        nangle: int
+            number of columns, over one turn
+        maxiter: int
+            maximal number of iterations
+        colortable: ndarray(dtype=float32, ndim=2)
+            cyclic RGB colortable
+        ncycle: float
+            number of iteration before cycling the colortable
+        diag_ratio: float
+            diagonal normalizing the distance estimate, relative to the
+            radius of the row
+
+    Returns:
+        ndarray(dtype=float, ndim=3): rows y0 to y1 of the strip
+    """
+    mat = np.zeros((y1 - y0, nangle, 3))
+    for y in range(y0, y1):
+        r = math.exp(log_r0 + y*dlog)
+        diag = diag_ratio * r
+        for x in range(nangle):
+            theta = theta0 + 2*math.pi*x/nangle
+            c = complex(xc + r*math.cos(theta), yc + r*math.sin(theta))
+            niter, stripe_a, dem, normal = smooth_iter(c, maxiter, stripe_s,
+                                                      stripe_sig)
+            if niter > 0:
+                color_pixel(mat[y - y0, x,], niter, stripe_a, step_s,
+                            dem/diag, normal, colortable, ncycle, light)
+    return mat
+
+
+class ExpMapStrip:
+    """Log-polar strip around a zoom target, and the frames it covers"""
+
+    def __init__(self, image, x, y, log_r0, dlog, frame_size, radius_start,
+                 radius_end):
+        # image: strip of shape (rows, nangle, 3), row 0 the smallest radius
+        self.image = image
+        self.x = x
+        self.y = y
+        self.log_r0 = log_r0
+        self.dlog = dlog
+        # Frame size in pixels, and half diagonals (center to corner) of the
+        # first and last frames, in the complex plane
+        self.frame_size = frame_size
+        self.radius_start = radius_start
+        self.radius_end = radius_end
+        # Log radius and angle of the frame pixels, computed once
+        self._polar = None
+
+    def frame(self, radius):
+        """Resample the frame of half diagonal radius (bilinear)
+
+        Returns:
+            ndarray(dtype=uint8, ndim=3): frame, top row first
+        """
+        width, height = self.frame_size
+        if self._polar is None:
+            # Relative to the corner, the same for all frames
+            half_diag = math.hypot(width - 1, height - 1) / 2
+            u = (np.arange(width) - (width - 1)/2) / half_diag
+            v = ((height - 1)/2 - np.arange(height)) / half_diag
+            offsets = u[np.newaxis, :] + 1j*v[:, np.newaxis]
+            with np.errstate(divide='ignore'):
+                log_rho = np.log(np.abs(offsets))
+            angle = np.angle(offsets) % (2*math.pi)
+            self._polar = (log_rho, angle)
+        log_rho, angle = self._polar
+        nrows, nangle = self.image.shape[:2]
+        rows = (log_rho + math.log(radius) - self.log_r0) / self.dlog
+        # Center pixel, below the first row: clamped
+        rows = np.clip(rows, 0, nrows - 1)
+        cols = angle / (2*math.pi) * nangle
+
+        r0 = np.floor(rows).astype(np.intp)
+        c0 = np.floor(cols).astype(np.intp)
+        fr = (rows - r0)[..., np.newaxis]
+        fc = (cols - c0)[..., np.newaxis]
+        r1 = np.minimum(r0 + 1, nrows - 1)
+        # Angle wraps around
+        c0 %= nangle
+        c1 = (c0 + 1) % nangle
+        img = self.image
+        top = img[r0, c0] * (1 - fc) + img[r0, c1] * fc
+        bottom = img[r1, c0] * (1 - fc) + img[r1, c1] * fc
+        return (top * (1 - fr) + bottom * fr + 0.5).astype(np.uint8)
+
+    def frames(self, n_frames):
+        """Frames of a constant speed zoom, from the first to the last frame
+
+        Yields:
+            ndarray(dtype=uint8, ndim=3): frames, top row first
+        """
+        log_start = math.log(self.radius_start)
+        log_end = math.log(self.radius_end)
+        for i in range(n_frames):
+            t = i / max(n_frames - 1, 1)
+            yield self.frame(math.exp(log_start + t*(log_end - log_start)))
+
+
+def render_strip(mand, x, y, zoom, xpixels=None, ypixels=None,
+                 diag_ratio=3.0, band_bytes=2**26, progress=None):
+    """Render the log-polar strip of a zoom at (x, y)
+
+    Args:
+        mand: Mandelbrot
+            coloring parameters, iterations and oversampling; the width of
+            its view is the width of the first frame
+        x, y: float
+            zoom target, center of the frames
+        zoom: float
+            zoom factor between the first and the last frames
+        xpixels, ypixels: int
+            frame size, defaults to the size of mand
+        diag_ratio: float
+            distance estimate normalization of a row of radius r: diag_ratio*r
+        band_bytes: int
+            working memory of the rows computed at once
+        progress: function
+            called as progress(rows_done, rows) after each band
+
+    Returns:
+        ExpMapStrip: the strip, ready to resample frames
+    """
+    xpixels = xpixels or mand.xpixels
+    ypixels = ypixels or mand.ypixels
+    width = mand.coord[1] - mand.coord[0]
+    pixel = width / (xpixels - 1)
+    half_diag = math.hypot(xpixels - 1, ypixels - 1) / 2
+    radius_start = half_diag * pixel
+    radius_end = radius_start / zoom
+    # Angular sampling: one strip pixel per frame pixel on the circle
+    # through the corners; the innermost row is one pixel of the last frame
+    nangle = math.ceil(2*math.pi*half_diag)
+    dlog = 2*math.pi / nangle
+    log_r0 = math.log(radius_end / half_diag)
+    nrows = math.ceil((math.log(radius_start) - log_r0) / dlog) + 1
+
+    # Oversampled computation, averaged like update_set
+    view = copy.copy(mand)
+    os_ = view.os
+    band = max(1, band_bytes // (nangle * os_**2 * 3 * 8))
+    image = np.empty((nrows, nangle, 3), dtype=np.uint8)
+    ncycle = math.sqrt(mand.ncycle)
+    for y0 in range(0, nrows, band):
+        y1 = min(y0 + band, nrows)
+        # Oversampled rows and columns of the band: sub-pixel offsets are
+        # centered on the pixel
+        offset = (os_ - 1) / (2*os_)
+        mat = compute_exp_map(x, y, log_r0 - dlog*offset, dlog/os_,
+                              -dlog*offset, y0*os_, y1*os_, nangle*os_,
+                              mand.maxiter, mand.colortable, ncycle,
+                              mand.stripe_s, mand.stripe_sig, mand.step_s,
+                              diag_ratio, mand.light)
+        image[y0:y1] = view._to_image(mat)
+        if progress is not None:
+            progress(y1, nrows)
+    return ExpMapStrip(image, x, y, log_r0, dlog, (xpixels, ypixels),
+                       radius_start, radius_end)
+
+
+def exp_map_zoom(strip, file_out, n_frames=300, **writer_kwargs):
+    """Write the zoom video of a strip, frame by frame
+
+    Args:
+        strip: ExpMapStrip
+            output of render_strip
+        file_out: str
+            output file (GIF, MP4, WebP...), the format follows its extension
+        n_frames: int
+            number of frames
+        writer_kwargs:
+            passed to imageio.get_writer (e.g. fps)
+    """
+    with imageio.get_writer(file_out, mode='I', **writer_kwargs) as writer:
+        for frame in strip.frames(n_frames):
+            writer.append_data(frame)
@@ -5,8 +5,10 @@ Mandelbrot Explorer Screen using Kivy.
 Provides interactive exploration of the Mandelbrot set.
 """
 
+import copy
 import threading
 import math
+import time
 import numpy as np
 from io import BytesIO
 from PIL import Image
@@ -17,7 +19,11 @@ from kivy.graphics.texture import Texture
 from kivy.clock import Clock
 
 from mandelbrot import Mandelbrot
-from deep_zoom_utils import estimate_required_iterations, adjust_color_parameters
+from frame_timing import StageTimer, FrameLog, maybe_stage, startup
+from deep_zoom_utils import (estimate_required_iterations, adjust_color_parameters,
+                             preview_zoomed_frame, auto_iterations)
+from prefetch import ViewPrefetcher, zoom_out_view, neighbor_views
+from palette_cycle import PaletteCycler
 
 class MandelbrotExplorerScreen(Screen):
     """Mandelbrot Explorer Screen using Kivy"""
@@ -32,7 +38,9 @@ class MandelbrotExplorerScreen(Screen):
     is_computing = BooleanProperty(False)
     preview_quality = StringProperty('Normal')
     dynamic_iterations = BooleanProperty(True)
+    auto_iterations = BooleanProperty(False)  # Iterations from escape statistics
     oversampling = NumericProperty(1)
+    palette_cycling = BooleanProperty(False)  # Palette animation, no render
     
     def __init__(self, **kwargs):
         super(MandelbrotExplorerScreen, self).__init__(**kwargs)
@@ -46,7 +54,8 @@ class MandelbrotExplorerScreen(Screen):
             ncycle=32,
             rgb_thetas=(0.0, 0.15, 0.25),
             stripe_s=0,
-            step_s=0
+            step_s=0,
+            compute=False  # First rendered at the widget size
         )
         
         # Store initial view for home button
@@ -56,6 +65,30 @@ class MandelbrotExplorerScreen(Screen):
         self._computing_lock = threading.Lock()
         self._update_scheduled = False
         
+        # Idle-time rendering of the likely next views
+        self.prefetcher = ViewPrefetcher()
+        self._last_render_prefetched = False
+        self._iteration_reason = None
+        
+        # Last displayed frame (bottom row first), for zoom previews
+        self._last_frame = None
+        
+        # Frame texture, kept while the frame size is unchanged, and rows
+        # uploaded at once while rendering
+        self._texture = None
+        self.progressive_rows = 32
+        
+        # Stage durations of the current frame, and optional JSON lines log
+        # of them (MANDELBROT_FRAME_LOG)
+        self.frame_timer = StageTimer()
+        self.frame_log = FrameLog.from_env()
+        
+        # Palette cycling of the displayed view: recolored each frame from
+        # stored colortable indices, without rendering
+        self.palette_cycler = None
+        self.palette_cycle_speed = 0.1  # Palette cycles per second
+        self._cycle_event = None
+        
     def on_pre_enter(self):
         """Called before the screen is entered"""
         # Schedule initial rendering
@@ -63,12 +96,17 @@ class MandelbrotExplorerScreen(Screen):
     
     def on_leave(self):
         """Called when leaving the screen"""
-        pass
+        self.prefetcher.cancel()
+        self.stop_palette_cycling(redisplay=False)
     
     def update_mandelbrot(self, *args):
         """Update the Mandelbrot set rendering"""
         if self.is_computing:
             return
+        
+        # Real work to do: stop speculative rendering and palette cycling
+        self.prefetcher.cancel()
+        self.stop_palette_cycling(redisplay=False)
             
         if self.ids.fractal_image:
             # Get current size of the image widget
@@ -101,45 +139,6 @@ class MandelbrotExplorerScreen(Screen):
         # Start computation in background thread
         threading.Thread(target=self.compute_mandelbrot, daemon=True).start()
     
-    def compute_mandelbrot(self):
-        """Compute the Mandelbrot set in a background thread"""
-        try:
-            with self._computing_lock:
-                # Update the set
-                self.mandelbrot.update_set()
-                
-                # Get the resulting image
-                image_array = self.mandelbrot.set[::-1, :, :]
-                
-                # Schedule UI update on the main thread
-                Clock.schedule_once(lambda dt: self.display_result(image_array), 0)
-        except Exception as e:
-            print(f"Error computing Mandelbrot set: {e}")
-    
-    def display_result(self, image_array):
-        """Display the computed image"""
-        # Create texture from numpy array
-        texture = Texture.create(
-            size=(image_array.shape[1], image_array.shape[0]), 
-            colorfmt='rgb'
-        )
-        texture.blit_buffer(
-            image_array.tobytes(), 
-            colorfmt='rgb', 
-            bufferfmt='ubyte'
-        )
-        
-        # Update the image
-        if self.ids.fractal_image:
-            self.ids.fractal_image.texture = texture
-        
-        # Update status
-        self.is_computing = False
-        
-        # Update any UI elements that depend on the current state
-        if self.ids.status_label:
-            self.ids.status_label.text = "Ready"
-    
     def go_back_to_menu(self):
         """Return to the main menu"""
         self.manager.current = 'main_menu'
@@ -153,11 +152,27 @@ class MandelbrotExplorerScreen(Screen):
         """Compute the Mandelbrot set in a background thread"""
         try:
             with self._computing_lock:
-                # Update the set
-                self.mandelbrot.update_set()
+                # Automatic iterations: probe the view at low resolution
+                if self.auto_iterations:
+                    self.mandelbrot.maxiter, self._iteration_reason = auto_iterations(
+                        self.mandelbrot.escape_probe, self.base_iterations)
+                
+                # Use a prefetched frame if there is one, or render the set
+                # band by band, streaming each band into the texture
+                prefetched = self.prefetcher.lookup(self.mandelbrot)
+                self._last_render_prefetched = prefetched is not None
+                self.frame_timer.reset()
+                if prefetched is not None:
+                    self.mandelbrot.set, self.mandelbrot.coord = prefetched
+                    image_array = self.mandelbrot.set
+                    Clock.schedule_once(
+                        lambda dt: self.show_image(image_array, self.frame_timer), 0)
+                else:
+                    with self.frame_timer.stage('render'):
+                        self.render_progressive()
                 
-                # Get the resulting image
-                image_array = self.mandelbrot.set[::-1, :, :]
+                # The set is bottom row first, like Kivy textures: no flip
+                image_array = self.mandelbrot.set
                 
                 # Schedule UI update on the main thread
                 Clock.schedule_once(lambda dt: self.display_result(image_array), 0)
@@ -165,30 +180,201 @@ class MandelbrotExplorerScreen(Screen):
             print(f"Error computing Mandelbrot set: {e}")
             Clock.schedule_once(lambda dt: self.on_computation_error(str(e)), 0)
     
+    def render_progressive(self):
+        """Render the set in bands, uploading each band as it completes"""
+        mand = self.mandelbrot
+        width, height = mand.xpixels, mand.ypixels
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        Clock.schedule_once(lambda dt: self.prepare_texture(width, height), 0)
+        for y0 in range(0, height, self.progressive_rows):
+            y1 = min(y0 + self.progressive_rows, height)
+            frame[y0:y1] = mand.compute_rows(y0, y1, timer=self.frame_timer)
+            band = frame[y0:y1]
+            Clock.schedule_once(
+                lambda dt, band=band, y0=y0: self.blit_region(band, 0, y0, self.frame_timer), 0)
+        mand.set = frame
+    
     def display_result(self, image_array):
-        """Display the computed image on the UI thread"""
+        """Finish the display of a computed frame on the UI thread"""
         if not self.fractal_image:
             return
             
-        # Create texture from numpy array
-        texture = Texture.create(
-            size=(image_array.shape[1], image_array.shape[0]), 
-            colorfmt='rgb'
-        )
-        texture.blit_buffer(
-            image_array.tobytes(), 
-            colorfmt='rgb', 
-            bufferfmt='ubyte'
-        )
-        texture.flip_vertical()
-        
-        # Update the image widget
-        self.fractal_image.texture = texture
+        self._last_frame = image_array
         
         # Update UI
         self.is_computing = False
         if self.status_label:
-            self.status_label.text = "Ready"
+            status_text = "Ready"
+            if self._last_render_prefetched:
+                hit_rate = self.prefetcher.stats()['hit_rate']
+                status_text += f" (prefetched, hit rate {hit_rate:.0%})"
+            if self.auto_iterations and self._iteration_reason:
+                status_text += f" • {self.mandelbrot.maxiter} it: {self._iteration_reason}"
+            # Band uploads were scheduled before this callback: all timed
+            status_text += f" • {self.frame_timer.summary()}"
+            self.status_label.text = status_text
+        if self.frame_log is not None:
+            mand = self.mandelbrot
+            self.frame_log.write(
+                self.frame_timer, frontend='kivy',
+                source='prefetch' if self._last_render_prefetched else 'render',
+                xpixels=mand.xpixels, ypixels=mand.ypixels,
+                oversampling=mand.os, maxiter=mand.maxiter)
+        if startup.mark('first frame'):
+            print(f"Startup: {startup.summary()}")
+        
+        # Use the idle time to render the likely next views
+        self.schedule_prefetch()
+    
+    def show_scaled_preview(self, old_coord):
+        """Show the last frame transformed to the new view
+        
+        Immediate feedback for zooms: displayed until the real render of the
+        new view arrives.
+        """
+        self.stop_palette_cycling(redisplay=False)
+        if self._last_frame is None or not self.fractal_image:
+            return
+        preview = preview_zoomed_frame(Image.fromarray(self._last_frame, 'RGB'),
+                                       old_coord, self.mandelbrot.coord, origin='lower')
+        self.show_image(np.asarray(preview))
+    
+    def prepare_texture(self, width, height):
+        """Make the frame texture match the frame size
+        
+        The texture is kept from frame to frame and only recreated when the
+        size changes.
+        """
+        if self._texture is None or self._texture.size != (width, height):
+            self._texture = Texture.create(size=(width, height), colorfmt='rgb')
+            if self.fractal_image:
+                self.fractal_image.texture = self._texture
+        return self._texture
+    
+    def blit_region(self, image_array, x=0, y=0, timer=None):
+        """Upload an image, or a part of the frame, into the frame texture
+        
+        Args:
+            image_array: ndarray(dtype=uint8, ndim=3)
+                pixels, bottom row first (Mandelbrot origin 'lower'), rows
+                contiguous
+            x, y: int
+                position of the bottom-left pixel in the texture
+            timer: StageTimer
+                if given, the upload time is added to its 'upload' stage
+        """
+        if self._texture is None:
+            return
+        height, width = image_array.shape[:2]
+        # The array is read through the buffer protocol: no bytes copy
+        with maybe_stage(timer, 'upload'):
+            self._texture.blit_buffer(
+                np.ascontiguousarray(image_array).reshape(-1), 
+                size=(width, height),
+                pos=(x, y),
+                colorfmt='rgb', 
+                bufferfmt='ubyte'
+            )
+        # The texture object is unchanged: redraw explicitly
+        if self.fractal_image:
+            self.fractal_image.canvas.ask_update()
+    
+    def show_image(self, image_array, timer=None):
+        """Upload a full frame (bottom row first) to the image widget
+        
+        Args:
+            timer: StageTimer
+                if given, records the upload time (frames, not previews)
+        """
+        self.prepare_texture(image_array.shape[1], image_array.shape[0])
+        self.blit_region(image_array, timer=timer)
+    
+    def toggle_palette_cycling(self):
+        """Start or stop the palette cycling animation"""
+        if self.palette_cycling:
+            self.stop_palette_cycling()
+        else:
+            self.start_palette_cycling()
+    
+    def start_palette_cycling(self):
+        """Capture the displayed view in a background thread, then animate
+        its palette phase (see palette_cycle)"""
+        if self.palette_cycling or self.is_computing or self._last_frame is None:
+            return
+        self.palette_cycling = True
+        # The view as displayed, even if a render changes it meanwhile
+        view = copy.copy(self.mandelbrot)
+        cycler = PaletteCycler(speed=self.palette_cycle_speed)
+        self.palette_cycler = cycler
+        if self.status_label:
+            self.status_label.text = "Capturing the view for palette cycling..."
+        
+        def run():
+            try:
+                cycler.capture(view)
+            except Exception as e:
+                Clock.schedule_once(lambda dt: self.on_palette_cycling_error(str(e)), 0)
+                return
+            Clock.schedule_once(lambda dt: self._begin_palette_cycling(cycler), 0)
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def _begin_palette_cycling(self, cycler):
+        """Animate a captured view, unless cycling stopped meanwhile"""
+        if not self.palette_cycling or self.palette_cycler is not cycler:
+            return
+        self._cycle_start = self._cycle_report = time.perf_counter()
+        self._cycle_frames = 0
+        self._cycle_event = Clock.schedule_interval(self.cycle_palette, 1 / 60)
+    
+    def cycle_palette(self, dt):
+        """Display the next palette cycling frame"""
+        now = time.perf_counter()
+        self.show_image(self.palette_cycler.frame_at(now - self._cycle_start))
+        self._cycle_frames += 1
+        # Frame rate, once per second
+        if now - self._cycle_report >= 1 and self.status_label:
+            fps = self._cycle_frames / (now - self._cycle_report)
+            self.status_label.text = f"Palette cycling • {fps:.0f} fps"
+            self._cycle_report, self._cycle_frames = now, 0
+    
+    def stop_palette_cycling(self, redisplay=True):
+        """Stop the palette cycling animation
+        
+        Args:
+            redisplay: boolean
+                display the rendered frame again
+        """
+        if not self.palette_cycling:
+            return
+        self.palette_cycling = False
+        if self._cycle_event is not None:
+            self._cycle_event.cancel()
+            self._cycle_event = None
+        self.palette_cycler = None
+        if redisplay and self._last_frame is not None:
+            self.show_image(self._last_frame)
+            if self.status_label:
+                self.status_label.text = "Ready"
+    
+    def on_palette_cycling_error(self, error_msg):
+        """Handle a failed palette cycling capture"""
+        self.stop_palette_cycling(redisplay=False)
+        if self.status_label:
+            self.status_label.text = f"Palette cycling failed: {error_msg}"
+    
+    def schedule_prefetch(self):
+        """Prefetch the right-click zoom-out and the neighboring views"""
+        zoom_out = zoom_out_view(self.mandelbrot, 4.0)
+        # Parameters zoom_at_point will pick after zooming out
+        color_params = adjust_color_parameters(self.zoom_level / 4.0)
+        zoom_out.stripe_s = color_params["stripe_s"]
+        zoom_out.ncycle = color_params["ncycle"]
+        if self.dynamic_iterations and not self.auto_iterations:
+            new_iterations = estimate_required_iterations(self.zoom_level / 4.0, self.base_iterations)
+            if abs(new_iterations - zoom_out.maxiter) > 0.1 * zoom_out.maxiter:
+                zoom_out.maxiter = new_iterations
+        self.prefetcher.schedule([zoom_out] + neighbor_views(self.mandelbrot))
     
     def on_computation_error(self, error_msg):
         """Handle computation errors"""
@@ -196,9 +382,17 @@ class MandelbrotExplorerScreen(Screen):
         if self.status_label:
             self.status_label.text = f"Error: {error_msg}"
     
+    def toggle_auto_iterations(self):
+        """Switch between automatic and dynamic iterations, then render again"""
+        self.auto_iterations = not self.auto_iterations
+        if not self.auto_iterations:
+            self._iteration_reason = None
+            self.update_dynamic_iterations()
+        self.update_mandelbrot()
+    
     def update_dynamic_iterations(self):
         """Update iteration count based on zoom level"""
-        if not self.dynamic_iterations:
+        if not self.dynamic_iterations or self.auto_iterations:
             return
             
         # Calculate appropriate iterations based on zoom - now using base_iterations
@@ -217,6 +411,9 @@ class MandelbrotExplorerScreen(Screen):
     
     def on_touch_down(self, touch):
         """Handle touch down event for zooming"""
+        if self.collide_point(*touch.pos):
+            # Real input: stop speculative rendering
+            self.prefetcher.cancel()
         if self.collide_point(*touch.pos) and not self.is_computing:
             # Store touch position for possible dragging
             self._touch_drag_start = touch.pos
@@ -254,7 +451,9 @@ class MandelbrotExplorerScreen(Screen):
             
         # Apply zoom
         zoom_factor = 4.0 if zoom_out else 0.25
+        old_coord = list(self.mandelbrot.coord)
         self.mandelbrot.zoom_at(fx, fy, zoom_factor)
+        self.show_scaled_preview(old_coord)
         
         # Update zoom level
         self.zoom_level = self.zoom_level / 4.0 if zoom_out else self.zoom_level * 4.0
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+"""
+Lightweight timing of the stages of a frame.
+
+Stages can be nested: a stage opened inside another one, in the same thread,
+is recorded as 'parent/child', so that Mandelbrot.update_set can break the
+'render' stage of a frontend down into kernel, quantization and oversampling
+time. Frames can also be logged as JSON lines for offline analysis:
+
+  MANDELBROT_FRAME_LOG=frames.jsonl python mandelbrot_modern_gui.py
+
+The startup of the frontends is timed from the start of the process by the
+shared StartupTimer `startup` (imports, window shown, first frame).
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Environment variable naming the JSON lines log of the frontends
+FRAME_LOG_ENV = 'MANDELBROT_FRAME_LOG'
+
+
+class StageTimer:
+    """Wall-clock durations of the named stages of a frame"""
+
+    def __init__(self):
+        # Stage name -> duration in seconds, in order of first use
+        self.stages = {}
+        # Stages open in each thread, to name the nested ones
+        self._open = threading.local()
+
+    def reset(self):
+        """Forget the durations of the previous frame"""
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block, adding to the duration of stage name
+        (or 'parent/name' inside the stage parent)"""
+        stack = self._open.__dict__.setdefault('stack', [])
+        if stack:
+            name = f"{stack[-1]}/{name}"
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            stack.pop()
+
+    def add(self, name, seconds):
+        """Add a duration measured elsewhere to stage name"""
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def total(self):
+        """Sum of the durations of the top-level stages, in seconds"""
+        return sum(seconds for name, seconds in self.stages.items()
+                   if '/' not in name)
+
+    def summary(self):
+        """Compact one-line breakdown, nested stages in brackets, e.g.
+        'render 120.4 [kernel 110.2 quantize 5.1] • photo 2.1 ms'"""
+        if not self.stages:
+            return ""
+        parts = []
+        for name, seconds in self.stages.items():
+            if '/' in name:
+                continue
+            part = f"{name} {seconds*1000:.1f}"
+            children = [f"{child[len(name)+1:]} {value*1000:.1f}"
+                        for child, value in self.stages.items()
+                        if child.startswith(name + '/')]
+            if children:
+                part += f" [{' '.join(children)}]"
+            parts.append(part)
+        return " • ".join(parts) + " ms"
+
+
+def maybe_stage(timer, name):
+    """timer.stage(name), or a no-op context if timer is None"""
+    return nullcontext() if timer is None else timer.stage(name)
+
+
+class FrameLog:
+    """Stage durations of each frame, one JSON object per line"""
+
+    def __init__(self, path):
+        """Append frames to a log file
+
+        Args:
+            path: str
+                JSON lines file, created if needed
+        """
+        self.path = path
+        self.frames = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @classmethod
+    def from_env(cls):
+        """Log named by the MANDELBROT_FRAME_LOG variable, or None"""
+        path = os.environ.get(FRAME_LOG_ENV)
+        return cls(path) if path else None
+
+    def write(self, timer, **context):
+        """Log the stages of a frame
+
+        Args:
+            timer: StageTimer
+                stages of the frame
+            context:
+                frame description (size, iterations...), JSON serializable
+        """
+        record = {'time': time.time(), 'frame': self.frames,
+                  'total_ms': round(timer.total() * 1000, 3),
+                  'stages_ms': {name: round(seconds * 1000, 3)
+                                for name, seconds in timer.stages.items()}}
+        record.update(context)
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            self.frames += 1
+
+    def close(self):
+        """Close the log file"""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StartupTimer:
+    """Time from the start of the process to the milestones of a startup"""
+
+    def __init__(self):
+        # Start of the process (psutil), or of the timer (import time of
+        # this module)
+        self.origin = time.time()
+        if PSUTIL_AVAILABLE:
+            try:
+                self.origin = psutil.Process().create_time()
+            except psutil.Error:
+                pass
+        # Milestone name -> seconds since origin, in order
+        self.milestones = {}
+
+    def mark(self, name):
+        """Record milestone name, only the first time it is reached
+
+        Returns:
+            bool: True if the milestone is new
+        """
+        if name in self.milestones:
+            return False
+        self.milestones[name] = time.time() - self.origin
+        return True
+
+    def summary(self):
+        """One-line report, e.g. 'imports 0.41 • window 0.62 • first frame
+        3.20 s'"""
+        if not self.milestones:
+            return ""
+        return " • ".join(f"{name} {seconds:.2f}"
+                          for name, seconds in self.milestones.items()) + " s"
+
+
+# Startup milestones of the running frontend
+startup = StartupTimer()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+
+"""
+Interaction load test and session replay of the explorers.
+
+Sessions are sequences of input events (click, right_click, scroll,
+resize) with their timing, either synthetic (bursts of wheel ticks, clicks
+after a look at the frame, window drags) or recorded from a real session.
+They are replayed into ModernMandelbrotGUI or the Kivy explorer screen at
+their original pace, and for each input the harness measures:
+
+- input to first pixel: until anything new is drawn (e.g. the scaled preview
+  of a zoom)
+- input to final frame: until a frame rendered after the input is displayed
+- dropped inputs: inputs the explorer ignored (e.g. while computing)
+
+  python interaction_harness.py --record session.jsonl   # explore, then close
+  xvfb-run python interaction_harness.py --replay session.jsonl -o report.json
+  xvfb-run python interaction_harness.py --synthetic 200 --frontend kivy
+
+Pointer positions are stored relative to the image (0 to 1, from the top
+left), so that sessions can be replayed at any window size.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+EVENT_TYPES = ('click', 'right_click', 'scroll', 'resize')
+
+
+def synthetic_session(n_events=100, width=1400, height=900, seed=0):
+    """Input events of a plausible exploration session
+
+    Args:
+        n_events: int
+            approximate number of events
+        width, height: int
+            window size, the base of resize drags
+        seed: int
+            random seed, the same seed gives the same session
+
+    Returns:
+        list: events (dict with t in seconds from the start, type, u and v
+        for pointer events, delta for scroll, width and height for resize)
+    """
+    rng = random.Random(seed)
+    events = []
+    t = 1.0
+    u, v = 0.5, 0.5
+    while len(events) < n_events:
+        action = rng.choices(['scroll', 'click', 'right_click', 'resize'],
+                             weights=[50, 25, 15, 10])[0]
+        if action == 'scroll':
+            # Burst of wheel ticks at one point, tens of ms apart
+            t += rng.uniform(0.2, 1.0)
+            u = min(max(u + rng.gauss(0, 0.15), 0.05), 0.95)
+            v = min(max(v + rng.gauss(0, 0.15), 0.05), 0.95)
+            delta = 120 if rng.random() < 0.7 else -120
+            for _ in range(rng.randint(3, 8)):
+                events.append({'t': t, 'type': 'scroll', 'u': u, 'v': v,
+                               'delta': delta})
+                t += rng.uniform(0.03, 0.08)
+        elif action in ('click', 'right_click'):
+            # Look at the frame, then click somewhere
+            t += rng.uniform(0.4, 1.5)
+            u, v = rng.uniform(0.1, 0.9), rng.uniform(0.1, 0.9)
+            events.append({'t': t, 'type': action, 'u': u, 'v': v})
+        else:
+            # Window drag: configure events at the display rate
+            t += rng.uniform(0.5, 2.0)
+            target_w = rng.randint(width*3//4, width)
+            target_h = rng.randint(height*3//4, height)
+            steps = rng.randint(5, 15)
+            for i in range(1, steps + 1):
+                events.append({'t': t, 'type': 'resize',
+                               'width': width + (target_w - width)*i//steps,
+                               'height': height + (target_h - height)*i//steps})
+                t += 1/60
+            width, height = target_w, target_h
+    return events
+
+
+def save_session(events, path):
+    """Write events to a JSON lines file"""
+    with open(path, 'w') as file:
+        for event in events:
+            file.write(json.dumps(event) + '\n')
+
+
+def load_session(path):
+    """Read the events of a JSON lines file, sorted by time"""
+    with open(path) as file:
+        events = [json.loads(line) for line in file if line.strip()]
+    for event in events:
+        if event.get('type') not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event.get('type')!r}")
+    return sorted(events, key=lambda event: event['t'])
+
+
+def _percentiles(values):
+    """p50, p90, p99 and max of latencies, in milliseconds"""
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {'p50': round(float(np.percentile(values, 50)), 3),
+            'p90': round(float(np.percentile(values, 90)), 3),
+            'p99': round(float(np.percentile(values, 99)), 3),
+            'max': round(float(values.max()), 3)}
+
+
+class LatencyProbe:
+    """Latencies of inputs, from the explorer's display callbacks"""
+
+    def __init__(self):
+        # One record per input: type, time, latencies (None until known)
+        self.inputs = []
+        self._render_start = None
+        self.frames = 0
+
+    def input(self, kind):
+        """Record an input dispatched now, before its handler runs (which
+        may draw a preview)
+
+        Returns:
+            dict: record of the input, whose 'dropped' is to be set once the
+            handler returns
+        """
+        record = {'type': kind, 'time': time.perf_counter(), 'dropped': False,
+                  'first': None, 'final': None}
+        self.inputs.append(record)
+        return record
+
+    def render_started(self):
+        """A render of the current view starts"""
+        self._render_start = time.perf_counter()
+
+    def pixels_shown(self, final):
+        """Something was drawn: a preview, or the frame of the last render
+        started (final)"""
+        now = time.perf_counter()
+        for record in self.inputs:
+            if record['dropped']:
+                continue
+            if record['first'] is None:
+                record['first'] = now - record['time']
+            if (final and record['final'] is None
+                    and self._render_start is not None
+                    and record['time'] <= self._render_start):
+                record['final'] = now - record['time']
+        if final:
+            self.frames += 1
+
+    def report(self):
+        """Latency percentiles (ms) and input counts, overall and per type"""
+        def summarize(records):
+            accepted = [r for r in records if not r['dropped']]
+            return {
+                'inputs': len(records),
+                'dropped': len(records) - len(accepted),
+                'unresolved': sum(1 for r in accepted if r['final'] is None),
+                'first_pixel_ms': _percentiles(
+                    [r['first'] for r in accepted if r['first'] is not None]),
+                'final_frame_ms': _percentiles(
+                    [r['final'] for r in accepted if r['final'] is not None]),
+            }
+        report = summarize(self.inputs)
+        report['frames'] = self.frames
+        report['by_type'] = {kind: summarize([r for r in self.inputs
+                                              if r['type'] == kind])
+                             for kind in EVENT_TYPES
+                             if any(r['type'] == kind for r in self.inputs)}
+        return report
+
+
+class TkDriver:
+    """Dispatch events to ModernMandelbrotGUI and probe its display"""
+
+    def __init__(self, gui, probe):
+        self.gui = gui
+        self.probe = probe
+        # Wrap the instance methods the GUI calls through self
+        display_image = gui.display_image
+        update_mandelbrot = gui.update_mandelbrot
+
+        def probed_display(image=None):
+            display_image(image)
+            probe.pixels_shown(final=image is None)
+
+        def probed_update():
+            was_computing = gui.is_computing
+            update_mandelbrot()
+            if gui.is_computing and not was_computing:
+                probe.render_started()
+
+        gui.display_image = probed_display
+        gui.update_mandelbrot = probed_update
+
+    def dispatch(self, event):
+        """Send one event to the GUI, as Tk would"""
+        gui = self.gui
+        canvas = gui.preview_canvas
+        if event['type'] == 'resize':
+            # Resizes are only followed by a render when idle
+            record = self.probe.input('resize')
+            record['dropped'] = gui.is_computing
+            gui.root.geometry(f"{event['width']}x{event['height']}")
+            return
+        tk_event = SimpleNamespace(
+            x=round(event['u'] * canvas.winfo_width()),
+            y=round(event['v'] * canvas.winfo_height()),
+            delta=event.get('delta', 120), widget=canvas)
+        handler = {'click': gui.on_canvas_click,
+                   'right_click': gui.on_canvas_right_click,
+                   'scroll': gui.on_canvas_scroll}[event['type']]
+        before = tuple(gui.mandelbrot.coord)
+        record = self.probe.input(event['type'])
+        handler(tk_event)
+        record['dropped'] = tuple(gui.mandelbrot.coord) == before
+
+    def busy(self):
+        """Whether a render is running or scheduled"""
+        gui = self.gui
+        return (gui.is_computing or gui.update_pending
+                or bool(getattr(gui, '_resize_job', None)))
+
+
+class KivyDriver:
+    """Dispatch events to MandelbrotExplorerScreen and probe its display"""
+
+    def __init__(self, screen, probe):
+        self.screen = screen
+        self.probe = probe
+        blit_region = screen.blit_region
+        display_result = screen.display_result
+        update_mandelbrot = screen.update_mandelbrot
+
+        def probed_blit(image_array, x=0, y=0, timer=None):
+            # Previews and the bands of progressive renders
+            blit_region(image_array, x, y, timer)
+            probe.pixels_shown(final=False)
+
+        def probed_result(image_array):
+            display_result(image_array)
+            probe.pixels_shown(final=True)
+
+        def probed_update(*args):
+            was_computing = screen.is_computing
+            update_mandelbrot(*args)
+            if screen.is_computing and not was_computing:
+                probe.render_started()
+
+        screen.blit_region = probed_blit
+        screen.display_result = probed_result
+        screen.update_mandelbrot = probed_update
+
+    def dispatch(self, event):
+        """Send one event to the screen, as its touch handlers would"""
+        screen = self.screen
+        image = screen.fractal_image
+        if event['type'] == 'resize':
+            from kivy.clock import Clock
+            from kivy.core.window import Window
+            record = self.probe.input('resize')
+            record['dropped'] = screen.is_computing
+            Window.size = (event['width'], event['height'])
+            # Rendered at the new size once the layout is updated
+            Clock.schedule_once(lambda dt: screen.update_mandelbrot(), 0)
+            return
+        if event['type'] == 'scroll':
+            # The Kivy explorer has no wheel zoom
+            self.probe.input('scroll')['dropped'] = True
+            return
+        # Kivy positions are from the bottom left
+        pos = (image.x + event['u'] * image.width,
+               image.y + (1 - event['v']) * image.height)
+        before = tuple(screen.mandelbrot.coord)
+        record = self.probe.input(event['type'])
+        screen.zoom_at_point(pos, zoom_out=event['type'] == 'right_click')
+        record['dropped'] = tuple(screen.mandelbrot.coord) == before
+
+    def busy(self):
+        """Whether a render is running"""
+        return self.screen.is_computing
+
+
+def replay_tk(gui, events, speed=1.0, settle=1.0, timeout=60.0):
+    """Replay events into a running ModernMandelbrotGUI
+
+    Events are scheduled on the Tk event loop; the loop is left once the
+    last event is dispatched and no render has run for settle seconds (or
+    after timeout seconds).
+
+    Returns:
+        dict: latency report, see LatencyProbe.report
+    """
+    probe = LatencyProbe()
+    driver = TkDriver(gui, probe)
+    root = gui.root
+    start = time.perf_counter()
+    remaining = [len(events)]
+
+    def fire(event):
+        driver.dispatch(event)
+        remaining[0] -= 1
+
+    for event in events:
+        root.after(int(event['t'] / speed * 1000), fire, event)
+
+    idle_since = [None]
+
+    def watch():
+        now = time.perf_counter()
+        if remaining[0] == 0 and not driver.busy():
+            idle_since[0] = idle_since[0] or now
+        else:
+            idle_since[0] = None
+        last = events[-1]['t'] / speed if events else 0
+        if ((idle_since[0] is not None and now - idle_since[0] >= settle)
+                or now - start > last + timeout):
+            root.quit()
+            return
+        root.after(20, watch)
+
+    root.after(0, watch)
+    root.mainloop()
+    return probe.report()
+
+
+def replay_kivy(screen, events, on_done, speed=1.0, settle=1.0,
+                timeout=60.0):
+    """Replay events into a MandelbrotExplorerScreen, on the Kivy clock
+
+    Args:
+        on_done: function
+            called with the latency report when the replay is over
+    """
+    from kivy.clock import Clock
+
+    probe = LatencyProbe()
+    driver = KivyDriver(screen, probe)
+    start = time.perf_counter()
+    remaining = [len(events)]
+    idle_since = [None]
+
+    def fire(event):
+        driver.dispatch(event)
+        remaining[0] -= 1
+
+    for event in events:
+        Clock.schedule_once(lambda dt, event=event: fire(event),
+                            event['t'] / speed)
+
+    def watch(dt):
+        now = time.perf_counter()
+        if remaining[0] == 0 and not driver.busy():
+            idle_since[0] = idle_since[0] or now
+        else:
+            idle_since[0] = None
+        last = events[-1]['t'] / speed if events else 0
+        if ((idle_since[0] is not None and now - idle_since[0] >= settle)
+                or now - start > last + timeout):
+            on_done(probe.report())
+            return False
+
+    Clock.schedule_interval(watch, 0.02)
+
+
+class SessionRecorder:
+    """Record the inputs of a real ModernMandelbrotGUI session"""
+
+    def __init__(self, gui):
+        self.gui = gui
+        self.events = []
+        self._start = None
+        canvas = gui.preview_canvas
+        # Added bindings: the GUI handlers still run
+        canvas.bind("<Button-1>", lambda e: self._pointer('click', e), add='+')
+        canvas.bind("<Button-3>", lambda e: self._pointer('right_click', e), add='+')
+        canvas.bind("<MouseWheel>", lambda e: self._pointer('scroll', e), add='+')
+        gui.root.bind("<Configure>", self._configure, add='+')
+
+    def _time(self):
+        now = time.perf_counter()
+        if self._start is None:
+            # The session starts one second before the first input
+            self._start = now - 1.0
+        return now - self._start
+
+    def _pointer(self, kind, event):
+        canvas = self.gui.preview_canvas
+        record = {'t': self._time(), 'type': kind,
+                  'u': event.x / max(canvas.winfo_width(), 1),
+                  'v': event.y / max(canvas.winfo_height(), 1)}
+        if kind == 'scroll':
+            record['delta'] = event.delta
+        self.events.append(record)
+
+    def _configure(self, event):
+        # Configure events of the window itself, not of its children
+        if event.widget is self.gui.root and self._start is not None:
+            self.events.append({'t': self._time(), 'type': 'resize',
+                                'width': event.width, 'height': event.height})
+
+
+def _tk_gui(width, height):
+    """ModernMandelbrotGUI in a new window of the given size"""
+    import tkinter as tk
+    from mandelbrot_modern_gui import ModernMandelbrotGUI
+
+    root = tk.Tk()
+    root.geometry(f"{width}x{height}")
+    root.update()
+    return ModernMandelbrotGUI(root)
+
+
+def _run_kivy(events, speed):
+    """Replay in the Kivy application, return the report"""
+    from kivy.clock import Clock
+    from mandelbrot_app import FractalExplorerApp
+
+    app = FractalExplorerApp()
+    result = {}
+
+    def done(report):
+        result.update(report)
+        app.stop()
+
+    def begin(dt):
+        screen = app.open_screen('mandelbrot_explorer')
+        # Start once the first frame is displayed
+        def wait_first(dt):
+            if screen._last_frame is None:
+                return True
+            replay_kivy(screen, events, done, speed)
+            return False
+        Clock.schedule_interval(wait_first, 0.05)
+
+    Clock.schedule_once(begin, 0)
+    app.run()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay input sessions into the explorers and measure "
+                    "navigation latency")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', type=int, metavar='N',
+                        help="replay a synthetic session of about N events")
+    source.add_argument('--replay', metavar='SESSION',
+                        help="replay a recorded session (JSON lines)")
+    source.add_argument('--record', metavar='SESSION',
+                        help="record a session of the Tk GUI until it is "
+                             "closed")
+    parser.add_argument('--frontend', choices=('tk', 'kivy'), default='tk')
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the synthetic session")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed factor (2: twice as fast)")
+    parser.add_argument('--size', default='1400x900',
+                        help="window size, WIDTHxHEIGHT")
+    parser.add_argument('-o', '--output', help="JSON file of the report")
+    args = parser.parse_args(argv)
+    width, height = (int(v) for v in args.size.lower().split('x'))
+
+    if args.record:
+        gui = _tk_gui(width, height)
+        recorder = SessionRecorder(gui)
+        gui.root.mainloop()
+        save_session(recorder.events, args.record)
+        print(f"{len(recorder.events)} events recorded to {args.record}")
+        return 0
+
+    if args.replay:
+        events = load_session(args.replay)
+    else:
+        events = synthetic_session(args.synthetic, width, height, args.seed)
+
+    if args.frontend == 'tk':
+        gui = _tk_gui(width, height)
+        # Wait for the first frame before the session starts
+        while gui.current_image is None:
+            gui.root.update()
+            time.sleep(0.01)
+        report = replay_tk(gui, events, args.speed)
+        gui.on_close()
+    else:
+        report = _run_kivy(events, args.speed)
+
+    for name, summary in [('all', report)] + list(report['by_type'].items()):
+        print(f"{name:<12} inputs {summary['inputs']:>4} "
+              f"dropped {summary['dropped']:>4} "
+              f"unresolved {summary['unresolved']:>3}  "
+              f"first pixel {summary['first_pixel_ms']}  "
+              f"final frame {summary['final_frame_ms']}")
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,11 +9,14 @@ import os
 import kivy
 from kivy.resources import resource_add_path
 from mandelbrot_app import FractalExplorerApp
+from frame_timing import startup
 
 if __name__ == '__main__':
     # Make sure current directory is in path
     current_dir = os.path.dirname(os.path.abspath(__file__))
     resource_add_path(current_dir)
     
+    startup.mark('imports')
+    
     # Start the Kivy application
     FractalExplorerApp().run()
@@ -24,7 +24,7 @@ class FractalCard(BoxLayout):
         """Handle touch on card - navigate to appropriate fractal"""
         if self.collide_point(*touch.pos) and self.enabled[3] > 0.5:
             if self.fractal_type == 'mandelbrot':
-                self.parent.parent.parent.manager.current = 'mandelbrot_explorer'
+                App.get_running_app().open_screen('mandelbrot_explorer')
                 return True
         return super(FractalCard, self).on_touch_down(touch)
 
@@ -46,8 +46,8 @@ class FractalButton(Image):
             target = 'mandelbrot_explorer'
 
         if target:
-            # app.root is the ScreenManager
-            app.root.current = target
+            # Explorers are created when first opened
+            app.open_screen(target)
             return True
 
         return super(FractalButton, self).on_touch_down(touch)
@@ -11,38 +11,15 @@ smoothly colored with custom colortables.
 
 import math
 import numpy as np
-import matplotlib.pyplot as plt
-from numba import jit, cuda
-from matplotlib.widgets import Slider
+from numba import jit
 from PIL import Image
-import imageio
 
-def sin_colortable(rgb_thetas=(.85, .0, .15), ncol=2**12):
-    """ Sinusoidal color table
-   
-    Cyclic and smooth color table made with a sinus function for each color
-    channel   
-    Args:
-        rgb_thetas: (float, float, float)
-            phase for each color channel
-        ncol: int
-            number of color in the output table
+from frame_timing import maybe_stage
+from escape_stats import EscapeStats
+# sin_colortable is also imported from here
+from palettes import colortable, palette_params, sin_colortable
 
-    Returns:
-        ndarray(dtype=float, ndim=2): color table
-    """
-    def colormap(x, rgb_thetas):
-        # x in [0,1]
-        # Compute the frequency and phase of each channel
-        y = np.column_stack(((x + rgb_thetas[0]) * 2 * math.pi,
-                             (x + rgb_thetas[1]) * 2 * math.pi,
-                             (x + rgb_thetas[2]) * 2 * math.pi))
-        # Set amplitude to [0,1]
-        val = 0.5 + 0.5*np.sin(y)
-        return val
-    return colormap(np.linspace(0, 1, ncol), rgb_thetas)
-
-@jit
+@jit(nogil=True, cache=True)
 def blinn_phong(normal, light):
     """ Blinn-Phong shading algorithm
    
@@ -83,7 +60,16 @@ def blinn_phong(normal, light):
     bright = bright * light[2] + (1-light[2])/2 
     return bright
     
-@jit
+# Exit codes of smooth_iter_stats: how the iteration of a point ended
+EXIT_ESCAPED = 0    # escape radius reached
+EXIT_MAXITER = 1    # maxiter reached
+EXIT_PERIODIC = 2   # periodicity check: cycle detected
+EXIT_SLOW = 3       # slow-change check: z no longer moves
+
+# Colortable index of the points of the set in compute_shading (drawn black)
+INTERIOR_INDEX = 0xFFFF
+
+@jit(nogil=True, cache=True)
 def smooth_iter(c, maxiter, stripe_s, stripe_sig):
     """ Smooth number of iteration in the Mandelbrot set for given c
    
@@ -103,6 +89,23 @@ def smooth_iter(c, maxiter, stripe_s, stripe_sig):
         - dem: estimate of distance to the nearest point of the set
         - normal, used for shading
     """
+    niter, stripe_a, dem, normal, _, _ = smooth_iter_stats(c, maxiter,
+                                                           stripe_s,
+                                                           stripe_sig)
+    return (niter, stripe_a, dem, normal)
+
+@jit(nogil=True, cache=True)
+def smooth_iter_stats(c, maxiter, stripe_s, stripe_sig):
+    """ Smooth number of iteration, with the iterations done and exit code
+   
+    Same arguments as smooth_iter.
+
+    Returns: (float, float, float, complex, int, int)
+        - smooth iteration count, stripe average, dem and normal, as
+          returned by smooth_iter
+        - number of iterations actually done
+        - exit code: EXIT_ESCAPED, EXIT_MAXITER, EXIT_PERIODIC or EXIT_SLOW
+    """
     # Escape radius squared: use a higher radius for better precision in deep zooms
     # The higher the radius, the better the estimate of the smooth iteration count
     esc_radius_2 = 10**10
@@ -137,7 +140,7 @@ def smooth_iter(c, maxiter, stripe_s, stripe_sig):
                 period_z = z
             elif abs(z - period_z) < 1e-10:
                 # If we've returned to approximately the same point, we're in a cycle
-                return (0, 0, 0, 0)
+                return (0, 0, 0, 0, n+1, EXIT_PERIODIC)
         
         if stripe:
             # Stripe Average Coloring
@@ -180,12 +183,12 @@ def smooth_iter(c, maxiter, stripe_s, stripe_sig):
 
             # real smoothiter: n+smooth_i (1 > smooth_i > 0)
             # so smoothiter <= niter, in particular: smoothiter <= maxiter
-            return (n+smooth_i, stripe_a, dem, normal)
+            return (n+smooth_i, stripe_a, dem, normal, n+1, EXIT_ESCAPED)
             
         # Check for extremely slow change, which suggests we're in the set
         # This helps bail out earlier for deep zooms
         if n > 10 and abs(z - prev_z) < 1e-14 and abs(z) > 1e-14:
-            return (0, 0, 0, 0)
+            return (0, 0, 0, 0, n+1, EXIT_SLOW)
             
         prev_z = z
        
@@ -193,54 +196,49 @@ def smooth_iter(c, maxiter, stripe_s, stripe_sig):
             stripe_a = stripe_a * stripe_sig + stripe_t * (1-stripe_sig)
            
     # Otherwise: set parameters to 0
-    return (0,0,0,0)
+    return (0, 0, 0, 0, maxiter, EXIT_MAXITER)
            
-@jit
-def color_pixel(matxy, niter, stripe_a, step_s, dem, normal, colortable,
-                ncycle, light):
-    """ Colors given pixel, in-place
+@jit(nogil=True, cache=True)
+def overlay(x, y, gamma):
+    """x, y  and gamma floats in [0,1]. Returns float in [0,1]"""
+    if (2*y) < 1:
+        out = 2*x*y
+    else:
+        out = 1 - 2 * (1 - x) * (1 - y)
+    return out * gamma + x * (1-gamma)
+
+@jit(nogil=True, cache=True)
+def shade_pixel(niter, stripe_a, step_s, dem, normal, ncol, ncycle, light):
+    """ Colortable index and brightness of a pixel
    
-    Coloring is based on the smooth iteration count niter which cycles through
-    the colortable (every ncycle). Then, shading is added using the stripe
+    The index cycles through the colortable (every ncycle) with the smooth
+    iteration count niter. The brightness adds shading using the stripe
     average coloring, distance estimate and normal for lambert shading.
    
     Args:
-        matxy: ndarray(dtype=float, ndim=1)
-            pixel to color, 3 values in [0,1]
         niter: float
             smooth iteration count
         stripe_a: float
             stripe average coloring value
+        step_s: float
+            step density
         dem: float
             boundary distance estimate
         normal: complex
             normal
-        colortable: ndarray(dtype=uint8, ndim=2)
-            cyclic RGB colortable
+        ncol: int
+            last index of the colortable
         ncycle: float
             number of iteration before cycling the colortable
-           
 
-    Returns: (float, float, float, complex)
-        - smooth iteration count at escape, 0 if maxiter is reached
-        - stripe average coloring value, in [0,1]
-        - dem: estimate of distance to the nearest point of the set
-        - normal, used for shading
+    Returns: (int, float)
+        - colortable index, in [0, ncol]
+        - brightness, applied to the color in overlay mode (not clipped)
     """
-
-    ncol = colortable.shape[0] - 1
     # Power post-transform and mapping to [0,1]
     niter = math.sqrt(niter) % ncycle / ncycle
     # Cycle through colortable
     col_i = round(niter * ncol)
-
-    def overlay(x, y, gamma):
-        """x, y  and gamma floats in [0,1]. Returns float in [0,1]"""
-        if (2*y) < 1:
-            out = 2*x*y
-        else:
-            out = 1 - 2 * (1 - x) * (1 - y)
-        return out * gamma + x * (1-gamma)
     
     # brightness with Blinn Phong shading
     bright = blinn_phong(normal, light)
@@ -275,6 +273,36 @@ def color_pixel(matxy, niter, stripe_a, step_s, dem, normal, colortable,
     # Applying shaders to brightness
     if nshader > 0:
         bright = overlay(bright, shader/nshader, 1) * (1-dem) + dem * bright
+    return col_i, bright
+
+@jit(nogil=True, cache=True)
+def color_pixel(matxy, niter, stripe_a, step_s, dem, normal, colortable,
+                ncycle, light):
+    """ Colors given pixel, in-place
+   
+    Coloring is based on the smooth iteration count niter which cycles through
+    the colortable (every ncycle). Then, shading is added using the stripe
+    average coloring, distance estimate and normal for lambert shading (see
+    shade_pixel).
+   
+    Args:
+        matxy: ndarray(dtype=float, ndim=1)
+            pixel to color, 3 values in [0,1]
+        niter: float
+            smooth iteration count
+        stripe_a: float
+            stripe average coloring value
+        dem: float
+            boundary distance estimate
+        normal: complex
+            normal
+        colortable: ndarray(dtype=float32, ndim=2)
+            cyclic RGB colortable
+        ncycle: float
+            number of iteration before cycling the colortable
+    """
+    col_i, bright = shade_pixel(niter, stripe_a, step_s, dem, normal,
+                                colortable.shape[0] - 1, ncycle, light)
     # Set pixel color with brightness
     for i in range(3):
         # Pixel color
@@ -284,7 +312,7 @@ def color_pixel(matxy, niter, stripe_a, step_s, dem, normal, colortable,
         # Clipping to [0,1]
         matxy[i] = max(0,min(1, matxy[i]))
         
-@jit
+@jit(nogil=True, cache=True)
 def compute_set(creal, cim, maxiter, colortable, ncycle, stripe_s, stripe_sig,
                 step_s, diag, light):
     """ Compute and color the Mandelbrot set (CPU version)
@@ -296,7 +324,7 @@ def compute_set(creal, cim, maxiter, colortable, ncycle, stripe_s, stripe_sig,
             vector of imaginary coordinates
         maxiter: int
             maximal number of iterations
-        colortable: ndarray(dtype=uint8, ndim=2)
+        colortable: ndarray(dtype=float32, ndim=2)
             cyclic RGB colortable
         ncycle: float
             number of iteration before cycling the colortable
@@ -330,12 +358,196 @@ def compute_set(creal, cim, maxiter, colortable, ncycle, stripe_s, stripe_sig,
                             ncycle, light)
     return mat
 
-@cuda.jit
+@jit(nogil=True, cache=True)
+def compute_set_stats(creal, cim, maxiter, colortable, ncycle, stripe_s,
+                      stripe_sig, step_s, diag, light, counts, histogram):
+    """ Compute and color the Mandelbrot set, counting iterations (CPU)
+   
+    Same as compute_set, and accumulates escape statistics of the points.
+   
+    Args:
+        counts: ndarray(dtype=int64, ndim=1)
+            counters, updated in-place: total iterations, then number of
+            points per exit code (index 1 + EXIT_*)
+        histogram: ndarray(dtype=int64, ndim=1)
+            escape counts of the escaped points, in len(histogram) bins
+            evenly spread over [1, maxiter] on a log scale, updated in-place
+
+    Returns:
+        ndarray(dtype=uint8, ndim=3): image of the Mandelbrot set
+    """
+    xpixels = len(creal)
+    ypixels = len(cim)
+    nbins = len(histogram)
+    log_range = math.log(maxiter + 1)
+    mat = np.zeros((ypixels, xpixels, 3))
+    for x in range(xpixels):
+        for y in range(ypixels):
+            c = complex(creal[x], cim[y])
+            niter, stripe_a, dem, normal, n, code = smooth_iter_stats(
+                c, maxiter, stripe_s, stripe_sig)
+            counts[0] += n
+            counts[1 + code] += 1
+            if code == EXIT_ESCAPED:
+                histogram[min(int(math.log(n) / log_range * nbins),
+                              nbins - 1)] += 1
+            if niter > 0:
+                color_pixel(mat[y,x,], niter, stripe_a, step_s, dem/diag,
+                            normal, colortable,
+                            ncycle, light)
+    return mat
+
+@jit(nogil=True, cache=True)
+def compute_escape_counts(creal, cim, maxiter):
+    """ Smooth escape counts of a grid of points, without coloring
+   
+    Cheap probe of the escape-time distribution of a view, e.g. to choose
+    maxiter.
+   
+    Args:
+        creal: ndarray(dtype=float, ndim=1)
+            vector of real coordinates
+        cim: ndarray(dtype=float, ndim=1)
+            vector of imaginary coordinates
+        maxiter: int
+            maximal number of iterations
+
+    Returns:
+        ndarray(dtype=float, ndim=2): smooth iteration count of each point,
+        0 if it did not escape
+    """
+    niter = np.zeros((len(cim), len(creal)))
+    for x in range(len(creal)):
+        for y in range(len(cim)):
+            niter[y, x] = smooth_iter(complex(creal[x], cim[y]), maxiter,
+                                      0, 0)[0]
+    return niter
+
+@jit(nogil=True, cache=True)
+def compute_shading(creal, cim, maxiter, ncol, ncycle, stripe_s, stripe_sig,
+                    step_s, diag, light):
+    """ Colortable index and brightness of a grid of points
+   
+    What color_pixel looks up in the colortable, stored so that the image
+    can be recolored with a shifted palette without iterating again (see
+    palette_cycle).
+   
+    Args:
+        creal: ndarray(dtype=float, ndim=1)
+            vector of real coordinates
+        cim: ndarray(dtype=float, ndim=1)
+            vector of imaginary coordinates
+        maxiter: int
+            maximal number of iterations
+        ncol: int
+            last index of the colortable
+
+    Returns: (ndarray(dtype=uint16, ndim=2), ndarray(dtype=uint8, ndim=2))
+        - colortable index of each point, INTERIOR_INDEX if it did not escape
+        - brightness, clipped to [0,1] and scaled to [0,255]
+    """
+    index = np.full((len(cim), len(creal)), INTERIOR_INDEX, dtype=np.uint16)
+    bright = np.zeros((len(cim), len(creal)), dtype=np.uint8)
+    for x in range(len(creal)):
+        for y in range(len(cim)):
+            niter, stripe_a, dem, normal = smooth_iter(
+                complex(creal[x], cim[y]), maxiter, stripe_s, stripe_sig)
+            if niter > 0:
+                col_i, b = shade_pixel(niter, stripe_a, step_s, dem/diag,
+                                       normal, ncol, ncycle, light)
+                index[y, x] = col_i
+                # Overlay with a brightness out of [0,1] clips the color
+                # like a brightness of 0 or 1
+                bright[y, x] = round(max(0, min(1, b)) * 255)
+    return index, bright
+
+@jit(nogil=True, cache=True)
+def compute_fields(creal, cim, maxiter, stripe_s, stripe_sig):
+    """ Escape-time fields of a grid of points, without coloring
+   
+    The fields hold everything color_fields needs, so that they can be
+    stored and recolored with any colortable, light or step shading.
+   
+    Args:
+        creal: ndarray(dtype=float, ndim=1)
+            vector of real coordinates
+        cim: ndarray(dtype=float, ndim=1)
+            vector of imaginary coordinates
+        maxiter: int
+            maximal number of iterations
+        stripe_s:
+            frequency parameter of stripe average coloring
+        stripe_sig:
+            memory parameter of stripe average coloring
+
+    Returns:
+        ndarray(dtype=float, ndim=3): fields of shape (5, len(cim),
+        len(creal)): smooth iteration count (0 if it did not escape), stripe
+        average, distance estimate, real and imaginary parts of the normal
+    """
+    fields = np.zeros((5, len(cim), len(creal)))
+    for x in range(len(creal)):
+        for y in range(len(cim)):
+            niter, stripe_a, dem, normal = smooth_iter(
+                complex(creal[x], cim[y]), maxiter, stripe_s, stripe_sig)
+            if niter > 0:
+                fields[0, y, x] = niter
+                fields[1, y, x] = stripe_a
+                fields[2, y, x] = dem
+                fields[3, y, x] = normal.real
+                fields[4, y, x] = normal.imag
+    return fields
+
+@jit(nogil=True, cache=True)
+def color_fields(fields, colortable, ncycle, step_s, diag, light):
+    """ Color escape-time fields given by compute_fields
+   
+    Args:
+        fields: ndarray(dtype=float, ndim=3)
+            escape-time fields, see compute_fields
+        colortable: ndarray(dtype=float32, ndim=2)
+            cyclic RGB colortable
+        ncycle: float
+            number of iteration before cycling the colortable
+        diag: float
+            frame diagonal, normalizing the distance estimate
+
+    Returns:
+        ndarray(dtype=float, ndim=3): image of the Mandelbrot set, same as
+        compute_set for float64 fields
+    """
+    ypixels = fields.shape[1]
+    xpixels = fields.shape[2]
+    mat = np.zeros((ypixels, xpixels, 3))
+    for x in range(xpixels):
+        for y in range(ypixels):
+            niter = fields[0, y, x]
+            if niter > 0:
+                color_pixel(mat[y,x,], niter, fields[1, y, x], step_s,
+                            fields[2, y, x]/diag,
+                            complex(fields[3, y, x], fields[4, y, x]),
+                            colortable, ncycle, light)
+    return mat
+
+# numba.cuda and the CUDA kernel, imported and compiled on first use by
+# gpu_kernel: importing numba.cuda is slow and only GPU renders need it
+cuda = None
+_compute_set_gpu = None
+
+def gpu_kernel():
+    """compute_set_gpu compiled for CUDA (numba.cuda imported once)"""
+    global cuda, _compute_set_gpu
+    if _compute_set_gpu is None:
+        from numba import cuda
+        _compute_set_gpu = cuda.jit(compute_set_gpu)
+    return _compute_set_gpu
+
 def compute_set_gpu(mat, xmin, xmax, ymin, ymax, maxiter, colortable, ncycle,
                     stripe_s, stripe_sig, step_s, diag, light):
     """ Compute and color the Mandelbrot set (GPU version)
    
-    Uses a 1D-grid with blocks of 32 threads.
+    Uses a 1D-grid with blocks of 32 threads. Compiled for CUDA by
+    gpu_kernel, on first use.
    
     Args:
         mat: ndarray(dtype=uint8, ndim=3)
@@ -344,7 +556,7 @@ def compute_set_gpu(mat, xmin, xmax, ymin, ymax, maxiter, colortable, ncycle,
             coordinates of the set
         maxiter: int
             maximal number of iterations
-        colortable: ndarray(dtype=uint8, ndim=2)
+        colortable: ndarray(dtype=float32, ndim=2)
             cyclic RGB colortable
         ncycle: float
             number of iteration before cycling the colortable
@@ -383,7 +595,8 @@ class Mandelbrot():
                  coord=(-2.6, 1.845, -1.25, 1.25), gpu=True, ncycle=32,
                  rgb_thetas=(.0, .15, .25), oversampling=3, stripe_s=0,
                  stripe_sig=.9, step_s=0,
-                 light = (45., 45., .75, .2, .5, .5, 20)):
+                 light = (45., 45., .75, .2, .5, .5, 20), origin='lower',
+                 compute=True, palette=None):
         """Mandelbrot set object
    
         Args:
@@ -415,6 +628,17 @@ class Mandelbrot():
             light: (float, float, float)
                 light vector: angle azimuth [0-360], angle elevation [0-90],
                 opacity [0,1], k_ambiant, k_diffuse, k_spectral, shininess
+            origin: str
+                'lower' (row 0 of the set is the bottom of the frame, as in
+                matplotlib's origin='lower') or 'upper' (display orientation,
+                row 0 is the top of the frame)
+            compute: boolean
+                compute the set when it is first used (self.set), unless
+                update_set is called before. Set to False to leave it None
+                until update_set.
+            palette: str or [(float, color), ...]
+                gradient palette, registered name or color stops (see
+                palettes). None for the sinusoidal palette of rgb_thetas.
            
         """
         self.explorer = None
@@ -428,6 +652,11 @@ class Mandelbrot():
         self.stripe_s = stripe_s
         self.stripe_sig = stripe_sig
         self.step_s = step_s
+        self.origin = origin
+        # Frame diagonal used to normalize the distance estimate; None to use
+        # the diagonal of coord. Set it when rendering a part of a larger
+        # frame, so the shading matches the full frame.
+        self.diag = None
         # Light angles mapping
         self.light = np.array(light)
         self.light[0] = 2*math.pi*self.light[0]/360
@@ -436,57 +665,331 @@ class Mandelbrot():
         self.ypixels = round(self.xpixels / (self.coord[1]-self.coord[0]) *
                              (self.coord[3]-self.coord[2]))
         # Initialization of colortable
-        self.colortable = sin_colortable(self.rgb_thetas)
-        # Compute the set
-        self.update_set()
+        self.palette = palette
+        self.update_colortable()
+        # Escape statistics of the last update_set (CPU only), see
+        # escape_stats; collected when collect_stats is True
+        self.collect_stats = False
+        self.stats = None
+        # The set is computed on first use: the size or the view are often
+        # changed before (construction stays cheap)
+        self._set = None
+        self._set_pending = compute
 
-    def update_set(self):
+    def update_colortable(self):
+        """Colortable of the palette (or of rgb_thetas), from the cache of
+        palettes: call it after changing palette or rgb_thetas"""
+        self.colortable = colortable(self.rgb_thetas, self.palette)
+
+    @property
+    def set(self):
+        """Image of the set, computed on first access if still pending"""
+        if self._set_pending:
+            self.update_set()
+        return self._set
+
+    @set.setter
+    def set(self, image):
+        self._set_pending = False
+        self._set = image
+
+    @property
+    def current_set(self):
+        """Image of the set if computed, else None (never renders)"""
+        return None if self._set_pending else self._set
+
+    @classmethod
+    def from_render_params(cls, params, gpu=False):
+        """Mandelbrot object rendering exactly as the one params come from
+   
+        Args:
+            params: dict
+                output of render_params (e.g. sent over the network)
+            gpu: boolean
+                use CUDA on GPU to compute the set
+
+        Returns:
+            Mandelbrot: object with the given parameters, set not computed
+        """
+        mand = cls(xpixels=params['xpixels'], maxiter=params['maxiter'],
+                   coord=list(params['coord']), gpu=gpu,
+                   ncycle=params['ncycle'], rgb_thetas=params['rgb_thetas'],
+                   oversampling=params['oversampling'],
+                   stripe_s=params['stripe_s'],
+                   stripe_sig=params['stripe_sig'], step_s=params['step_s'],
+                   origin=params['origin'], compute=False,
+                   palette=params.get('palette'))
+        mand.ypixels = params['ypixels']
+        # Light and diagonal are given as used by the kernels
+        mand.light = np.array(params['light'])
+        mand.diag = params['diag']
+        return mand
+
+    def update_set(self, timer=None):
         """Updates the set
    
         Compute and color the Mandelbrot set, using CPU or GPU
+
+        With collect_stats set (and on CPU), the escape statistics of the
+        frame are stored in self.stats.
+
+        Args:
+            timer: StageTimer
+                if given, records the duration of the kernel, quantize and
+                oversample stages (see frame_timing)
+        """
+        self.stats = (EscapeStats(self.maxiter)
+                      if self.collect_stats and not self.gpu else None)
+        self.set = self.compute_rows(0, self.ypixels, timer=timer,
+                                     stats=self.stats)
+
+    def compute_rows(self, y0, y1, dtype=np.uint8, timer=None, stats=None):
+        """Compute and color a horizontal band of the image
+   
+        Rows are indexed like self.set (row 0 is the bottom of the frame, or
+        the top with origin='upper'), so that filling every band of the frame
+        gives the same image as update_set. Used to render in small
+        interruptible chunks.
+
+        Args:
+            y0, y1: int
+                first (inclusive) and last (exclusive) rows of the band
+            dtype: numpy integer type
+                output type, colors are scaled to its full range (np.uint16
+                for 16-bit output)
+            timer: StageTimer
+                if given, records the duration of each stage
+            stats: EscapeStats
+                if given, escape statistics of the band are added to it
+
+        Returns:
+            ndarray(dtype=dtype, ndim=3): band of shape (y1-y0, xpixels, 3)
         """
+        return self.compute_tile(0, y0, self.xpixels, y1, dtype, timer, stats)
+
+    def compute_tile(self, x0, y0, x1, y1, dtype=np.uint8, timer=None,
+                     stats=None):
+        """Compute and color a rectangular tile of the image
+   
+        The tile is computed on the grid of the full frame, with the same
+        shading, so that tiles can be assembled into the image given by
+        update_set.
+
+        Args:
+            x0, x1: int
+                first (inclusive) and last (exclusive) columns of the tile
+            y0, y1: int
+                first (inclusive) and last (exclusive) rows of the tile,
+                indexed like self.set
+            dtype: numpy integer type
+                output type, colors are scaled to its full range
+            timer: StageTimer
+                if given, records the duration of each stage
+            stats: EscapeStats
+                if given, escape statistics of the tile are added to it (CPU
+                only)
+
+        Returns:
+            ndarray(dtype=dtype, ndim=3): tile of shape (y1-y0, x1-x0, 3)
+        """
+        if stats is not None and self.gpu:
+            raise ValueError("Escape statistics are only computed on CPU")
         # Apply ower post-transform to ncycle
         ncycle = math.sqrt(self.ncycle)
-        diag = math.sqrt((self.coord[1]-self.coord[0])**2 +
-                  (self.coord[3]-self.coord[2])**2)
+        diag = self.frame_diag()
         # Oversampling: rescaling by os
         xp = self.xpixels*self.os
         yp = self.ypixels*self.os
+        # Tile columns and rows in the oversampled grid
+        xa, xb = x0*self.os, x1*self.os
+        ya, yb = y0*self.os, y1*self.os
+        # Imaginary part of the first and last rows
+        if self.origin == 'upper':
+            yfirst, ylast = self.coord[3], self.coord[2]
+        else:
+            yfirst, ylast = self.coord[2], self.coord[3]
        
         if self.gpu:
-            # Pixel mapping is done in compute_self_gpu
-            self.set = np.zeros((yp, xp, 3))
+            # Pixel mapping is done in compute_self_gpu: remap the tile
+            # boundaries onto the full frame grid
+            xstep = (self.coord[1]-self.coord[0]) / (xp-1)
+            ystep = (ylast-yfirst) / (yp-1)
+            # At least 2x2 samples, so that the kernel grid step is defined
+            ncols = max(xb - xa, 2)
+            nrows = max(yb - ya, 2)
+            xmin = self.coord[0] + xa*xstep
+            xmax = self.coord[0] + (xa + ncols - 1)*xstep
+            ymin = yfirst + ya*ystep
+            ymax = yfirst + (ya + nrows - 1)*ystep
+            mat = np.zeros((nrows, ncols, 3))
             # Compute set with GPU:
             # 1D grid, with n blocks of 32 threads
-            npixels = xp * yp
+            npixels = ncols * nrows
             nthread = 32
             nblock = math.ceil(npixels / nthread)
-            compute_set_gpu[nblock,
-                            nthread](self.set, *self.coord, self.maxiter,
-                                    self.colortable, ncycle, self.stripe_s,
-                                    self.stripe_sig, self.step_s, diag,
-                                    self.light)
+            with maybe_stage(timer, 'kernel'):
+                gpu_kernel()[nblock,
+                             nthread](mat, xmin, xmax, ymin, ymax,
+                                     self.maxiter,
+                                     self.colortable, ncycle, self.stripe_s,
+                                     self.stripe_sig, self.step_s, diag,
+                                     self.light)
+            mat = mat[:yb-ya, :xb-xa]
         else:
             # Mapping pixels to C
-            creal = np.linspace(self.coord[0], self.coord[1], xp)
+            creal = np.linspace(self.coord[0], self.coord[1], xp)[xa:xb]
             cim = np.linspace(self.coord[2], self.coord[3], yp)
+            if self.origin == 'upper':
+                cim = cim[::-1]
+            cim = cim[ya:yb]
             # Compute set with CPU
-            self.set = compute_set(creal, cim, self.maxiter,
-                                   self.colortable, ncycle, self.stripe_s,
-                                   self.stripe_sig, self.step_s, diag,
-                                   self.light)
-        self.set = (255*self.set).astype(np.uint8)
+            with maybe_stage(timer, 'kernel'):
+                if stats is None:
+                    mat = compute_set(creal, cim, self.maxiter,
+                                      self.colortable, ncycle, self.stripe_s,
+                                      self.stripe_sig, self.step_s, diag,
+                                      self.light)
+                else:
+                    mat = compute_set_stats(creal, cim, self.maxiter,
+                                            self.colortable, ncycle,
+                                            self.stripe_s, self.stripe_sig,
+                                            self.step_s, diag, self.light,
+                                            stats.counts, stats.histogram)
+        return self._to_image(mat, dtype, timer)
+
+    def _to_image(self, mat, dtype=np.uint8, timer=None):
+        """Scale colors in [0,1] to dtype and average the oversampling"""
+        with maybe_stage(timer, 'quantize'):
+            mat = (np.iinfo(dtype).max*mat).astype(dtype)
         # Oversampling: reshaping to (ypixels, xpixels, 3)
         if self.os > 1:
-            self.set = (self.set
-                        .reshape((self.ypixels, self.os,
-                                  self.xpixels, self.os, 3))
-                        .mean(3).mean(1).astype(np.uint8))
+            with maybe_stage(timer, 'oversample'):
+                mat = (mat
+                       .reshape((mat.shape[0]//self.os, self.os,
+                                 mat.shape[1]//self.os, self.os, 3))
+                       .mean(3).mean(1).astype(dtype))
+        return mat
+
+    def compute_fields(self):
+        """Escape-time fields of the whole (oversampled) frame, on CPU
+   
+        Returns:
+            ndarray(dtype=float, ndim=3): fields of shape (5, ypixels*os,
+            xpixels*os), see compute_fields, rows ordered like self.set
+        """
+        creal = np.linspace(self.coord[0], self.coord[1],
+                            self.xpixels*self.os)
+        cim = np.linspace(self.coord[2], self.coord[3], self.ypixels*self.os)
+        if self.origin == 'upper':
+            cim = cim[::-1]
+        return compute_fields(creal, cim, self.maxiter, self.stripe_s,
+                              self.stripe_sig)
+
+    def compute_shading(self, timer=None):
+        """Colortable index and brightness of each pixel, on CPU
+   
+        One point per pixel (no oversampling), see compute_shading.
+
+        Args:
+            timer: StageTimer
+                if given, records the duration of the kernel
+
+        Returns:
+            (ndarray(dtype=uint16, ndim=2), ndarray(dtype=uint8, ndim=2)):
+            index and brightness of shape (ypixels, xpixels), rows ordered
+            like self.set
+        """
+        creal = np.linspace(self.coord[0], self.coord[1], self.xpixels)
+        cim = np.linspace(self.coord[2], self.coord[3], self.ypixels)
+        if self.origin == 'upper':
+            cim = cim[::-1]
+        with maybe_stage(timer, 'kernel'):
+            return compute_shading(creal, cim, self.maxiter,
+                                   self.colortable.shape[0] - 1,
+                                   math.sqrt(self.ncycle), self.stripe_s,
+                                   self.stripe_sig, self.step_s,
+                                   self.frame_diag(), self.light)
+
+    def color_fields(self, fields, dtype=np.uint8, timer=None):
+        """Image of escape-time fields with the current coloring parameters
+   
+        Args:
+            fields: ndarray(ndim=3)
+                output of compute_fields, possibly stored at lower precision
+            dtype: numpy integer type
+                output type, colors are scaled to its full range
+            timer: StageTimer
+                if given, records the duration of each stage
+
+        Returns:
+            ndarray(dtype=dtype, ndim=3): image, same as update_set for
+            float64 fields
+        """
+        with maybe_stage(timer, 'color'):
+            mat = color_fields(np.asarray(fields, dtype=np.float64),
+                               self.colortable, math.sqrt(self.ncycle),
+                               self.step_s, self.frame_diag(), self.light)
+        return self._to_image(mat, dtype, timer)
+
+    def escape_probe(self, xpixels=128, maxiter=None):
+        """Escape counts of the current view on a coarse grid (CPU)
+   
+        Args:
+            xpixels: int
+                probe width, the height follows the aspect ratio of coord
+            maxiter: int
+                maximal number of iterations, defaults to self.maxiter
+
+        Returns:
+            ndarray(dtype=float, ndim=2): smooth escape counts, 0 for points
+            that did not escape
+        """
+        if maxiter is None:
+            maxiter = self.maxiter
+        ypixels = max(2, round(xpixels / (self.coord[1]-self.coord[0]) *
+                               (self.coord[3]-self.coord[2])))
+        creal = np.linspace(self.coord[0], self.coord[1], xpixels)
+        cim = np.linspace(self.coord[2], self.coord[3], ypixels)
+        return compute_escape_counts(creal, cim, int(maxiter))
+
+    def frame_diag(self):
+        """Diagonal used to normalize the distance estimate"""
+        if self.diag is not None:
+            return self.diag
+        return math.sqrt((self.coord[1]-self.coord[0])**2 +
+                         (self.coord[3]-self.coord[2])**2)
+
+    def render_params(self):
+        """Parameters that determine the rendered image
+   
+        Returns:
+            dict: view, resolution, iteration and coloring parameters. The
+            light vector is given in radians, as stored in the object.
+        """
+        return {
+            'coord': [float(v) for v in self.coord],
+            'xpixels': int(self.xpixels),
+            'ypixels': int(self.ypixels),
+            'oversampling': int(self.os),
+            'maxiter': int(self.maxiter),
+            'ncycle': float(self.ncycle),
+            'rgb_thetas': [float(v) for v in self.rgb_thetas],
+            'palette': palette_params(self.palette),
+            'stripe_s': float(self.stripe_s),
+            'stripe_sig': float(self.stripe_sig),
+            'step_s': float(self.step_s),
+            'light': [float(v) for v in self.light],
+            'diag': float(self.frame_diag()),
+            'origin': self.origin,
+        }
    
     def draw(self, filename = None):
         """Draw or save, using PIL"""
         # Reverse x-axis (equivalent to matplotlib's origin='lower')
-        img = Image.fromarray(self.set[::-1,:,:], 'RGB')
+        if self.origin == 'upper':
+            img = Image.fromarray(self.set, 'RGB')
+        else:
+            img = Image.fromarray(self.set[::-1,:,:], 'RGB')
         if filename is not None:
             img.save(filename) # fast (save in jpg) (compare reading as well)
         else:
@@ -494,8 +997,10 @@ class Mandelbrot():
            
     def draw_mpl(self, filename=None, dpi=72):
         """Draw or save, using Matplotlib"""
+        # Imported here so headless uses never load matplotlib
+        import matplotlib.pyplot as plt
         plt.subplots(figsize=(self.xpixels/dpi, self.ypixels/dpi))
-        plt.imshow(self.set, extent=self.coord, origin='lower')
+        plt.imshow(self.set, extent=self.coord, origin=self.origin)
         # Remove axis and margins
         plt.subplots_adjust(left=0, right=1, bottom=0, top=1)
         plt.axis('off')
@@ -525,10 +1030,14 @@ class Mandelbrot():
                       y - yrange * s,
                       y + yrange * s]      
        
-    def animate(self, x, y, file_out, n_frames=150, loop=True):
-        """Animated zoom to GIF file
+    def animate(self, x, y, file_out, n_frames=150, loop=True, workers=None,
+                **writer_kwargs):
+        """Animated zoom to GIF (or MP4, WebP) file
    
-        Note that the Mandelbrot object is modified by this function
+        Frames are rendered in parallel and streamed to the file, see
+        animation.animate. Note that the Mandelbrot object is modified by
+        this function: it ends on the last frame of the zoom, whose set is only
+        computed when next used.
        
         Args:
             x: float
@@ -541,30 +1050,46 @@ class Mandelbrot():
                 number of frames in the output file
             loop: boolean
                 loop back to original coordinates
-        """        
-        # Zoom scale: gaussian shape, from 0% (s=1) to 30% (s=0.7)
-        # => zoom scale (i.e. speed) is increasing, then decreasing
-        def gaussian(n, sig = 1):
-            x = np.linspace(-1, 1, n)
-            return np.exp(-np.power(x, 2.) / (2 * np.power(sig, 2.)))
-        s = 1 - gaussian(n_frames, 1/2)*.3
+            workers: int
+                number of render processes, defaults to the number of CPUs
+            writer_kwargs:
+                passed to imageio.get_writer (e.g. fps, duration)
+        """
+        from animation import animate
+        schedule = animate(self, x, y, file_out, n_frames, loop, workers,
+                           **writer_kwargs)
+        # Rendered on next use of self.set, if any
+        self.coord = schedule[-1]
+        self._set_pending = True
+   
+    def animate_keyframes(self, x, y, file_out, zoom, frames_per_octave=24,
+                          workers=None, **writer_kwargs):
+        """Animated zoom made of one keyframe per 2x zoom step
+   
+        Frames between keyframes are scaled and blended from the two nearest
+        keyframes, see animation.animate_keyframes. Frames are centered at
+        (x, y), the first one as wide as the current view. The Mandelbrot
+        object is not modified.
        
-        # Update in case it was not up to date (e.g. parameters changed)
-        self.update_set()
-        images = [self.set]
-        # Making list of images
-        for i in range(1, n_frames):
-            # Zoom at (x,y)
-            self.szoom_at(x,y,s[i])
-            # Update the set
-            self.update_set()
-            images.append(self.set)
-           
-        # Go backward, one image in two (i.e. 2x speed)
-        if loop:
-            images += images[::-2]
-        # Make GIF
-        imageio.mimsave(file_out, images)  
+        Args:
+            x: float
+                real part of point to zoom at
+            y: float
+                imaginary part of point to zoom at
+            file_out: str
+                filename to save the output (GIF, MP4...)
+            zoom: float
+                zoom factor between the first and last frames
+            frames_per_octave: int
+                number of frames per 2x zoom step
+            workers: int
+                number of render processes, defaults to the number of CPUs
+            writer_kwargs:
+                passed to imageio.get_writer (e.g. fps, duration)
+        """
+        from animation import animate_keyframes
+        animate_keyframes(self, x, y, file_out, zoom, frames_per_octave,
+                          workers=workers, **writer_kwargs)
    
     def explore(self, dpi=72):
         """Run the Mandelbrot explorer: a Matplotlib GUI"""
@@ -576,6 +1101,8 @@ class Mandelbrot():
 class MandelbrotExplorer():
     """A Matplotlib GUI to explore the Mandelbrot set"""
     def __init__(self, mand, dpi=72):
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider
         self.mand = mand
         # Update in case it was not up to date (e.g. parameters changed)
         self.mand.update_set()
@@ -583,7 +1110,7 @@ class MandelbrotExplorer():
         self.fig, self.ax = plt.subplots(figsize=(mand.xpixels/dpi,
                                                   mand.ypixels/dpi))
         self.graph = plt.imshow(mand.set,
-                                extent=mand.coord, origin='lower')
+                                extent=mand.coord, origin=mand.origin)
         plt.subplots_adjust(left=0, right=1, bottom=0, top=1)
         plt.axis('off')
         
@@ -646,10 +1173,11 @@ class MandelbrotExplorer():
        
     def update_val(self, _):
         """Slider interactivity: update object values"""
+        import matplotlib.pyplot as plt
         rgb = [x + self.sld_p.val for x in [self.sld_r.val, self.sld_g.val,
                                             self.sld_b.val]]
         self.mand.rgb_thetas = tuple(rgb)
-        self.mand.colortable = sin_colortable(rgb)
+        self.mand.update_colortable()
         self.mand.maxiter = self.sld_maxit.val
         self.mand.ncycle = self.sld_n.val
         self.mand.stripe_s = self.sld_s.val
@@ -666,6 +1194,7 @@ class MandelbrotExplorer():
        
     def onclick(self, event):
         """Click & scroll interactivity: zoom in/out"""
+        import matplotlib.pyplot as plt
         # This function is called by any click/scroll
         if event.inaxes == self.ax:
             # Click or scroll in the main axe: zoom event
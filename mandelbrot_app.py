@@ -3,8 +3,12 @@
 """
 Main Kivy application for the Fractal Explorer.
 Handles screens and navigation between different fractal explorers.
+
+Only the main menu is built at startup: an explorer screen (its module, with
+the Numba kernels, and its KV file) is loaded when it is first opened.
 """
 
+import importlib
 import os
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen, SlideTransition
@@ -15,7 +19,13 @@ from kivy.lang import Builder
 
 # Import screens first so classes are registered before loading KV files
 from main_menu import MainMenuScreen
-from fractal_explorer import MandelbrotExplorerScreen
+from frame_timing import startup
+
+# Explorer screens, created on first use: name -> (module, class, KV file)
+LAZY_SCREENS = {
+    'mandelbrot_explorer': ('fractal_explorer', 'MandelbrotExplorerScreen',
+                            'explorer.kv'),
+}
 
 # Make sure kv directory exists
 kv_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kv')
@@ -38,10 +48,9 @@ if not os.path.exists(assets_dir):
         draw.line([20, 180, 280, 20], fill=(100, 100, 100), width=2)
         img.save(placeholder_path)
 
-# Load KV files in specific order (main.kv must be first)
+# Load the KV files of the menu in specific order (main.kv must be first)
 Builder.load_file(os.path.join(kv_directory, 'main.kv'))
 Builder.load_file(os.path.join(kv_directory, 'menu.kv'))
-Builder.load_file(os.path.join(kv_directory, 'explorer.kv'))
 
 class FractalExplorerApp(App):
     """Main application class for the Fractal Explorer"""
@@ -57,18 +66,31 @@ class FractalExplorerApp(App):
         # Create screen manager
         self.screen_manager = ScreenManager(transition=SlideTransition())
         
-        # Add screens
+        # Add the menu, explorers are added when opened
         self.screen_manager.add_widget(MainMenuScreen(name='main_menu'))
-        self.screen_manager.add_widget(MandelbrotExplorerScreen(name='mandelbrot_explorer'))
         
         # Start with main menu
         self.screen_manager.current = 'main_menu'
         
         return self.screen_manager
     
+    def open_screen(self, name):
+        """Switch to screen name, creating it on first use
+        
+        Returns:
+            Screen: the screen
+        """
+        if not self.screen_manager.has_screen(name):
+            module, class_name, kv_file = LAZY_SCREENS[name]
+            screen_class = getattr(importlib.import_module(module), class_name)
+            Builder.load_file(os.path.join(kv_directory, kv_file))
+            self.screen_manager.add_widget(screen_class(name=name))
+        self.screen_manager.current = name
+        return self.screen_manager.get_screen(name)
+    
     def on_start(self):
         """Called when the application starts"""
-        pass
+        startup.mark('window')
     
     def on_stop(self):
         """Called when the application stops"""
@@ -3,28 +3,27 @@
 """Modern Interactive Mandelbrot Set Explorer with Real-time Preview"""
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import threading
 import queue
+import copy
 import time
 import math
 import os
 import numpy as np
 from PIL import Image, ImageTk
 from mandelbrot import Mandelbrot
-
-# Optional dependencies with graceful fallbacks
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
-
-try:
-    import pynvml
-    NVIDIA_ML_AVAILABLE = True
-except ImportError:
-    NVIDIA_ML_AVAILABLE = False
+from prefetch import ViewPrefetcher, zoom_out_view, neighbor_views
+from deep_zoom_utils import preview_zoomed_frame, auto_iterations
+from quality_controller import FrameBudgetController
+from frame_timing import StageTimer, FrameLog, startup
+from poster_export import export_poster
+from escape_cache import EscapeFieldCache
+from render_process import RenderProcess
+from telemetry import TelemetrySampler
+from render_planner import RenderPlanner
+from palettes import palette_names
+from palette_cycle import PaletteCycler
 
 
 # Default UI settings - central place for all visual parameters
@@ -102,7 +101,9 @@ class ModernMandelbrotGUI:
             ncycle=32,
             rgb_thetas=(0.0, 0.15, 0.25),
             stripe_s=0,
-            step_s=0
+            step_s=0,
+            origin='upper',  # Rows in display orientation: no flip before display
+            compute=False    # First rendered at the canvas size
         )
         
         # GUI state
@@ -127,14 +128,63 @@ class ModernMandelbrotGUI:
         self.scaled_image_height = 0
         
         # Add rendering quality options
-        self.preview_quality = "Normal"  # "Low", "Normal", "High"
+        self.preview_quality = "Normal"  # "Low", "Normal", "High", "Adaptive"
         self.dynamic_iterations = True   # Auto-adjust iterations based on zoom
+        self.auto_iterations = False     # Choose iterations from escape statistics
+        self.iteration_reason = None     # Explanation of the last automatic choice
         self.oversampling = 1            # Super-sampling factor (1, 2, 3)
         
         # Base iteration count (will be scaled with zoom)
         self.base_iterations = 500
         self.max_iterations = 50000      # Upper limit for iterations
         
+        # Idle-time rendering of the likely next views
+        self.prefetcher = ViewPrefetcher()
+        self.last_render_prefetched = False
+        
+        # Disk cache of escape-time fields: revisited views are only recolored
+        self.use_escape_cache = False
+        self.escape_cache = None         # Created when first enabled
+        self.last_render_cached = False
+        
+        # Optional render subprocess writing to shared memory, so that
+        # rendering never competes with the event loop for the interpreter
+        self.use_render_process = False
+        self.render_process = None
+        
+        # Adaptive preview quality (frame-time budget)
+        self.quality_controller = FrameBudgetController(target_frame_time=0.1)
+        self.render_plan = None          # Settings of the render in progress
+        self.full_maxiter = None         # maxiter to restore after a preview
+        self._full_quality_pending = False
+        self._upgrade_job = None
+        
+        # Set to stop the poster export in progress, if any
+        self.poster_cancel = None
+        
+        # Persistent display: one PhotoImage and one canvas item, updated in place
+        self._photo = None
+        self._canvas_image_id = None
+        self.frame_timer = StageTimer()
+        # Optional JSON lines log of the frame stages (MANDELBROT_FRAME_LOG)
+        self.frame_log = FrameLog.from_env()
+        self.frame_info = {}
+        
+        # System telemetry (sampler thread), and the last render event to
+        # correlate with it
+        self.telemetry = TelemetrySampler(interval=0.5)
+        self.last_render_event = None
+        
+        # In-process renders fit in a memory budget (in bands if needed)
+        self.memory_planner = RenderPlanner()
+        
+        # Palette cycling of the displayed view: recolored each frame from
+        # stored colortable indices, without rendering
+        self.palette_cycler = None
+        self.palette_cycling = False
+        self.palette_cycle_speed = 0.1   # Palette cycles per second
+        self._cycle_job = None
+        
         # Color themes
         self.color_themes = {
             "Classic": (0.0, 0.15, 0.25),
@@ -185,9 +235,16 @@ class ModernMandelbrotGUI:
         
         # Setup the modern UI
         self.setup_modern_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Start sampling, and refresh the monitor panel every second
+        self.telemetry.start()
+        self.update_monitor_panel()
         
         # Start with initial computation
         self.schedule_update()
+        # Window shown once the event loop is idle
+        self.root.after_idle(startup.mark, 'window')
     
     def setup_modern_ui(self, **kwargs):
         """Setup modern dark-themed UI
@@ -292,6 +349,9 @@ class ModernMandelbrotGUI:
         # Navigation section
         self.setup_navigation_section(scrollable_frame, **ui)
         
+        # System monitor section
+        self.setup_monitor_section(scrollable_frame, **ui)
+        
         # Bind mousewheel to canvas
         def _on_mousewheel(event):
             canvas.yview_scroll(int(-1*(event.delta/120)), "units")
@@ -454,6 +514,51 @@ class ModernMandelbrotGUI:
         )
         dyn_iter_cb.pack(anchor=tk.W)
         
+        # Automatic iterations from escape-time statistics
+        self.auto_iter_var = tk.BooleanVar(value=self.auto_iterations)
+        auto_iter_cb = tk.Checkbutton(
+            dyn_iter_frame, 
+            text="Auto Iterations (escape statistics)", 
+            variable=self.auto_iter_var,
+            command=self.on_auto_iterations_change,
+            bg=ui['bg_panel'], 
+            fg=ui['fg_text'],
+            selectcolor=ui['color_button'], 
+            activebackground=ui['bg_panel'],
+            activeforeground=ui['fg_text']
+        )
+        auto_iter_cb.pack(anchor=tk.W)
+        
+        # Disk cache of escape-time fields
+        self.escape_cache_var = tk.BooleanVar(value=self.use_escape_cache)
+        escape_cache_cb = tk.Checkbutton(
+            dyn_iter_frame, 
+            text="Disk Cache (recolor revisited views, CPU only)", 
+            variable=self.escape_cache_var,
+            command=self.on_escape_cache_change,
+            bg=ui['bg_panel'], 
+            fg=ui['fg_text'],
+            selectcolor=ui['color_button'], 
+            activebackground=ui['bg_panel'],
+            activeforeground=ui['fg_text']
+        )
+        escape_cache_cb.pack(anchor=tk.W)
+        
+        # Out-of-process rendering
+        self.render_process_var = tk.BooleanVar(value=self.use_render_process)
+        render_process_cb = tk.Checkbutton(
+            dyn_iter_frame, 
+            text="Render in Separate Process", 
+            variable=self.render_process_var,
+            command=self.on_render_process_change,
+            bg=ui['bg_panel'], 
+            fg=ui['fg_text'],
+            selectcolor=ui['color_button'], 
+            activebackground=ui['bg_panel'],
+            activeforeground=ui['fg_text']
+        )
+        render_process_cb.pack(anchor=tk.W)
+        
         # Preview quality
         quality_opt_frame = tk.Frame(quality_frame, bg=ui['bg_panel'])
         quality_opt_frame.pack(fill=tk.X, pady=2)
@@ -469,7 +574,7 @@ class ModernMandelbrotGUI:
         quality_combo = ttk.Combobox(
             quality_opt_frame, 
             textvariable=self.quality_var,
-            values=["Low", "Normal", "High"],
+            values=["Low", "Normal", "High", "Adaptive"],
             state="readonly", 
             width=10
         )
@@ -532,6 +637,41 @@ class ModernMandelbrotGUI:
         preset_combo.pack(fill=tk.X, pady=(5, 0))
         preset_combo.bind('<<ComboboxSelected>>', self.on_preset_change)
         
+        # Palette: sinusoidal (phases of the preset) or gradient
+        tk.Label(
+            preset_frame, 
+            text="Palette:", 
+            font=ui['font_normal'], 
+            bg=ui['bg_panel'], 
+            fg=ui['fg_text']
+        ).pack(anchor=tk.W, pady=(5, 0))
+        
+        self.palette_var = tk.StringVar(value=self.mandelbrot.palette or "Sinusoidal")
+        palette_combo = ttk.Combobox(
+            preset_frame, 
+            textvariable=self.palette_var,
+            values=["Sinusoidal"] + palette_names(),
+            state="readonly", 
+            font=ui['font_small']
+        )
+        palette_combo.pack(fill=tk.X, pady=(5, 0))
+        palette_combo.bind('<<ComboboxSelected>>', self.on_palette_change)
+        
+        # Palette cycling animation of the displayed view
+        self.cycle_var = tk.BooleanVar(value=False)
+        cycle_cb = tk.Checkbutton(
+            preset_frame, 
+            text="Cycle Palette (no re-render)", 
+            variable=self.cycle_var,
+            command=self.on_palette_cycle_change,
+            bg=ui['bg_panel'], 
+            fg=ui['fg_text'],
+            selectcolor=ui['color_button'], 
+            activebackground=ui['bg_panel'],
+            activeforeground=ui['fg_text']
+        )
+        cycle_cb.pack(anchor=tk.W, pady=(5, 0))
+        
         # More controls...
         # ... (other visual section UI elements)
         
@@ -674,17 +814,74 @@ class ModernMandelbrotGUI:
             self.update_dynamic_iterations()
             self.schedule_update()
             
+    def on_auto_iterations_change(self):
+        """Handle automatic iterations toggle"""
+        self.auto_iterations = self.auto_iter_var.get()
+        if not self.auto_iterations:
+            self.iteration_reason = None
+            self.update_dynamic_iterations()
+        self.schedule_update()
+            
+    def on_escape_cache_change(self):
+        """Handle escape-time field cache toggle"""
+        self.use_escape_cache = self.escape_cache_var.get()
+        if self.use_escape_cache and self.escape_cache is None:
+            self.escape_cache = EscapeFieldCache()
+            
+    def on_render_process_change(self):
+        """Handle render subprocess toggle"""
+        self.use_render_process = self.render_process_var.get()
+        if self.use_render_process and self.render_process is None:
+            self.render_process = RenderProcess(gpu=self.mandelbrot.gpu)
+        elif not self.use_render_process and self.render_process is not None:
+            # Closed once the render in progress, if any, is done
+            render_process, self.render_process = self.render_process, None
+            threading.Thread(target=render_process.close, daemon=True).start()
+            
+    def on_close(self):
+        """Stop background work and the render subprocess, then quit"""
+        self.prefetcher.cancel()
+        self.stop_palette_cycling(redisplay=False)
+        if self.poster_cancel is not None:
+            self.poster_cancel.set()
+        self.telemetry.stop()
+        if self.render_process is not None:
+            self.render_process.close()
+        if self.frame_log is not None:
+            self.frame_log.close()
+        if self.escape_cache is not None:
+            # Entries still being written
+            self.escape_cache.flush()
+        self.root.destroy()
+            
+    def dynamic_iterations_for(self, zoom_level, current_iterations):
+        """Iteration count that dynamic iterations would use at a zoom level
+        
+        Args:
+            zoom_level: float
+                zoom level of the view
+            current_iterations: int
+                iteration count currently in use
+                
+        Returns:
+            int: new iteration count, or current_iterations if the change
+            would not be significant
+        """
+        # Calculate iterations based on zoom level using a logarithmic scale
+        # This formula can be adjusted based on preference
+        new_iterations = int(self.base_iterations * math.log(zoom_level + 1, 10) + self.base_iterations)
+        new_iterations = min(new_iterations, self.max_iterations)  # Cap at max_iterations
+        
+        # Only update if significantly different to avoid constant recomputation
+        if abs(new_iterations - current_iterations) > 0.1 * current_iterations:
+            return new_iterations
+        return current_iterations
+            
     def update_dynamic_iterations(self):
         """Update iteration count based on zoom level if dynamic iterations is enabled"""
-        if self.dynamic_iterations:
-            # Calculate iterations based on zoom level using a logarithmic scale
-            # This formula can be adjusted based on preference
-            new_iterations = int(self.base_iterations * math.log(self.zoom_level + 1, 10) + self.base_iterations)
-            new_iterations = min(new_iterations, self.max_iterations)  # Cap at max_iterations
-            
-            # Only update if significantly different to avoid constant recomputation
-            current_iterations = self.mandelbrot.maxiter
-            if abs(new_iterations - current_iterations) > 0.1 * current_iterations:
+        if self.dynamic_iterations and not self.auto_iterations:
+            new_iterations = self.dynamic_iterations_for(self.zoom_level, self.mandelbrot.maxiter)
+            if new_iterations != self.mandelbrot.maxiter:
                 self.mandelbrot.maxiter = new_iterations
                 
                 # Update the slider value to reflect the new iteration count
@@ -716,6 +913,101 @@ class ModernMandelbrotGUI:
             self.update_dynamic_iterations()
         self.schedule_update()
     
+    def on_palette_change(self, event=None):
+        """Handle palette change (colortables are cached, see palettes)"""
+        name = self.palette_var.get()
+        self.mandelbrot.palette = None if name == "Sinusoidal" else name
+        self.mandelbrot.update_colortable()
+        self.schedule_update()
+    
+    def on_palette_cycle_change(self):
+        """Handle palette cycling toggle"""
+        if self.cycle_var.get():
+            self.start_palette_cycling()
+        else:
+            self.stop_palette_cycling()
+    
+    def start_palette_cycling(self):
+        """Capture the displayed view in the background, then animate its
+        palette phase (see palette_cycle)"""
+        if self.palette_cycling:
+            return
+        if self.is_computing or self.current_image is None:
+            self.cycle_var.set(False)
+            return
+        self.palette_cycling = True
+        # The view as displayed, even if a render changes it meanwhile
+        view = copy.copy(self.mandelbrot)
+        cycler = PaletteCycler(speed=self.palette_cycle_speed)
+        self.palette_cycler = cycler
+        capture = {'done': False, 'error': None}
+        
+        def run():
+            try:
+                cycler.capture(view)
+            except Exception as e:
+                capture['error'] = str(e)
+            capture['done'] = True
+        
+        def poll():
+            if not self.palette_cycling or self.palette_cycler is not cycler:
+                return
+            if not capture['done']:
+                self.root.after(50, poll)
+            elif capture['error']:
+                self.stop_palette_cycling()
+                self.status_label.config(text=f"Palette cycling failed: {capture['error']}",
+                                         fg=self.ui['fg_error'])
+            else:
+                self._cycle_start = self._cycle_report = time.perf_counter()
+                self._cycle_frames = 0
+                self.cycle_palette()
+        
+        self.status_label.config(text="Capturing the view for palette cycling...",
+                                 fg=self.ui['fg_warning'])
+        threading.Thread(target=run, daemon=True).start()
+        poll()
+    
+    def cycle_palette(self):
+        """Display the next palette cycling frame (up to 60 fps)"""
+        if not self.palette_cycling:
+            return
+        start = time.perf_counter()
+        frame = self.palette_cycler.frame_at(start - self._cycle_start)
+        image = Image.fromarray(frame, 'RGB')
+        if image.size != self.current_image.size:
+            image = image.resize(self.current_image.size, Image.NEAREST)
+        self.display_image(image)
+        self._cycle_frames += 1
+        # Frame rate, once per second
+        now = time.perf_counter()
+        if now - self._cycle_report >= 1:
+            fps = self._cycle_frames / (now - self._cycle_report)
+            self.status_label.config(text=f"Palette cycling • {fps:.0f} fps",
+                                     fg=self.ui['fg_success'])
+            self._cycle_report, self._cycle_frames = now, 0
+        delay = max(1, int((1/60 - (now - start)) * 1000))
+        self._cycle_job = self.root.after(delay, self.cycle_palette)
+    
+    def stop_palette_cycling(self, redisplay=True):
+        """Stop the palette cycling animation
+        
+        Args:
+            redisplay: boolean
+                display the rendered frame again
+        """
+        if not self.palette_cycling:
+            return
+        self.palette_cycling = False
+        self.cycle_var.set(False)
+        if self._cycle_job is not None:
+            self.root.after_cancel(self._cycle_job)
+            self._cycle_job = None
+        self.palette_cycler = None
+        if redisplay and self.current_image is not None:
+            self.display_image()
+            self.status_label.config(text="Ready", fg=self.ui['fg_success'])
+    
     def on_preset_change(self, event=None):
         """Handle color preset change"""
         preset_name = self.preset_var.get()
@@ -728,8 +1020,7 @@ class ModernMandelbrotGUI:
             
             # Update RGB thetas
             self.mandelbrot.rgb_thetas = preset["rgb_thetas"]
-            from mandelbrot import sin_colortable
-            self.mandelbrot.colortable = sin_colortable(self.mandelbrot.rgb_thetas)
+            self.mandelbrot.update_colortable()
             
             # Update other parameters
             self.mandelbrot.ncycle = preset["ncycle"]
@@ -785,6 +1076,15 @@ class ModernMandelbrotGUI:
         )
         self.status_label.pack(side=tk.RIGHT)
         
+        self.timing_label = tk.Label(
+            info_frame, 
+            text="", 
+            font=ui['font_small'], 
+            bg=ui['bg_dark'], 
+            fg=ui['fg_muted']
+        )
+        self.timing_label.pack(side=tk.RIGHT, padx=(0, ui['padding_outer']))
+        
         # Preview canvas with scroll - wrap in a frame to ensure it expands properly
         canvas_frame = tk.Frame(
             parent, 
@@ -848,6 +1148,13 @@ class ModernMandelbrotGUI:
         if self.is_computing:
             return
         
+        # Real work to do: stop speculative rendering and palette cycling
+        self.prefetcher.cancel()
+        self.stop_palette_cycling(redisplay=False)
+        if self._upgrade_job:
+            self.root.after_cancel(self._upgrade_job)
+            self._upgrade_job = None
+        
         # Get the current canvas dimensions
         self.preview_canvas.update_idletasks()
         canvas_width = self.preview_canvas.winfo_width()
@@ -865,6 +1172,17 @@ class ModernMandelbrotGUI:
             render_width = int(canvas_width * 1.5)
             render_height = int(canvas_height * 1.5)
         
+        # Adaptive quality: fit the interactive preview in the frame budget,
+        # unless this is the full quality render of a settled view
+        self.render_plan = None
+        self.full_maxiter = None
+        if self.preview_quality == "Adaptive" and not self._full_quality_pending:
+            self.render_plan = self.quality_controller.plan(
+                canvas_width, canvas_height, self.oversampling, self.mandelbrot.maxiter)
+            render_width = max(2, int(canvas_width * self.render_plan['scale']))
+            render_height = max(2, int(canvas_height * self.render_plan['scale']))
+        self._full_quality_pending = False
+        
         # Only update canvas dimensions if they're valid
         if canvas_width > 50 and canvas_height > 50:
             self.canvas_width = canvas_width
@@ -877,6 +1195,12 @@ class ModernMandelbrotGUI:
             # Update oversampling
             self.mandelbrot.os = self.oversampling
             
+            # Provisional settings of an adaptive preview
+            if self.render_plan is not None:
+                self.mandelbrot.os = self.render_plan['oversampling']
+                self.full_maxiter = self.mandelbrot.maxiter
+                self.mandelbrot.maxiter = self.render_plan['maxiter']
+            
             # Adjust the coordinate system to maintain proper aspect ratio
             current_coords = self.mandelbrot.coord
             
@@ -912,13 +1236,76 @@ class ModernMandelbrotGUI:
     def compute_mandelbrot(self):
         """Compute mandelbrot set in background thread"""
         try:
-            # Update the set with the current parameters
-            self.mandelbrot.update_set()
+            # Automatic iterations: probe the view at low resolution (the
+            # provisional iterations of an adaptive preview take precedence)
+            if self.auto_iterations and self.render_plan is None:
+                self.mandelbrot.maxiter, self.iteration_reason = auto_iterations(
+                    self.mandelbrot.escape_probe, self.base_iterations,
+                    max_iterations=self.max_iterations)
+            
+            # Use a prefetched frame if there is one, or update the set with
+            # the current parameters
+            prefetched = self.prefetcher.lookup(self.mandelbrot)
+            self.last_render_prefetched = prefetched is not None
+            self.last_render_cached = False
+            self.frame_timer.reset()
+            # Tracked as an event, correlated with the telemetry samples
+            with self.telemetry.track('render') as event:
+                if prefetched is not None:
+                    self.mandelbrot.set, self.mandelbrot.coord = prefetched
+                    source = 'prefetch'
+                elif self.use_escape_cache and self.render_plan is None:
+                    # Full quality views go through the disk cache (not the
+                    # throwaway adaptive previews). Fields are computed on
+                    # CPU and stored in the background.
+                    with self.frame_timer.stage('render'):
+                        self.last_render_cached = self.escape_cache.render(
+                            self.mandelbrot, timer=self.frame_timer)
+                    source = 'cache'
+                else:
+                    render_process = self.render_process if self.use_render_process else None
+                    with self.frame_timer.stage('render'):
+                        if render_process is not None:
+                            # Image mapped on shared memory, no copy between processes
+                            self.mandelbrot.set = render_process.render(self.mandelbrot)
+                            for name, seconds in render_process.last_stages.items():
+                                self.frame_timer.add(f'render/{name}', seconds)
+                            source = 'process'
+                        else:
+                            # Raises MemoryError if it cannot fit in memory
+                            self.memory_planner.render(self.mandelbrot,
+                                                       timer=self.frame_timer)
+                            source = 'render'
+                    # Measured cost for the adaptive quality controller
+                    self.quality_controller.record(
+                        self.mandelbrot.xpixels * self.mandelbrot.ypixels * self.mandelbrot.os**2,
+                        self.mandelbrot.maxiter, self.frame_timer.stages['render'])
+            
+            # Convert the NumPy array to a PIL Image: the set is rendered in
+            # display orientation, so it is read as is (no flipped copy)
+            with self.frame_timer.stage('fromarray'):
+                image = Image.fromarray(self.mandelbrot.set, 'RGB')
+            
+            # Reduced resolution preview: stretch to the canvas
+            if self.render_plan is not None and self.render_plan['scale'] < 1:
+                with self.frame_timer.stage('resize'):
+                    image = image.resize((self.canvas_width, self.canvas_height), Image.NEAREST)
             
-            # Convert the NumPy array to a PIL Image
-            # Flip Y-axis for proper display orientation
-            image_array = self.mandelbrot.set[::-1, :, :]
-            image = Image.fromarray(image_array, 'RGB')
+            event['info']['source'] = source
+            self.last_render_event = event
+            
+            # Description of the frame for the frame log, with the settings
+            # it was actually rendered with
+            mand = self.mandelbrot
+            self.frame_info = {'frontend': 'tk', 'source': source,
+                               'xpixels': mand.xpixels, 'ypixels': mand.ypixels,
+                               'oversampling': mand.os, 'maxiter': mand.maxiter,
+                               'preview': self.render_plan is not None}
+            if source == 'render':
+                memory_plan = self.memory_planner.last_plan
+                self.frame_info['memory'] = {
+                    key: value for key, value in memory_plan.items()
+                    if key != 'message'}
             
             # Put the result in the queue for the main thread to pick up
             self.computation_queue.put(('success', image))
@@ -932,11 +1319,46 @@ class ModernMandelbrotGUI:
             status, result = self.computation_queue.get_nowait()
             self.is_computing = False
             
+            # Restore the settings changed for an adaptive preview
+            plan = self.render_plan
+            if plan is not None and self.full_maxiter is not None:
+                self.mandelbrot.maxiter = self.full_maxiter
+                self.mandelbrot.os = self.oversampling
+            
             if status == 'success':
                 self.current_image = result
                 self.display_image()
                 self.update_info_display()
-                self.status_label.config(text="Ready", fg=self.ui['fg_success'])
+                self.timing_label.config(text=self.frame_timer.summary())
+                self.log_frame()
+                if startup.mark('first frame'):
+                    print(f"Startup: {startup.summary()}")
+                if plan is not None and plan['degraded']:
+                    self.status_label.config(
+                        text=(f"Preview {plan['scale']:.0%} • os {plan['oversampling']} • "
+                              f"{plan['maxiter']} it"),
+                        fg=self.ui['fg_accent'])
+                    # Full quality once the view settles
+                    self._upgrade_job = self.root.after(
+                        int(self.quality_controller.settle_delay * 1000), self.upgrade_to_full_quality)
+                    return
+                status_text = "Ready"
+                if self.last_render_prefetched:
+                    hit_rate = self.prefetcher.stats()['hit_rate']
+                    status_text += f" (prefetched, hit rate {hit_rate:.0%})"
+                elif self.use_escape_cache:
+                    hit_rate = self.escape_cache.hit_rate
+                    source = "recolored from cache" if self.last_render_cached else "cached"
+                    status_text += f" ({source} on CPU, hit rate {hit_rate:.0%})"
+                if self.auto_iterations and self.iteration_reason:
+                    status_text += f" • {self.mandelbrot.maxiter} it: {self.iteration_reason}"
+                memory_plan = self.frame_info.get('memory')
+                if memory_plan is not None and memory_plan['mode'] == 'banded':
+                    status_text += (f" • rendered in bands of {memory_plan['rows']} rows "
+                                    f"(memory budget)")
+                self.status_label.config(text=status_text, fg=self.ui['fg_success'])
+                # Use the idle time to render the likely next views
+                self.schedule_prefetch()
             else:
                 self.status_label.config(text=f"Error: {result}", fg=self.ui['fg_error'])
                 messagebox.showerror("Computation Error", f"Failed to compute Mandelbrot set:\n{result}")
@@ -944,9 +1366,62 @@ class ModernMandelbrotGUI:
             # Still computing
             self.root.after(100, self.check_computation)
     
-    def display_image(self):
-        """Display the computed image on canvas with no scaling (100% size)"""
+    def upgrade_to_full_quality(self):
+        """Render the settled view at full quality (adaptive quality mode)"""
+        self._upgrade_job = None
+        self._full_quality_pending = True
+        self.schedule_update()
+    
+    def interrupt_background_work(self):
+        """Stop speculative and deferred renders, and palette cycling, when
+        user input arrives"""
+        self.prefetcher.cancel()
+        self.stop_palette_cycling(redisplay=False)
+        if self._upgrade_job:
+            self.root.after_cancel(self._upgrade_job)
+            self._upgrade_job = None
+        self._full_quality_pending = False
+    
+    def schedule_prefetch(self):
+        """Prefetch the right-click zoom-out and the neighboring views"""
+        zoom_out = zoom_out_view(self.mandelbrot, 4.0)
+        if self.dynamic_iterations and not self.auto_iterations:
+            zoom_out.maxiter = self.dynamic_iterations_for(self.zoom_level / 4, self.mandelbrot.maxiter)
+        self.prefetcher.schedule([zoom_out] + neighbor_views(self.mandelbrot))
+    
+    def show_scaled_preview(self, old_coord):
+        """Show the previous frame transformed to the new view
+        
+        Immediate feedback for zooms: displayed until the real render of the
+        new view arrives.
+        
+        Args:
+            old_coord: (float, float, float, float)
+                coordinates of the previous frame (current_image)
+        """
         if self.current_image:
+            preview = preview_zoomed_frame(self.current_image, old_coord, self.mandelbrot.coord)
+            self.display_image(preview)
+            # Draw now rather than after the next idle callbacks
+            self.preview_canvas.update_idletasks()
+    
+    def log_frame(self):
+        """Write the stages of the displayed frame to the frame log, if any"""
+        if self.frame_log is not None:
+            self.frame_log.write(self.frame_timer, **self.frame_info)
+
+    def display_image(self, image=None):
+        """Display the computed image on canvas with no scaling (100% size)
+        
+        Args:
+            image: PIL.Image
+                image to display instead of current_image (e.g. a preview)
+        """
+        # Only the stages of computed frames are timed, not previews
+        timer = self.frame_timer if image is None else StageTimer()
+        if image is None:
+            image = self.current_image
+        if image:
             # Force canvas to update its dimensions first
             self.preview_canvas.update_idletasks()
             
@@ -959,27 +1434,33 @@ class ModernMandelbrotGUI:
                 # Since our Mandelbrot computation should exactly match the canvas size,
                 # we can display the image at 100% without scaling
                 
-                # Convert to PhotoImage
-                photo = ImageTk.PhotoImage(self.current_image)
-                
-                # Clear canvas and add image
-                self.preview_canvas.delete("all")
+                # Update the PhotoImage in place, or create one for a new size
+                with timer.stage('photo'):
+                    if self._photo is not None and (self._photo.width(), self._photo.height()) == image.size:
+                        self._photo.paste(image)
+                    else:
+                        self._photo = ImageTk.PhotoImage(image)
+                        
+                        # Keep a reference to prevent garbage collection
+                        self.preview_canvas.image = self._photo
                 
-                # Position image at top-left (no scaling or centering needed)
-                self.preview_canvas.create_image(0, 0, anchor=tk.NW, image=photo)
-                
-                # Update scroll region to match canvas size
-                self.preview_canvas.configure(scrollregion=(0, 0, canvas_width, canvas_height))
-                
-                # Keep a reference to prevent garbage collection
-                self.preview_canvas.image = photo
+                with timer.stage('canvas'):
+                    if self._canvas_image_id is None:
+                        # Position image at top-left (no scaling or centering needed)
+                        self._canvas_image_id = self.preview_canvas.create_image(
+                            0, 0, anchor=tk.NW, image=self._photo)
+                    else:
+                        self.preview_canvas.itemconfigure(self._canvas_image_id, image=self._photo)
+                    
+                    # Update scroll region to match canvas size
+                    self.preview_canvas.configure(scrollregion=(0, 0, canvas_width, canvas_height))
                 
                 # Store the coordinate conversion info (1:1 mapping now)
                 self.image_scale = 1.0
                 self.image_offset_x = 0
                 self.image_offset_y = 0
-                self.scaled_image_width = self.current_image.width
-                self.scaled_image_height = self.current_image.height
+                self.scaled_image_width = image.width
+                self.scaled_image_height = image.height
             else:
                 print(f"Canvas too small: {canvas_width}x{canvas_height}, skipping display")
     
@@ -1012,6 +1493,8 @@ class ModernMandelbrotGUI:
         """Handle canvas resize events by triggering a full recomputation"""
         # Only handle resize events from the canvas itself, not child widgets
         if event.widget == self.preview_canvas:
+            self.interrupt_background_work()
+            
             # Cancel any pending resize job
             if hasattr(self, '_resize_job') and self._resize_job:
                 self.root.after_cancel(self._resize_job)
@@ -1101,6 +1584,14 @@ class ModernMandelbrotGUI:
         )
         export_btn.pack(fill=tk.X, pady=ui['padding_control'])
         
+        poster_btn = self.create_button(
+            section_frame, 
+            "🖨️ Export Poster (tiled)...", 
+            self.export_poster,
+            bg_color=ui['color_button_create']
+        )
+        poster_btn.pack(fill=tk.X, pady=ui['padding_control'])
+        
     def setup_navigation_section(self, parent, **kwargs):
         """Setup navigation controls"""
         # Minimal implementation to avoid errors
@@ -1120,6 +1611,62 @@ class ModernMandelbrotGUI:
         )
         nav_label.pack()
         
+    def setup_monitor_section(self, parent, **kwargs):
+        """Setup the system monitor panel (CPU, memory, accelerator)"""
+        ui = self.ui.copy()
+        ui.update(kwargs)
+        
+        section_frame = self.create_section(parent, "📈 System Monitor", **kwargs)
+        
+        # One line per resource, and the usage during the last render
+        self.monitor_labels = {}
+        for key in ('cpu', 'cores', 'memory', 'gpu', 'render', 'overhead'):
+            label = tk.Label(
+                section_frame,
+                text="",
+                font=ui['font_mono'],
+                bg=ui['bg_panel'],
+                fg=ui['fg_muted'] if key in ('cores', 'overhead') else ui['fg_text'],
+                anchor=tk.W,
+                justify=tk.LEFT
+            )
+            label.pack(fill=tk.X)
+            self.monitor_labels[key] = label
+    
+    def update_monitor_panel(self):
+        """Show the last telemetry sample, then refresh again in a second"""
+        sample = self.telemetry.latest()
+        if sample is not None:
+            labels = self.monitor_labels
+            labels['cpu'].config(text=f"CPU     {sample['cpu']:5.0f}% (process)")
+            if sample['cores']:
+                # One block per core, from idle to busy
+                blocks = "▁▂▃▄▅▆▇█"
+                bars = "".join(blocks[min(int(c / 100 * len(blocks)), len(blocks) - 1)]
+                               for c in sample['cores'])
+                labels['cores'].config(text=f"Cores   {bars}")
+            if sample['rss'] is not None:
+                memory = f"{sample['rss'] / 2**20:5.0f} MB"
+                if sample['peak_rss'] is not None:
+                    memory += f" (peak {sample['peak_rss'] / 2**20:.0f} MB)"
+                labels['memory'].config(text=f"Memory  {memory}")
+            if sample['gpu'] is not None:
+                labels['gpu'].config(
+                    text=f"GPU     {sample['gpu']:5.0f}% • {sample['gpu_memory'] / 2**20:.0f} MB")
+            else:
+                labels['gpu'].config(text="GPU     no device")
+            if self.last_render_event is not None:
+                report = self.telemetry.report(self.last_render_event)
+                text = f"Render  {report['seconds']:.2f} s • CPU {report['cpu']:.0f}%"
+                if report['rss_delta'] is not None:
+                    text += f" • {report['rss_delta'] / 2**20:+.0f} MB"
+                if report['gpu'] is not None:
+                    text += f" • GPU {report['gpu']:.0f}%"
+                labels['render'].config(text=text)
+            labels['overhead'].config(
+                text=f"Sampler {self.telemetry.overhead():.2%} of a core")
+        self.root.after(1000, self.update_monitor_panel)
+    
     def export_image(self):
         """Minimal export function"""
         if self.current_image:
@@ -1135,6 +1682,74 @@ class ModernMandelbrotGUI:
             except Exception as e:
                 messagebox.showerror("Export Error", str(e))
     
+    def export_poster(self):
+        """Export the current view at high resolution, rendered in bands
+        
+        The render runs in a background thread with bounded memory, and its
+        progress is shown in the status bar. While it runs, this offers to
+        cancel it instead.
+        """
+        if self.poster_cancel is not None:
+            if messagebox.askyesno("Poster Export", "Cancel the export in progress?"):
+                self.poster_cancel.set()
+            return
+        width = simpledialog.askinteger(
+            "Poster Export", "Width in pixels:", initialvalue=16384, minvalue=16, parent=self.root)
+        if not width:
+            return
+        oversampling = simpledialog.askinteger(
+            "Poster Export", "Oversampling (1-4):", initialvalue=2, minvalue=1, maxvalue=4, parent=self.root)
+        if not oversampling:
+            return
+        bit_depth = 16 if messagebox.askyesno("Poster Export", "Write 16 bits per channel?") else 8
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".png",
+            filetypes=[("PNG files", "*.png"), ("NumPy memory map", "*.npy")]
+        )
+        if not filename:
+            return
+        
+        # The view as displayed, taken here: the render thread changes
+        # self.mandelbrot, and lowers maxiter during an adaptive preview
+        view = copy.copy(self.mandelbrot)
+        view.set = None
+        view.explorer = None
+        if self.render_plan is not None and self.full_maxiter is not None:
+            view.maxiter = self.full_maxiter
+        cancel = self.poster_cancel = threading.Event()
+        
+        progress = {'done': 0, 'total': 1, 'result': None, 'error': None}
+        
+        def on_progress(done, total):
+            progress['done'], progress['total'] = done, total
+        
+        def run():
+            try:
+                progress['result'] = export_poster(
+                    view, filename, width, oversampling=oversampling,
+                    bit_depth=bit_depth, progress=on_progress, cancel=cancel)
+            except Exception as e:
+                progress['error'] = str(e)
+        
+        def poll():
+            if progress['error'] or progress['result']:
+                self.poster_cancel = None
+            if progress['error']:
+                self.status_label.config(text=f"Export failed: {progress['error']}", fg=self.ui['fg_error'])
+            elif progress['result'] and not progress['result']['completed']:
+                self.status_label.config(
+                    text=f"Export cancelled: {os.path.basename(filename)} is incomplete", fg=self.ui['fg_warning'])
+            elif progress['result']:
+                self.status_label.config(text=f"Poster saved: {os.path.basename(filename)}", fg=self.ui['fg_success'])
+            else:
+                self.status_label.config(
+                    text=f"Exporting poster... {progress['done'] / progress['total']:.0%}",
+                    fg=self.ui['fg_warning'])
+                self.root.after(250, poll)
+        
+        threading.Thread(target=run, daemon=True).start()
+        poll()
+    
     def schedule_update(self):
         """Schedule a mandelbrot update with a short delay to batch multiple requests"""
         if not self.update_pending:
@@ -1152,36 +1767,44 @@ class ModernMandelbrotGUI:
 
     def on_canvas_click(self, event):
         """Handle left click on canvas - zoom in"""
+        self.interrupt_background_work()
         if self.current_image and not self.is_computing:
             # Convert canvas coordinates to complex plane coordinates
             x, y = self.canvas_to_complex(event.x, event.y)
             if x is not None and y is not None:
                 self.save_current_view()
+                old_coord = list(self.mandelbrot.coord)
                 self.mandelbrot.zoom_at(x, y, 0.25)  # 4x zoom in
                 self.zoom_level *= 4
+                self.show_scaled_preview(old_coord)
                 # Update iterations based on zoom level if dynamic iterations is enabled
                 self.update_dynamic_iterations()
                 self.schedule_update()
     
     def on_canvas_right_click(self, event):
         """Handle right click on canvas - zoom out"""
+        self.interrupt_background_work()
         if self.current_image and not self.is_computing:
             # Convert canvas coordinates to complex plane coordinates
             x, y = self.canvas_to_complex(event.x, event.y)
             if x is not None and y is not None:
                 self.save_current_view()
+                old_coord = list(self.mandelbrot.coord)
                 self.mandelbrot.zoom_at(x, y, 4.0)  # 4x zoom out
                 self.zoom_level /= 4
+                self.show_scaled_preview(old_coord)
                 # Update iterations based on zoom level if dynamic iterations is enabled
                 self.update_dynamic_iterations()
                 self.schedule_update()
     
     def on_canvas_scroll(self, event):
         """Handle mouse wheel on canvas"""
+        self.interrupt_background_work()
         if self.current_image and not self.is_computing:
             x, y = self.canvas_to_complex(event.x, event.y)
             if x is not None and y is not None:
                 self.save_current_view()
+                old_coord = list(self.mandelbrot.coord)
                 if event.delta > 0:
                     # Zoom in
                     self.mandelbrot.zoom_at(x, y, 0.5)
@@ -1190,12 +1813,14 @@ class ModernMandelbrotGUI:
                     # Zoom out
                     self.mandelbrot.zoom_at(x, y, 2.0)
                     self.zoom_level /= 2
+                self.show_scaled_preview(old_coord)
                 # Update iterations based on zoom level if dynamic iterations is enabled
                 self.update_dynamic_iterations()
                 self.schedule_update()
 
 def main():
     """Main application entry point"""
+    startup.mark('imports')
     print("Starting Mandelbrot Explorer GUI...")
     try:
         root = tk.Tk()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+Palette cycling: animate the palette phase without rendering again.
+
+The colortable index and brightness of each pixel are computed once
+(Mandelbrot.compute_shading, one point per pixel). Each frame then only
+shifts the indices by the phase and looks the colors up in a uint8 table of
+every (color, brightness) pair, built once per colortable:
+
+  cycler = PaletteCycler(speed=0.1)
+  cycler.capture(mand)
+  frame = cycler.frame(0.25)          # as if rgb_thetas were shifted by .25
+  frame = cycler.frame_at(seconds)    # phase of the animation at that time
+
+Shifting the phase of a sinusoidal palette (the phase slider of
+MandelbrotExplorer) shifts its colortable, so the animated frames match
+renders with the shifted rgb_thetas, without oversampling. Gradient palettes
+are cyclic and are animated the same way.
+"""
+
+import numpy as np
+from numba import jit
+
+from frame_timing import maybe_stage
+from mandelbrot import INTERIOR_INDEX
+
+# Brightness levels of the stored brightness (uint8)
+LEVELS = 256
+
+
+def palette_lut(colortable, levels=LEVELS):
+    """ Colors of every colortable entry at every brightness level
+
+    Same overlay and clipping as color_pixel, and same quantization as the
+    rendered images.
+
+    Args:
+        colortable: ndarray(ndim=2)
+            RGB colortable, in [0,1] (float) or [0,255] (uint8)
+        levels: int
+            number of brightness levels, evenly spread over [0,1]
+
+    Returns:
+        ndarray(dtype=uint8, ndim=3): table of shape (ncol, levels, 3)
+    """
+    colors = np.asarray(colortable, dtype=np.float64)
+    if np.issubdtype(colortable.dtype, np.integer):
+        colors = colors / np.iinfo(colortable.dtype).max
+    x = colors[:, None, :]
+    y = np.linspace(0, 1, levels)[None, :, None]
+    # Overlay mode, see overlay in mandelbrot
+    out = np.where(2*y < 1, 2*x*y, 1 - 2*(1 - x)*(1 - y))
+    return (255*np.clip(out, 0, 1)).astype(np.uint8)
+
+
+@jit(nogil=True, cache=True)
+def remap(index, bright, lut, shift, out):
+    """ Color pixels from their colortable index and brightness
+
+    Args:
+        index: ndarray(dtype=uint16, ndim=2)
+            colortable index of each pixel, INTERIOR_INDEX for black
+        bright: ndarray(dtype=uint8, ndim=2)
+            brightness level of each pixel
+        lut: ndarray(dtype=uint8, ndim=3)
+            colors by colortable index and brightness, see palette_lut
+        shift: int
+            colortable indices added to each index (palette phase)
+        out: ndarray(dtype=uint8, ndim=3)
+            output image, shape index.shape + (3,)
+
+    Returns:
+        ndarray(dtype=uint8, ndim=3): out
+    """
+    # The last entry of a cyclic colortable is its first one
+    period = lut.shape[0] - 1
+    for y in range(index.shape[0]):
+        for x in range(index.shape[1]):
+            i = index[y, x]
+            if i == INTERIOR_INDEX:
+                for c in range(3):
+                    out[y, x, c] = 0
+            else:
+                j = (i + shift) % period
+                b = bright[y, x]
+                for c in range(3):
+                    out[y, x, c] = lut[j, b, c]
+    return out
+
+
+class PaletteCycler:
+    """Recolor the last captured view with a shifting palette phase"""
+
+    def __init__(self, speed=0.1):
+        """Cycler, animated once a view is captured
+
+        Args:
+            speed: float
+                palette cycles per second of frame_at
+        """
+        self.speed = speed
+        self.index = None
+        self.bright = None
+        self._colortable = None
+        self._lut = None
+        self._out = None
+
+    @property
+    def captured(self):
+        """Whether a view was captured"""
+        return self.index is not None
+
+    def capture(self, mand, timer=None):
+        """Compute the colortable index and brightness of the view of mand
+        (CPU, one point per pixel)
+
+        Args:
+            timer: StageTimer
+                if given, records the duration of the shading kernel
+        """
+        with maybe_stage(timer, 'shading'):
+            index, bright = mand.compute_shading(timer)
+        self.set_colortable(mand.colortable)
+        self._out = np.empty(index.shape + (3,), dtype=np.uint8)
+        self.index, self.bright = index, bright
+
+    def set_colortable(self, colortable):
+        """Palette of the next frames (its table is built if it changed)"""
+        if colortable is not self._colortable:
+            self._lut = palette_lut(colortable)
+            self._colortable = colortable
+
+    def release(self):
+        """Forget the captured view"""
+        self.index = self.bright = self._out = None
+
+    def frame(self, phase):
+        """Image of the captured view with the palette shifted by phase
+
+        Args:
+            phase: float
+                palette phase, in cycles (1 is a full cycle)
+
+        Returns:
+            ndarray(dtype=uint8, ndim=3): image, rows ordered like the set
+            of the captured view. Overwritten by the next frame.
+        """
+        if not self.captured:
+            raise RuntimeError("No view captured for palette cycling")
+        period = self._lut.shape[0] - 1
+        shift = round(phase * period) % period
+        return remap(self.index, self.bright, self._lut, shift, self._out)
+
+    def frame_at(self, seconds):
+        """Image of the animation at time seconds, see frame"""
+        return self.frame(self.speed * seconds)
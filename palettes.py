@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+"""
+Palettes: the colortables of the kernels, built once and cached.
+
+A colortable is an (ncol, 3) array of RGB values cycled through by
+color_pixel. A palette is either sinusoidal (one phase per channel, see
+sin_colortable) or a gradient interpolated between color stops:
+
+  fire = [(0, '#000000'), (.3, '#b00000'), (.6, '#ffb000'), (1, '#ffffff')]
+  mand = Mandelbrot(palette=fire)
+  register_palette('my fire', fire)     # then Mandelbrot(palette='my fire')
+
+Colortables are kept in a small LRU cache keyed by palette, size and layout:
+switching between palettes costs nothing after their first use. The kernels
+read the compact float32 layout (48 KB for 4096 colors, instead of 96 KB in
+float64); the uint8 layout (12 KB) is meant for display lookup tables. Cached
+tables are read-only, copy one to modify it.
+"""
+
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Number of colors of the colortables
+DEFAULT_NCOL = 2**12
+
+# Cached colortables (all palettes, sizes and layouts)
+CACHE_SIZE = 32
+
+# Gradient palettes by name: color stops (position in [0, 1], color)
+_GRADIENTS = {
+    'Fire': ((0., '#000000'), (.25, '#7a0a00'), (.5, '#e8500c'),
+             (.75, '#ffd34d'), (.9, '#ffffff')),
+    'Ice': ((0., '#020b1f'), (.3, '#0f4c81'), (.6, '#7cc6f2'),
+            (.8, '#ffffff')),
+    'Twilight': ((0., '#1b0c41'), (.3, '#7a2a8c'), (.55, '#e16462'),
+                 (.75, '#fca636'), (.9, '#f0f921')),
+    'Grayscale': ((0., '#000000'), (.5, '#ffffff')),
+}
+
+
+def sin_colortable(rgb_thetas=(.85, .0, .15), ncol=2**12):
+    """ Sinusoidal color table
+
+    Cyclic and smooth color table made with a sinus function for each color
+    channel
+    Args:
+        rgb_thetas: (float, float, float)
+            phase for each color channel
+        ncol: int
+            number of color in the output table
+
+    Returns:
+        ndarray(dtype=float, ndim=2): color table
+    """
+    def colormap(x, rgb_thetas):
+        # x in [0,1]
+        # Compute the frequency and phase of each channel
+        y = np.column_stack(((x + rgb_thetas[0]) * 2 * math.pi,
+                             (x + rgb_thetas[1]) * 2 * math.pi,
+                             (x + rgb_thetas[2]) * 2 * math.pi))
+        # Set amplitude to [0,1]
+        val = 0.5 + 0.5*np.sin(y)
+        return val
+    return colormap(np.linspace(0, 1, ncol), rgb_thetas)
+
+
+def parse_color(color):
+    """RGB color in [0, 1] of '#rrggbb' or of an (r, g, b) sequence in [0, 1]"""
+    if isinstance(color, str):
+        value = color.lstrip('#')
+        if len(value) != 6:
+            raise ValueError(f"Invalid color '{color}', expected '#rrggbb'")
+        return tuple(int(value[i:i+2], 16) / 255 for i in (0, 2, 4))
+    rgb = tuple(float(v) for v in color)
+    if len(rgb) != 3 or not all(0 <= v <= 1 for v in rgb):
+        raise ValueError(f"Invalid color {color}, expected 3 values in [0, 1]")
+    return rgb
+
+
+def gradient_colortable(stops, ncol=2**12, cyclic=True):
+    """ Gradient color table
+
+    Colors linearly interpolated between color stops. Cyclic tables wrap
+    from the last stop back to the first one, so that cycling through the
+    table shows no seam.
+
+    Args:
+        stops: [(float, color), ...]
+            positions in [0, 1] and colors ('#rrggbb' or (r, g, b) in [0, 1])
+        ncol: int
+            number of color in the output table
+        cyclic: boolean
+            interpolate from the last stop to the first one
+
+    Returns:
+        ndarray(dtype=float, ndim=2): color table
+    """
+    if not stops:
+        raise ValueError("A gradient needs at least one color stop")
+    stops = sorted((float(position), parse_color(color))
+                   for position, color in stops)
+    positions = np.array([position for position, _ in stops])
+    colors = np.array([color for _, color in stops])
+    if positions[0] < 0 or positions[-1] > 1:
+        raise ValueError("Color stop positions must be in [0, 1]")
+    x = np.linspace(0, 1, ncol)
+    if cyclic:
+        # Back to the first color one period after the first stop
+        positions = np.append(positions, positions[0] + 1)
+        colors = np.vstack((colors, colors[:1]))
+        x = np.where(x < positions[0], x + 1, x)
+    return np.column_stack([np.interp(x, positions, colors[:, i])
+                            for i in range(3)])
+
+
+def register_palette(name, stops):
+    """Register a gradient palette under a name (replaces any previous one)
+
+    Args:
+        name: str
+            palette name, used as Mandelbrot(palette=name)
+        stops: [(float, color), ...]
+            color stops, see gradient_colortable
+
+    Render parameters refer to the palette by name: worker processes need
+    to register it too.
+    """
+    # Validated now rather than at the first render
+    gradient_colortable(stops, ncol=2)
+    _GRADIENTS[name] = tuple((float(position), color)
+                             for position, color in stops)
+
+
+def palette_names():
+    """Names of the registered gradient palettes"""
+    return list(_GRADIENTS)
+
+
+def palette_params(palette):
+    """JSON serializable description of a palette (see render_params): None
+    (sinusoidal), a name, or a list of [position, color] stops"""
+    if palette is None or isinstance(palette, str):
+        return palette
+    return [[float(position),
+             color if isinstance(color, str) else [float(v) for v in color]]
+            for position, color in palette]
+
+
+def _palette_key(palette):
+    """Hashable description of a palette: the stops of a gradient"""
+    if isinstance(palette, str):
+        if palette not in _GRADIENTS:
+            raise ValueError(f"Unknown palette '{palette}', registered "
+                             f"palettes: {', '.join(palette_names())}")
+        palette = _GRADIENTS[palette]
+    return tuple((float(position),
+                  color if isinstance(color, str) else tuple(color))
+                 for position, color in palette)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_colortable(rgb_thetas, stops, ncol, dtype):
+    """Build a colortable (arguments hashable), see colortable"""
+    if stops is None:
+        table = sin_colortable(rgb_thetas, ncol)
+    else:
+        table = gradient_colortable(stops, ncol)
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'ui':
+        table = np.round(table * np.iinfo(dtype).max)
+    table = np.ascontiguousarray(table, dtype=dtype)
+    # Shared by every caller
+    table.flags.writeable = False
+    return table
+
+
+def colortable(rgb_thetas=(.85, .0, .15), palette=None, ncol=DEFAULT_NCOL,
+               dtype=np.float32):
+    """ Cached color table of a palette
+
+    Args:
+        rgb_thetas: (float, float, float)
+            phase for each color channel of the sinusoidal palette
+        palette: str or [(float, color), ...]
+            gradient palette, registered name or color stops (see
+            gradient_colortable); None for the sinusoidal palette
+        ncol: int
+            number of color in the output table
+        dtype: numpy type
+            layout: float32 (values in [0, 1], read by the kernels) or uint8
+            (values in [0, 255])
+
+    Returns:
+        ndarray(dtype=dtype, ndim=2): read-only color table
+    """
+    if palette is None:
+        rgb_thetas, stops = tuple(float(v) for v in rgb_thetas), None
+    else:
+        # Gradients do not depend on the phases
+        rgb_thetas, stops = None, _palette_key(palette)
+    return _cached_colortable(rgb_thetas, stops, int(ncol),
+                              np.dtype(dtype).name)
+
+
+def cache_info():
+    """Hits, misses and size of the colortable cache"""
+    return _cached_colortable.cache_info()
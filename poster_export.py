@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""
+Out-of-core export of very large images of the Mandelbrot set.
+
+The image is rendered in bands of rows, sized to fit in a memory budget, and
+each band is written out as soon as it is computed: either streamed to a PNG
+file or stored in a memory-mapped .npy array. Peak memory no longer depends
+on the size of the image.
+
+  export_poster(mand, 'poster.png', 32768, oversampling=2, bit_depth=16)
+"""
+
+import copy
+import math
+import struct
+import zlib
+
+import numpy as np
+
+# Optional dependency to check the budget against the available memory
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Bytes of one float64 RGB sample
+FLOAT_RGB_BYTES = 3 * 8
+
+
+def sample_bytes(oversampling, dtype=np.uint8):
+    """Peak working memory of Mandelbrot.compute_rows per oversampled sample
+
+    The float64 RGB image of the kernel is alive until the end. Quantization
+    adds its scaled float64 copy and the quantized samples; averaging the
+    oversampling adds the quantized samples, the float64 means over columns
+    then rows, and the averaged pixels. The peak is the larger of the two stages (RenderPlanner
+    and band_rows_for_budget both use it).
+
+    Args:
+        oversampling: int
+            oversampling of the render
+        dtype: numpy integer type
+            type of the image
+
+    Returns:
+        float: bytes per oversampled sample
+    """
+    quantized = 3 * np.dtype(dtype).itemsize
+    quantize = 2 * FLOAT_RGB_BYTES + quantized
+    if oversampling == 1:
+        return quantize
+    oversample = (FLOAT_RGB_BYTES + quantized + FLOAT_RGB_BYTES/oversampling +
+                  (FLOAT_RGB_BYTES + quantized)/oversampling**2)
+    return max(quantize, oversample)
+
+
+class PNGStreamWriter:
+    """Write an RGB PNG file row by row, without holding the image"""
+
+    def __init__(self, filename, width, height, bit_depth=8,
+                 compression=6, chunk_size=2**20):
+        """Write an RGB PNG file row by row
+
+        Args:
+            filename: str
+                output file
+            width, height: int
+                image size, in pixels
+            bit_depth: int
+                8 or 16 bits per channel
+            compression: int
+                zlib compression level, 0-9
+            chunk_size: int
+                size of the IDAT chunks written to the file, in bytes
+        """
+        if bit_depth not in (8, 16):
+            raise ValueError(f"Unsupported bit depth: {bit_depth}")
+        self.width = width
+        self.height = height
+        self.bit_depth = bit_depth
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._pending = []
+        self._pending_size = 0
+        self._file = open(filename, 'wb')
+        self._file.write(b'\x89PNG\r\n\x1a\n')
+        # Color type 2: RGB
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                               bit_depth, 2, 0, 0, 0))
+
+    def _write_chunk(self, tag, data):
+        """Write a PNG chunk: length, tag, data and CRC"""
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(tag + data)))
+
+    def _flush_idat(self, data):
+        """Buffer compressed data, writing IDAT chunks when large enough"""
+        if data:
+            self._pending.append(data)
+            self._pending_size += len(data)
+        if self._pending_size >= self.chunk_size:
+            self._write_chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def write_rows(self, rows):
+        """Append rows to the image
+
+        Args:
+            rows: ndarray(ndim=3)
+                rows of shape (n, width, 3), uint8 or uint16 according to
+                bit_depth, top row first
+        """
+        dtype = np.dtype('>u2') if self.bit_depth == 16 else np.dtype('u1')
+        data = np.ascontiguousarray(rows, dtype=dtype).reshape(len(rows), -1)
+        # Filter type 0 (none) at the beginning of each scanline
+        scanlines = np.zeros((len(rows), data.shape[1]*dtype.itemsize + 1),
+                             dtype=np.uint8)
+        scanlines[:, 1:] = data.view(np.uint8)
+        self._flush_idat(self._compressor.compress(scanlines.tobytes()))
+        self.rows_written += len(rows)
+
+    def close(self):
+        """Finish the file"""
+        if self._file.closed:
+            return
+        self._pending.append(self._compressor.flush())
+        self._write_chunk(b'IDAT', b''.join(self._pending))
+        self._write_chunk(b'IEND', b'')
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def memory_budget(budget=None, fraction=0.5):
+    """Memory budget of an export, in bytes
+
+    Args:
+        budget: int
+            requested budget, None for no explicit limit
+        fraction: float
+            largest fraction of the available memory used, when psutil is
+            available
+
+    Returns:
+        int: budget, capped by the available memory
+    """
+    if PSUTIL_AVAILABLE:
+        available = int(psutil.virtual_memory().available * fraction)
+        budget = available if budget is None else min(budget, available)
+    if budget is None:
+        # No way to know the free memory: stay conservative
+        budget = 2**30
+    return budget
+
+
+def band_rows_for_budget(width, oversampling, budget, bit_depth=8):
+    """Largest number of rows of a band that fits in the memory budget
+
+    Raises:
+        MemoryError: if a single row does not fit
+    """
+    dtype = np.uint16 if bit_depth == 16 else np.uint8
+    samples_per_row = width * oversampling**2
+    row_bytes = math.ceil(samples_per_row * sample_bytes(oversampling, dtype) +
+                          width * 3 * (bit_depth // 8) * 2)
+    rows = budget // row_bytes
+    if rows < 1:
+        raise MemoryError(
+            f"A single row of {width} pixels with oversampling "
+            f"{oversampling} needs {row_bytes / 2**20:.0f} MB, more than the "
+            f"budget of {budget / 2**20:.0f} MB")
+    return int(rows)
+
+
+def export_poster(mand, filename, width, height=None, oversampling=None,
+                  bit_depth=8, budget=None, progress=None, cancel=None):
+    """Render the view of mand at any size, band by band, to a file
+
+    Args:
+        mand: Mandelbrot
+            view and coloring parameters, left unmodified
+        filename: str
+            output file: .png is streamed as PNG, .npy is a memory-mapped
+            numpy array of shape (height, width, 3), top row first
+        width: int
+            image width, in pixels
+        height: int
+            image height, defaults to the aspect ratio of the view
+        oversampling: int
+            oversampling of the export, defaults to the one of mand
+        bit_depth: int
+            8 or 16 bits per channel
+        budget: int
+            memory budget in bytes, capped by the available memory
+        progress: function
+            called as progress(rows_done, height) after each band
+        cancel: threading.Event
+            stops the export when set (the file is then incomplete)
+
+    Returns:
+        dict: size, band rows and memory budget used, and whether the export
+        completed
+    """
+    if bit_depth not in (8, 16):
+        raise ValueError(f"Unsupported bit depth: {bit_depth}")
+    view = copy.copy(mand)
+    view.xpixels = int(width)
+    if height is None:
+        height = round(width / (mand.coord[1]-mand.coord[0]) *
+                       (mand.coord[3]-mand.coord[2]))
+    view.ypixels = int(height)
+    if oversampling is not None:
+        view.os = int(oversampling)
+    # Image files are top row first
+    view.origin = 'upper'
+    dtype = np.uint16 if bit_depth == 16 else np.uint8
+
+    budget = memory_budget(budget)
+    band_rows = band_rows_for_budget(view.xpixels, view.os, budget, bit_depth)
+    band_rows = min(band_rows, view.ypixels)
+
+    if filename.lower().endswith('.npy'):
+        out = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype,
+                                        shape=(view.ypixels, view.xpixels, 3))
+        writer = None
+    else:
+        out = None
+        writer = PNGStreamWriter(filename, view.xpixels, view.ypixels,
+                                 bit_depth)
+
+    completed = False
+    try:
+        for y0 in range(0, view.ypixels, band_rows):
+            if cancel is not None and cancel.is_set():
+                break
+            y1 = min(y0 + band_rows, view.ypixels)
+            rows = view.compute_rows(y0, y1, dtype=dtype)
+            if writer is not None:
+                writer.write_rows(rows)
+            else:
+                out[y0:y1] = rows
+            if progress is not None:
+                progress(y1, view.ypixels)
+        else:
+            completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+        else:
+            out.flush()
+            del out
+
+    return {
+        'width': view.xpixels,
+        'height': view.ypixels,
+        'band_rows': band_rows,
+        'bands': math.ceil(view.ypixels / band_rows),
+        'budget': budget,
+        'completed': completed,
+    }
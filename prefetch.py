@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+"""
+Speculative prefetching of the views a user is likely to request next.
+
+While the interface is idle, a low priority thread renders the zoom-out and
+the neighbors of the current view into a small cache. The next render looks
+the cache up first, and any incoming user input cancels the prefetch.
+"""
+
+import copy
+import itertools
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def zoom_out_view(mand, factor=4.0):
+    """View covering every zoom-out around a point of the current view
+
+    Zooming out by factor at a point of the current frame (as a right click
+    does) gives a frame which is a crop of the returned, slightly larger,
+    frame: it has the same pixel pitch and spans all the possible centers.
+
+    Args:
+        mand: Mandelbrot
+            current view, left unmodified
+        factor: float
+            zoom-out scale, as passed to Mandelbrot.zoom_at
+
+    Returns:
+        Mandelbrot: shallow copy set up for the enlarged view
+    """
+    view = copy.copy(mand)
+    xs = mand.xpixels * mand.os
+    ys = mand.ypixels * mand.os
+    # Shade as the zoomed out frame, not as the enlarged one
+    view.diag = factor * mand.frame_diag()
+    # Pixel pitch of the zoomed out frame, on each axis
+    pitch_x = factor * (mand.coord[1] - mand.coord[0]) / (xs - 1)
+    pitch_y = factor * (mand.coord[3] - mand.coord[2]) / (ys - 1)
+    # The zoom center can be anywhere in the current frame
+    view.xpixels = math.ceil(((1 + factor) * (xs - 1) / factor + 1) / mand.os)
+    view.ypixels = math.ceil(((1 + factor) * (ys - 1) / factor + 1) / mand.os)
+    cx = (mand.coord[0] + mand.coord[1]) / 2
+    cy = (mand.coord[2] + mand.coord[3]) / 2
+    half_x = (view.xpixels * mand.os - 1) * pitch_x / 2
+    half_y = (view.ypixels * mand.os - 1) * pitch_y / 2
+    view.coord = [cx - half_x, cx + half_x, cy - half_y, cy + half_y]
+    return view
+
+
+def neighbor_views(mand):
+    """Views shifted by one frame to the left, right, bottom and top
+
+    Args:
+        mand: Mandelbrot
+            current view, left unmodified
+
+    Returns:
+        list of Mandelbrot: shallow copies set up for the neighboring views
+    """
+    width = mand.coord[1] - mand.coord[0]
+    height = mand.coord[3] - mand.coord[2]
+    views = []
+    for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+        view = copy.copy(mand)
+        view.coord = [mand.coord[0] + dx*width, mand.coord[1] + dx*width,
+                      mand.coord[2] + dy*height, mand.coord[3] + dy*height]
+        views.append(view)
+    return views
+
+
+class ViewPrefetcher:
+    """Idle-time renderer of likely next views, with a small image cache"""
+
+    def __init__(self, max_entries=8, band_rows=16, pitch_tol=1e-6):
+        """Idle-time renderer of likely next views
+
+        Args:
+            max_entries: int
+                number of prefetched frames kept (least recently used first
+                out)
+            band_rows: int
+                rows rendered between two cancellation checks
+            pitch_tol: float
+                relative tolerance on the pixel pitch for a cache hit
+        """
+        self.max_entries = max_entries
+        self.band_rows = band_rows
+        self.pitch_tol = pitch_tol
+        self._cache = OrderedDict()
+        self._entry_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.rendered = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def _params_key(mand):
+        """Rendering parameters other than the view and resolution"""
+        params = mand.render_params()
+        for name in ('coord', 'xpixels', 'ypixels', 'diag'):
+            del params[name]
+        return tuple((k, tuple(v) if isinstance(v, list) else v)
+                     for k, v in sorted(params.items()))
+
+    def schedule(self, views):
+        """Start prefetching views in the background
+
+        Any prefetch in progress is cancelled first. Views already in the
+        cache are skipped.
+
+        Args:
+            views: list of Mandelbrot
+                views to render, most likely first. They are rendered in
+                place, so pass copies (see zoom_out_view and neighbor_views).
+        """
+        self.cancel()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(views, self._cancel),
+                                        daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """Stop the prefetch in progress, without waiting for it
+
+        The band being rendered is dropped as soon as it completes.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._cancel.set()
+            self.cancelled += 1
+
+    def _run(self, views, cancel):
+        """Prefetch thread: render views band by band until cancelled"""
+        try:
+            # Lowest priority for this thread only (Linux)
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+        for view in views:
+            if cancel.is_set():
+                return
+            if self._find(view) is not None:
+                continue
+            image = np.empty((view.ypixels, view.xpixels, 3), dtype=np.uint8)
+            for y0 in range(0, view.ypixels, self.band_rows):
+                if cancel.is_set():
+                    return
+                y1 = min(y0 + self.band_rows, view.ypixels)
+                image[y0:y1] = view.compute_rows(y0, y1)
+            with self._lock:
+                self._cache[next(self._entry_ids)] = (
+                    self._params_key(view), view.frame_diag(),
+                    tuple(view.coord), view.os, image)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+            self.rendered += 1
+
+    def _find(self, mand):
+        """Look for a cached frame containing the view of mand
+
+        Returns:
+            (ndarray, list) or None: cropped image and its exact coordinates
+        """
+        key = self._params_key(mand)
+        diag = mand.frame_diag()
+        xs = mand.xpixels * mand.os
+        ys = mand.ypixels * mand.os
+        pitch_x = (mand.coord[1] - mand.coord[0]) / (xs - 1)
+        pitch_y = (mand.coord[3] - mand.coord[2]) / (ys - 1)
+        with self._lock:
+            for entry_id, entry in self._cache.items():
+                ekey, ediag, ecoord, eos, image = entry
+                if (ekey != key or
+                        abs(ediag - diag) > self.pitch_tol * abs(ediag)):
+                    continue
+                eh, ew = image.shape[:2]
+                epitch_x = (ecoord[1] - ecoord[0]) / (ew*eos - 1)
+                epitch_y = (ecoord[3] - ecoord[2]) / (eh*eos - 1)
+                if (abs(epitch_x - pitch_x) > self.pitch_tol * abs(epitch_x) or
+                        abs(epitch_y - pitch_y) > self.pitch_tol * abs(epitch_y)):
+                    continue
+                # Offset of the view in the cached frame, snapped to a pixel
+                # (rows counted from the top with origin='upper')
+                ax = round((mand.coord[0] - ecoord[0]) / (epitch_x * eos))
+                if mand.origin == 'upper':
+                    ay = round((ecoord[3] - mand.coord[3]) / (epitch_y * eos))
+                else:
+                    ay = round((mand.coord[2] - ecoord[2]) / (epitch_y * eos))
+                if (ax < 0 or ay < 0 or ax + mand.xpixels > ew or
+                        ay + mand.ypixels > eh):
+                    continue
+                self._cache.move_to_end(entry_id)
+                x0 = ecoord[0] + ax*eos*epitch_x
+                if mand.origin == 'upper':
+                    y0 = ecoord[3] - ay*eos*epitch_y - (ys - 1)*epitch_y
+                else:
+                    y0 = ecoord[2] + ay*eos*epitch_y
+                coord = [x0, x0 + (xs - 1)*epitch_x,
+                         y0, y0 + (ys - 1)*epitch_y]
+                crop = image[ay:ay + mand.ypixels, ax:ax + mand.xpixels]
+                return np.ascontiguousarray(crop), coord
+        return None
+
+    def lookup(self, mand):
+        """Cached image for the view of mand, counted in the hit rate
+
+        On a hit, the view is snapped to the cached pixel grid (by less than
+        half a pixel), so the image matches the returned coordinates.
+
+        Args:
+            mand: Mandelbrot
+                requested view
+
+        Returns:
+            (ndarray, list) or None: image (same layout as Mandelbrot.set) and
+            coordinates of the frame, None on a miss
+        """
+        found = self._find(mand)
+        if found is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return found
+
+    def stats(self):
+        """Prefetch statistics
+
+        Returns:
+            dict: hits, misses, hit_rate in [0,1], frames rendered and
+            prefetches cancelled
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'rendered': self.rendered,
+            'cancelled': self.cancelled,
+        }
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+Adaptive preview quality driven by a frame-time budget.
+
+Render times are measured against the work of each frame (pixels times
+iterations) to estimate the cost of one pixel-iteration. The interactive
+preview then uses the best resolution, oversampling and iteration count that
+fit in the target frame time, and the view is upgraded to full quality once
+it settles.
+"""
+
+
+class FrameBudgetController:
+    """Pick preview render settings that fit in a target frame time"""
+
+    def __init__(self, target_frame_time=0.1, settle_delay=0.5,
+                 min_scale=0.25, max_oversampling=3, min_maxiter=100,
+                 smoothing=0.3):
+        """Pick preview render settings that fit in a target frame time
+
+        Args:
+            target_frame_time: float
+                render time budget of an interactive frame, in seconds
+            settle_delay: float
+                idle time, in seconds, after which the view is rendered at
+                full quality
+            min_scale: float
+                smallest resolution scale of the preview
+            max_oversampling: int
+                largest oversampling used when the budget allows it
+            min_maxiter: int
+                smallest provisional iteration count of the preview
+            smoothing: float
+                weight of the last measure in the cost estimate, in ]0,1]
+        """
+        self.target_frame_time = target_frame_time
+        self.settle_delay = settle_delay
+        self.min_scale = min_scale
+        self.max_oversampling = max_oversampling
+        self.min_maxiter = min_maxiter
+        self.smoothing = smoothing
+        # Estimated render time of one pixel-iteration, in seconds
+        self.cost = None
+
+    def record(self, pixels, maxiter, seconds):
+        """Update the cost estimate with a measured render
+
+        Args:
+            pixels: int
+                number of computed samples (including oversampling)
+            maxiter: int
+                maximal number of iterations of the render
+            seconds: float
+                measured render time
+        """
+        work = pixels * maxiter
+        if work <= 0 or seconds <= 0:
+            return
+        cost = seconds / work
+        if self.cost is None:
+            self.cost = cost
+        else:
+            self.cost = (1 - self.smoothing) * self.cost + self.smoothing * cost
+
+    def estimate(self, width, height, oversampling, maxiter):
+        """Estimated render time in seconds, None before any measure"""
+        if self.cost is None:
+            return None
+        return self.cost * width * height * oversampling**2 * maxiter
+
+    def plan(self, width, height, oversampling, maxiter):
+        """Render settings of the interactive preview
+
+        Degrades oversampling first, then resolution, then the iteration
+        count, until the estimated frame time fits in the budget. When the
+        full quality frame is cheap, oversampling is raised instead.
+
+        Args:
+            width, height: int
+                full quality frame size, in pixels
+            oversampling: int
+                full quality oversampling
+            maxiter: int
+                full quality maximal number of iterations
+
+        Returns:
+            dict: scale (resolution factor), oversampling, maxiter, the
+            estimated time and whether the preview is below full quality
+        """
+        plan = {'scale': 1.0, 'oversampling': oversampling,
+                'maxiter': maxiter, 'estimate': None, 'degraded': False}
+        if self.cost is None:
+            # No measure yet: render at full quality to get one
+            return plan
+        budget = self.target_frame_time
+
+        def estimate():
+            return self.estimate(width * plan['scale'],
+                                 height * plan['scale'],
+                                 plan['oversampling'], plan['maxiter'])
+
+        # Budget to spare: use more of the machine
+        while (plan['oversampling'] < self.max_oversampling and
+               self.estimate(width, height, plan['oversampling'] + 1,
+                             maxiter) <= budget):
+            plan['oversampling'] += 1
+        # Over budget: oversampling, then resolution, then iterations
+        while estimate() > budget and plan['oversampling'] > 1:
+            plan['oversampling'] -= 1
+        if estimate() > budget:
+            scale = (budget / estimate()) ** 0.5
+            plan['scale'] = max(self.min_scale, scale)
+        if estimate() > budget:
+            ratio = budget / estimate()
+            plan['maxiter'] = max(min(self.min_maxiter, maxiter),
+                                  int(maxiter * ratio))
+        plan['estimate'] = estimate()
+        plan['degraded'] = (plan['scale'] < 1 or
+                            plan['oversampling'] < oversampling or
+                            plan['maxiter'] < maxiter)
+        return plan
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""
+Distributed rendering: a coordinator dispatching tiles to worker processes.
+
+The coordinator listens on a TCP address, or on a Unix socket for a single
+host, and worker processes (on any machine) connect to it. Frames are split
+into tiles, or animations into frames, and each job is sent to the next idle
+worker with the full parameter set of the view (Mandelbrot.render_params), so
+that the result matches a local render bit for bit. Jobs of a failing or
+disconnected worker are sent again to another one.
+
+  # on each worker host
+  python render_farm.py worker --connect coordinator:5555
+  # on the coordinator
+  with RenderCoordinator(('0.0.0.0', 5555)) as farm:
+      image = farm.render_frame(mand, tile_size=512)
+
+Messages are a 4 bytes big-endian header length, a JSON header, then the
+raw bytes of the payload announced by the header ('nbytes'), if any.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+
+import numpy as np
+
+from mandelbrot import Mandelbrot
+
+
+def parse_address(address):
+    """Socket family and address of 'host:port', (host, port) or a path
+
+    Returns:
+        (int, object): address family and socket address
+    """
+    if isinstance(address, tuple):
+        return socket.AF_INET, address
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '0.0.0.0', int(port))
+    # Anything else is the path of a Unix socket
+    return socket.AF_UNIX, address
+
+
+def _recv_exact(sock, size):
+    """Receive exactly size bytes, raise ConnectionError on end of stream"""
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            raise ConnectionError("Connection closed by peer")
+        received += n
+    return data
+
+
+def send_message(sock, header, payload=None):
+    """Send a JSON header followed by an optional binary payload"""
+    if payload is not None:
+        payload = memoryview(payload).cast('B')
+        header = dict(header, nbytes=payload.nbytes)
+    data = json.dumps(header).encode()
+    sock.sendall(struct.pack('>I', len(data)) + data)
+    if payload is not None:
+        sock.sendall(payload)
+
+
+def recv_message(sock):
+    """Receive a message
+
+    Returns:
+        (dict, bytearray): header, and payload (None if there is none)
+    """
+    size, = struct.unpack('>I', _recv_exact(sock, 4))
+    header = json.loads(_recv_exact(sock, size))
+    payload = None
+    if 'nbytes' in header:
+        payload = _recv_exact(sock, header['nbytes'])
+    return header, payload
+
+
+def split_tiles(width, height, tile_size):
+    """Tiles (x0, y0, x1, y1) covering a frame, row by row"""
+    return [(x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+            for y0 in range(0, height, tile_size)
+            for x0 in range(0, width, tile_size)]
+
+
+class _Job:
+    """A tile to render, and its result once done"""
+
+    def __init__(self, job_id, params, tile):
+        self.id = job_id
+        self.params = params
+        self.tile = tile
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RenderCoordinator:
+    """Dispatch render jobs to the connected workers"""
+
+    def __init__(self, address, max_retries=3):
+        """Listen for workers
+
+        Args:
+            address: str or (str, int)
+                'host:port' or (host, port) for TCP, a path for a Unix socket
+            max_retries: int
+                number of times a failed job is sent again before the render
+                is given up
+        """
+        family, self.address = parse_address(address)
+        self.family = family
+        self.max_retries = max_retries
+        self._listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR,
+                                      1)
+        self._listener.bind(self.address)
+        self._listener.listen()
+        if family == socket.AF_INET:
+            # Actual port when 0 was requested
+            self.address = self._listener.getsockname()
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._closed = False
+        self.workers = 0
+        self.stats = {'jobs': 0, 'retries': 0, 'failures': 0}
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        """Serve each connecting worker in its own thread"""
+        while not self._closed:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                break
+            with self._lock:
+                self.workers += 1
+            threading.Thread(target=self._serve, args=(conn,),
+                             daemon=True).start()
+
+    def _serve(self, conn):
+        """Feed jobs to a worker until it fails or the coordinator closes"""
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    send_message(conn, {'type': 'shutdown'})
+                    break
+                try:
+                    send_message(conn, {'type': 'job', 'id': job.id,
+                                        'params': job.params,
+                                        'tile': job.tile})
+                    header, payload = recv_message(conn)
+                except (OSError, ValueError) as exc:
+                    # Lost worker: the job goes to another one
+                    self._retry(job, f"worker lost: {exc}")
+                    break
+                if header.get('type') == 'result' and header['id'] == job.id:
+                    job.result = np.frombuffer(
+                        payload, dtype=header['dtype']).reshape(
+                            header['shape'])
+                    job.done.set()
+                else:
+                    self._retry(job, header.get('message', "bad reply"))
+        except OSError:
+            pass
+        finally:
+            conn.close()
+            with self._lock:
+                self.workers -= 1
+
+    def _retry(self, job, message):
+        """Send a failed job again, or give it up after max_retries"""
+        job.attempts += 1
+        with self._lock:
+            if job.attempts > self.max_retries:
+                self.stats['failures'] += 1
+                job.error = message
+                job.done.set()
+                return
+            self.stats['retries'] += 1
+        self._jobs.put(job)
+
+    def submit(self, mand, tile=None):
+        """Queue the render of a tile of the view of mand
+
+        Args:
+            mand: Mandelbrot
+                view and coloring parameters
+            tile: (int, int, int, int)
+                pixels x0, y0, x1, y1 of the frame, None for the whole frame
+
+        Returns:
+            _Job: wait for job.done, then read job.result or job.error
+        """
+        params = mand.render_params()
+        if tile is None:
+            tile = (0, 0, params['xpixels'], params['ypixels'])
+        with self._lock:
+            job = _Job(self._next_id, params, [int(v) for v in tile])
+            self._next_id += 1
+            self.stats['jobs'] += 1
+        self._jobs.put(job)
+        return job
+
+    @staticmethod
+    def _wait(job, timeout):
+        """Result of a job, raise RuntimeError if it failed"""
+        if not job.done.wait(timeout):
+            raise TimeoutError(f"Job {job.id} not done after {timeout} s")
+        if job.error is not None:
+            raise RuntimeError(f"Job {job.id} failed after {job.attempts} "
+                               f"attempts: {job.error}")
+        return job.result
+
+    def render_frame(self, mand, tile_size=256, timeout=None):
+        """Render the view of mand, split in tiles across the workers
+
+        Args:
+            mand: Mandelbrot
+                view and coloring parameters, left unmodified
+            tile_size: int
+                tile width and height, in pixels
+            timeout: float
+                largest wait for each tile, in seconds (None: no limit)
+
+        Returns:
+            ndarray(dtype=uint8, ndim=3): image, same as mand.set after
+            mand.update_set()
+        """
+        jobs = [self.submit(mand, tile)
+                for tile in split_tiles(mand.xpixels, mand.ypixels,
+                                        tile_size)]
+        image = np.empty((mand.ypixels, mand.xpixels, 3), dtype=np.uint8)
+        for job in jobs:
+            x0, y0, x1, y1 = job.tile
+            image[y0:y1, x0:x1] = self._wait(job, timeout)
+        return image
+
+    def render_frames(self, mands, timeout=None):
+        """Render whole frames, one job per frame, yielded in order
+
+        Args:
+            mands: iterable of Mandelbrot
+                views of the frames (e.g. of an animation)
+            timeout: float
+                largest wait for each frame, in seconds (None: no limit)
+
+        Yields:
+            ndarray(dtype=uint8, ndim=3): images of the frames
+        """
+        jobs = [self.submit(mand) for mand in mands]
+        for job in jobs:
+            yield self._wait(job, timeout)
+
+    def close(self):
+        """Stop the workers and the listening socket"""
+        if self._closed:
+            return
+        self._closed = True
+        with self._lock:
+            workers = self.workers
+        for _ in range(workers):
+            self._jobs.put(None)
+        self._listener.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_worker(address, gpu=False):
+    """Connect to a coordinator and render its jobs until shutdown
+
+    Args:
+        address: str or (str, int)
+            address of the coordinator
+        gpu: boolean
+            use CUDA on GPU to compute the tiles
+
+    Returns:
+        int: number of jobs rendered
+    """
+    family, address = parse_address(address)
+    done = 0
+    # Last view, reused while the jobs are tiles of the same frame
+    params, mand = None, None
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        while True:
+            try:
+                header, _ = recv_message(sock)
+            except ConnectionError:
+                break
+            if header['type'] == 'shutdown':
+                break
+            try:
+                if header['params'] != params:
+                    params = header['params']
+                    mand = Mandelbrot.from_render_params(params, gpu=gpu)
+                tile = mand.compute_tile(*header['tile'])
+            except Exception as exc:
+                params = None
+                send_message(sock, {'type': 'error', 'id': header['id'],
+                                    'message': repr(exc)})
+                continue
+            send_message(sock, {'type': 'result', 'id': header['id'],
+                                'shape': tile.shape, 'dtype': tile.dtype.str},
+                         np.ascontiguousarray(tile))
+            done += 1
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mandelbrot render worker")
+    parser.add_argument('mode', choices=['worker'])
+    parser.add_argument('--connect', required=True,
+                        help="coordinator 'host:port' or Unix socket path")
+    parser.add_argument('--gpu', action='store_true',
+                        help="compute on GPU with CUDA")
+    args = parser.parse_args()
+    print(f"{run_worker(args.connect, args.gpu)} jobs rendered")
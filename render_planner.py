@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+"""
+Peak memory planning of renders.
+
+Before a render, its peak memory is estimated from the buffers allocated by
+Mandelbrot.update_set: the float64 RGB image of the oversampled grid, its
+scaled copy, the quantized image and the oversampling means (the model of
+poster_export.sample_bytes, shared with the poster bands), and the frame (the
+previous frame is still alive while the new one is computed). If the peak does not fit in the
+memory budget, the frame is rendered in bands of rows sized to fit, or the
+render is refused with a MemoryError explaining why.
+
+  planner = RenderPlanner(budget=2**30)
+  print(planner.plan(mand))      # mode, estimated peak, band rows
+  planner.render(mand)           # sets mand.set like update_set
+
+In debug mode (debug=True, or MANDELBROT_DEBUG_MEMORY=1), the actual peak
+of each render is measured with tracemalloc (numpy buffers) and by sampling
+the resident memory (everything, including the kernel's own buffers).
+"""
+
+import math
+import os
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from poster_export import memory_budget, sample_bytes
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+# Environment variable enabling the measure of the actual peaks
+DEBUG_ENV = 'MANDELBROT_DEBUG_MEMORY'
+
+# Allocations of a render besides its arrays (measured under 64 KB)
+RENDER_OVERHEAD = 2**17
+
+
+def peak_bytes(xpixels, ypixels, oversampling, dtype=np.uint8, rows=None,
+               previous=0):
+    """Estimated peak memory of a render, in bytes
+
+    Args:
+        xpixels, ypixels: int
+            frame size, in pixels
+        oversampling: int
+            oversampling of the render
+        dtype: numpy integer type
+            type of the frame
+        rows: int
+            rows computed at once (banded render), None for the whole frame
+        previous: int
+            bytes of the previous frame, alive during the render
+
+    Returns:
+        int: estimated peak, in bytes
+    """
+    itemsize = np.dtype(dtype).itemsize
+    rows = ypixels if rows is None else min(rows, ypixels)
+    samples = xpixels * rows * oversampling**2
+    # Same model as the bands of export_poster, plus the float64 grid
+    work = (math.ceil(samples * sample_bytes(oversampling, dtype)) +
+            8 * oversampling * (xpixels + ypixels) + RENDER_OVERHEAD)
+    frame = xpixels * ypixels * 3 * itemsize
+    if rows < ypixels:
+        # Bands are copied into a frame allocated up front
+        return work + frame + previous
+    return work + previous
+
+
+class RenderPlanner:
+    """Fit renders in a memory budget: whole, in bands, or refused"""
+
+    def __init__(self, budget=None, fraction=0.5, debug=None):
+        """Plan renders against a memory budget
+
+        Args:
+            budget: int
+                memory budget in bytes, None to only use available memory
+            fraction: float
+                largest fraction of the available memory used (psutil)
+            debug: boolean
+                measure actual peaks, defaults to MANDELBROT_DEBUG_MEMORY
+        """
+        self.budget = budget
+        self.fraction = fraction
+        if debug is None:
+            debug = os.environ.get(DEBUG_ENV, '') not in ('', '0')
+        self.debug = debug
+        # Plan (with measures in debug mode) of the last render
+        self.last_plan = None
+
+    def plan(self, mand, dtype=np.uint8):
+        """Plan the render of the view of mand
+
+        Returns:
+            dict: mode ('direct', 'banded' or 'refused'), estimated peak and
+            budget in bytes, band rows, and a message for refused renders
+        """
+        budget = memory_budget(self.budget, self.fraction)
+        current = mand.current_set
+        previous = current.nbytes if current is not None else 0
+        peak = peak_bytes(mand.xpixels, mand.ypixels, mand.os, dtype,
+                          previous=previous)
+        plan = {'mode': 'direct', 'peak_bytes': peak, 'budget': budget,
+                'rows': mand.ypixels, 'message': None}
+        if peak <= budget:
+            return plan
+        # Largest bands that fit next to the frame
+        fixed = peak_bytes(mand.xpixels, mand.ypixels, mand.os, dtype,
+                           rows=0, previous=previous)
+        row = peak_bytes(mand.xpixels, 1, mand.os, dtype)
+        rows = (budget - fixed) // row
+        if rows >= 1:
+            plan.update(mode='banded', rows=int(rows),
+                        peak_bytes=fixed + rows * row)
+            return plan
+        plan.update(mode='refused', rows=0, message=(
+            f"A {mand.xpixels}x{mand.ypixels} render with oversampling "
+            f"{mand.os} needs at least {(fixed + row) / 2**20:.1f} MB, more "
+            f"than the memory budget of {budget / 2**20:.1f} MB: lower the "
+            f"resolution or the oversampling, or export it as a poster"))
+        return plan
+
+    def render(self, mand, dtype=np.uint8, timer=None):
+        """Render the view of mand within the budget (sets mand.set)
+
+        Args:
+            timer: StageTimer
+                if given, records the duration of each stage
+
+        Returns:
+            dict: the plan, with measured peaks in debug mode
+
+        Raises:
+            MemoryError: if the render cannot fit in the budget
+        """
+        plan = self.plan(mand, dtype)
+        self.last_plan = plan
+        if plan['mode'] == 'refused':
+            raise MemoryError(plan['message'])
+        if self.debug:
+            with PeakMemory() as peak:
+                self._render(mand, plan, dtype, timer)
+            plan.update(peak.result())
+        else:
+            self._render(mand, plan, dtype, timer)
+        return plan
+
+    @staticmethod
+    def _render(mand, plan, dtype, timer):
+        """Run a plan"""
+        if plan['mode'] == 'direct' and dtype == np.uint8:
+            mand.update_set(timer=timer)
+            return
+        frame = np.empty((mand.ypixels, mand.xpixels, 3), dtype=dtype)
+        for y0 in range(0, mand.ypixels, plan['rows']):
+            y1 = min(y0 + plan['rows'], mand.ypixels)
+            frame[y0:y1] = mand.compute_rows(y0, y1, dtype, timer=timer)
+        mand.set = frame
+
+
+class PeakMemory:
+    """Measure the peak memory of a block: tracemalloc and resident memory
+
+    Resident memory is sampled by a thread every interval seconds, and is
+    only available with psutil.
+    """
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._rss_start = None
+        self._rss_peak = None
+        self._traced_start = 0
+        self._traced_peak = None
+        self._thread = None
+        self._tracing = False
+
+    def _sample(self):
+        process = psutil.Process()
+        while not self._stop.is_set():
+            self._rss_peak = max(self._rss_peak, process.memory_info().rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._traced_start, _ = tracemalloc.get_traced_memory()
+        if PSUTIL_AVAILABLE:
+            self._rss_start = self._rss_peak = psutil.Process().memory_info().rss
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        _, peak = tracemalloc.get_traced_memory()
+        self._traced_peak = peak - self._traced_start
+        if self._tracing:
+            tracemalloc.stop()
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+
+    def result(self):
+        """Measured peaks, in bytes: traced (numpy and Python allocations)
+        and resident memory increase (None without psutil)"""
+        return {
+            'traced_peak_bytes': self._traced_peak,
+            'rss_peak_bytes': (self._rss_peak - self._rss_start
+                               if self._rss_start is not None else None),
+        }
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Out-of-process rendering into shared memory.
+
+A render subprocess computes the set into multiprocessing.shared_memory
+buffers owned by the UI process: requests are the small render_params dict,
+and the image is read in place from the shared buffer, never pickled. Two
+buffers are used in turn, so the previous image stays valid while the next
+one is rendered.
+
+  renderer = RenderProcess()
+  image = renderer.render(mand)   # ndarray mapped on shared memory
+  renderer.close()
+"""
+
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_timing import StageTimer
+from mandelbrot import Mandelbrot
+
+
+def _attach(name):
+    """Map an existing shared memory block, owned by another process"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the block is registered again, in the resource
+        # tracker shared with the UI process, which unlinks it
+        return shared_memory.SharedMemory(name=name)
+
+
+def _release(shm):
+    """Remove a shared memory block created by this process
+
+    Only its name is removed: the block stays mapped until the last image
+    using it is garbage collected (closing it would leave them dangling).
+    """
+    shm.unlink()
+
+
+class _SharedImage:
+    """Array interface of an image in a shared memory block
+
+    Arrays made from it (np.asarray) keep it as their base, and it keeps the
+    SharedMemory object, so the block is mapped as long as they are alive.
+    """
+
+    def __init__(self, shm, shape):
+        self.shm = shm
+        self.__array_interface__ = {
+            'version': 3,
+            'shape': shape,
+            'typestr': '|u1',
+            'data': (np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data,
+                     False),
+        }
+
+
+def _serve(conn, gpu):
+    """Render process: render requests into shared buffers until None"""
+    # Compile the kernels before the first request
+    Mandelbrot(xpixels=8, maxiter=10, oversampling=1, gpu=gpu,
+               compute=False).update_set()
+    buffers = {}
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        start = time.perf_counter()
+        try:
+            name = request['buffer']
+            if name not in buffers:
+                # The UI replaced a buffer: forget the ones it released
+                for old in set(buffers) - set(request['live']):
+                    buffers.pop(old).close()
+                buffers[name] = _attach(name)
+            mand = Mandelbrot.from_render_params(request['params'], gpu=gpu)
+            out = np.ndarray(request['shape'], dtype=np.uint8,
+                             buffer=buffers[name].buf)
+            timer = StageTimer()
+            out[...] = mand.compute_rows(0, mand.ypixels, timer=timer)
+            del out
+            conn.send(('done', request['job'],
+                       (time.perf_counter() - start, timer.stages)))
+        except Exception as exc:
+            conn.send(('error', request['job'], repr(exc)))
+    for shm in buffers.values():
+        shm.close()
+
+
+class RenderProcess:
+    """Render in a subprocess, results in shared memory"""
+
+    def __init__(self, gpu=False):
+        """Start the render process
+
+        Args:
+            gpu: boolean
+                use CUDA on GPU to compute the set, in the render process
+        """
+        self.gpu = gpu
+        self._buffers = [None, None]
+        self._next = 0
+        self._job = 0
+        self._lock = threading.Lock()
+        self._process = None
+        self.last_render_time = None
+        # Stage durations of the last render, in the render process
+        self.last_stages = {}
+        self._start()
+
+    def _start(self):
+        """(Re)start the render process"""
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child = ctx.Pipe()
+        self._process = ctx.Process(target=_serve, args=(child, self.gpu),
+                                    daemon=True)
+        self._process.start()
+        child.close()
+
+    def _buffer(self, nbytes):
+        """Next of the two shared buffers, grown to nbytes if needed"""
+        slot = self._next
+        self._next = 1 - slot
+        shm = self._buffers[slot]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                _release(shm)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._buffers[slot] = shm
+        return shm
+
+    def render(self, mand, timeout=None):
+        """Render the view of mand in the subprocess
+
+        Args:
+            mand: Mandelbrot
+                view and coloring parameters, left unmodified
+            timeout: float
+                largest wait in seconds, None for no limit
+
+        Returns:
+            ndarray(dtype=uint8, ndim=3): image, same as mand.set after
+            update_set, mapped on shared memory: overwritten by the render
+            after next (copy it to keep it), but always safe to read
+
+        Raises:
+            RuntimeError: if the render failed
+            TimeoutError: if it did not finish in time (the process is
+                restarted)
+        """
+        with self._lock:
+            if not self._process.is_alive():
+                self._start()
+            shape = (mand.ypixels, mand.xpixels, 3)
+            shm = self._buffer(int(np.prod(shape)))
+            self._job += 1
+            self._conn.send({
+                'job': self._job,
+                'params': mand.render_params(),
+                'shape': shape,
+                'buffer': shm.name,
+                'live': [b.name for b in self._buffers if b is not None],
+            })
+            if not self._conn.poll(timeout):
+                # Stuck in a kernel: only a new process can take requests
+                self._process.terminate()
+                self._process.join()
+                raise TimeoutError(f"Render not done after {timeout} s")
+            status, job, result = self._conn.recv()
+            if status != 'done':
+                raise RuntimeError(f"Render failed: {result}")
+            self.last_render_time, self.last_stages = result
+            return np.asarray(_SharedImage(shm, shape))
+
+    def close(self):
+        """Stop the render process and release the shared buffers"""
+        with self._lock:
+            if self._process is not None and self._process.is_alive():
+                self._conn.send(None)
+                self._process.join(timeout=5)
+                if self._process.is_alive():
+                    self._process.terminate()
+            self._process = None
+            for shm in self._buffers:
+                if shm is not None:
+                    _release(shm)
+            self._buffers = [None, None]
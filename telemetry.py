@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+"""
+Low-overhead system telemetry: CPU, memory and accelerator usage.
+
+A daemon thread samples the process CPU, the utilization of each core, the
+resident and peak memory and, when an NVIDIA device exists, its utilization
+and memory. Samples are kept in a bounded history. Render events can be
+tracked, to correlate them with the samples taken meanwhile:
+
+  telemetry = TelemetrySampler(interval=0.5)
+  telemetry.start()
+  with telemetry.track('render') as event:
+      mand.update_set()
+  print(telemetry.report(event))
+
+The sampler measures its own cost and lengthens its interval to stay below
+max_overhead (1% of one core by default). NVML is only queried if it finds
+a device at startup.
+"""
+
+import collections
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Optional dependencies with graceful fallbacks
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+try:
+    import pynvml
+    NVIDIA_ML_AVAILABLE = True
+except ImportError:
+    NVIDIA_ML_AVAILABLE = False
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _peak_rss(memory_info):
+    """Peak resident memory of the process in bytes, None if unknown"""
+    peak = getattr(memory_info, 'peak_wset', None)
+    if peak is not None:
+        # Windows
+        return peak
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return None
+
+
+class _Accelerator:
+    """NVML queries of the first NVIDIA device"""
+
+    def __init__(self, handle, name):
+        self.handle = handle
+        self.name = name
+
+    @classmethod
+    def open(cls):
+        """First NVIDIA device, or None (NVML released if there is none)"""
+        if not NVIDIA_ML_AVAILABLE:
+            return None
+        try:
+            pynvml.nvmlInit()
+        except Exception:
+            return None
+        try:
+            if pynvml.nvmlDeviceGetCount() == 0:
+                pynvml.nvmlShutdown()
+                return None
+            handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+            name = pynvml.nvmlDeviceGetName(handle)
+            if isinstance(name, bytes):
+                name = name.decode()
+            return cls(handle, name)
+        except Exception:
+            pynvml.nvmlShutdown()
+            return None
+
+    def sample(self):
+        """Utilization (%), used and total memory (bytes)"""
+        rates = pynvml.nvmlDeviceGetUtilizationRates(self.handle)
+        memory = pynvml.nvmlDeviceGetMemoryInfo(self.handle)
+        return rates.gpu, memory.used, memory.total
+
+    def close(self):
+        pynvml.nvmlShutdown()
+
+
+class TelemetrySampler:
+    """Sample CPU, memory and accelerator usage in a background thread"""
+
+    def __init__(self, interval=0.5, history=600, max_overhead=0.01):
+        """Sampler, started by start()
+
+        Args:
+            interval: float
+                time between samples, in seconds
+            history: int
+                number of samples kept
+            max_overhead: float
+                largest fraction of one core spent sampling: the interval is
+                lengthened if sampling costs more
+        """
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.samples = collections.deque(maxlen=history)
+        self.events = collections.deque(maxlen=history)
+        self.accelerator = None
+        self._process = psutil.Process() if PSUTIL_AVAILABLE else None
+        self._sample_cost = 0.0
+        self._started = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_cpu = None
+
+    def start(self):
+        """Start the sampler thread (no-op if it runs)"""
+        if self._thread is not None:
+            return
+        self.accelerator = _Accelerator.open()
+        self._stop.clear()
+        self._started = time.perf_counter()
+        self._sample_cost = 0.0
+        self._last_cpu = (time.perf_counter(), self._cpu_seconds())
+        if self._process is not None:
+            # First call of cpu_percent: reference for the next ones
+            psutil.cpu_percent(percpu=True)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sampler thread and release NVML"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self.accelerator is not None:
+            self.accelerator.close()
+            self.accelerator = None
+
+    def _cpu_seconds(self):
+        """CPU time of the process (user + system), in seconds"""
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system
+        return time.process_time()
+
+    def _memory(self):
+        """Resident and peak memory in bytes, None if unknown"""
+        if self._process is not None:
+            info = self._process.memory_info()
+            return info.rss, _peak_rss(info)
+        return None, _peak_rss(None)
+
+    def sample(self):
+        """Take one sample now
+
+        Returns:
+            dict: time (perf_counter), cpu (process, % of one core), cores
+            (% per core, or None), rss and peak_rss (bytes, or None), gpu and
+            gpu_memory (% and bytes, or None without device)
+        """
+        now = time.perf_counter()
+        cpu_seconds = self._cpu_seconds()
+        last_time, last_cpu = self._last_cpu
+        self._last_cpu = (now, cpu_seconds)
+        elapsed = now - last_time
+        rss, peak_rss = self._memory()
+        sample = {
+            'time': now,
+            'cpu': 100 * (cpu_seconds - last_cpu) / elapsed if elapsed > 0 else 0.0,
+            'cores': (psutil.cpu_percent(percpu=True)
+                      if self._process is not None else None),
+            'rss': rss,
+            'peak_rss': peak_rss,
+            'gpu': None,
+            'gpu_memory': None,
+        }
+        if self.accelerator is not None:
+            try:
+                sample['gpu'], sample['gpu_memory'], _ = self.accelerator.sample()
+            except Exception:
+                # Device gone: no more NVML calls
+                self.accelerator = None
+        return sample
+
+    def _run(self):
+        """Sampler thread: sample until stopped, within the overhead budget"""
+        while not self._stop.is_set():
+            start = time.thread_time()
+            sample = self.sample()
+            cost = time.thread_time() - start
+            with self._lock:
+                self.samples.append(sample)
+                self._sample_cost += cost
+            self._stop.wait(max(self.interval, cost / self.max_overhead))
+
+    def latest(self):
+        """Last sample, None before the first one"""
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    def overhead(self):
+        """Fraction of one core spent sampling since start"""
+        if self._started is None:
+            return 0.0
+        elapsed = time.perf_counter() - self._started
+        return self._sample_cost / elapsed if elapsed > 0 else 0.0
+
+    def between(self, start, end):
+        """Samples taken from start to end (perf_counter times)"""
+        with self._lock:
+            return [s for s in self.samples if start <= s['time'] <= end]
+
+    @contextmanager
+    def track(self, name, **info):
+        """Record the enclosed block as an event
+
+        Yields:
+            dict: the event, with name, info, start and end times, and CPU
+            seconds and resident memory at start and end
+        """
+        rss, _ = self._memory()
+        event = {'name': name, 'info': info, 'start': time.perf_counter(),
+                 'cpu_start': self._cpu_seconds(), 'rss_start': rss}
+        try:
+            yield event
+        finally:
+            event['end'] = time.perf_counter()
+            event['cpu_end'] = self._cpu_seconds()
+            event['rss_end'], _ = self._memory()
+            with self._lock:
+                self.events.append(event)
+
+    def report(self, event):
+        """Usage during an event
+
+        Returns:
+            dict: seconds, cpu (average process CPU, % of one core),
+            rss_delta (bytes, or None), peak_rss and gpu (peak and average of
+            the samples taken meanwhile, or None)
+        """
+        seconds = event['end'] - event['start']
+        cpu = event['cpu_end'] - event['cpu_start']
+        samples = self.between(event['start'], event['end'])
+        peaks = [s['peak_rss'] for s in samples if s['peak_rss'] is not None]
+        gpu = [s['gpu'] for s in samples if s['gpu'] is not None]
+        rss_delta = (event['rss_end'] - event['rss_start']
+                     if event['rss_start'] is not None else None)
+        return {
+            'name': event['name'],
+            'seconds': seconds,
+            'cpu': 100 * cpu / seconds if seconds > 0 else 0.0,
+            'rss_delta': rss_delta,
+            'peak_rss': max(peaks) if peaks else None,
+            'gpu': sum(gpu) / len(gpu) if gpu else None,
+            'samples': len(samples),
+        }
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+"""
+Export of explorable zooms as multi-level tile pyramids.
+
+The full resolution level is rendered tile by tile in a pool of worker
+processes, each tile written to disk as soon as it is computed. Coarser levels
+are built by downsampling the tiles of the level below, never by rendering
+again. Tiles already on disk are skipped, so an interrupted export resumes
+where it stopped.
+
+  export_pyramid(mand, 'zoom', 65536)   # writes zoom.dzi and zoom_files/
+
+The 'xyz' layout follows the web map scheme of tile_server instead: level 0
+is a single tile covering a square around the view, each level splits the
+tiles of the previous one in four, and every tile is tile_size square. Map
+viewers (e.g. Leaflet) browse it with a 'z/x/y' URL template and maxZoom set
+to the last level.
+"""
+
+import copy
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+# View rendered by the worker processes, set by _init_worker
+_worker_view = None
+
+
+def pyramid_levels(width, height):
+    """Number of levels of a Deep Zoom pyramid, the last one at full size"""
+    return math.ceil(math.log2(max(width, height))) + 1
+
+
+def xyz_levels(width, height, tile_size):
+    """Number of levels of an XYZ pyramid, the last one at least as large as
+    width and height"""
+    return max(0, math.ceil(math.log2(max(width, height) / tile_size))) + 1
+
+
+def level_size(width, height, level, nlevels):
+    """Image size at a level of the pyramid (0 is a single pixel in a Deep
+    Zoom pyramid, a single tile in an XYZ one)"""
+    scale = 2 ** (nlevels - 1 - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def tile_path(root, level, col, row, layout='dzi', fmt='png'):
+    """File of a tile
+
+    Args:
+        root: str
+            DZI: the '<name>_files' directory; XYZ: the pyramid directory
+        level: int
+            pyramid level
+        col, row: int
+            tile column and row, from the top-left corner
+        layout: str
+            'dzi' for <level>/<col>_<row>, 'xyz' for <level>/<col>/<row>
+        fmt: str
+            image format extension
+
+    Returns:
+        str: path of the tile file
+    """
+    if layout == 'xyz':
+        return os.path.join(root, str(level), str(col), f"{row}.{fmt}")
+    return os.path.join(root, str(level), f"{col}_{row}.{fmt}")
+
+
+def _save_tile(image, path):
+    """Write a tile atomically, so a partial file is never taken as done"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.part'
+    image.save(tmp_path, format=Image.registered_extensions()[
+        os.path.splitext(path)[1].lower()])
+    os.replace(tmp_path, path)
+
+
+def _init_worker(view):
+    """Worker process initialization: keep the view to render"""
+    global _worker_view
+    _worker_view = view
+
+
+def _render_tile(x0, y0, x1, y1, path):
+    """Worker process job: render a full resolution tile to a file"""
+    tile = _worker_view.compute_tile(x0, y0, x1, y1)
+    _save_tile(Image.fromarray(tile, 'RGB'), path)
+    return path
+
+
+def _downsample_tile(root, level, col, row, nlevels, width, height, tile_size,
+                     layout, fmt):
+    """Build a tile from the (up to) four tiles of the level below"""
+    child_w, child_h = level_size(width, height, level + 1, nlevels)
+    # Area of the children in the level below, clipped to the image
+    x0, y0 = 2*col*tile_size, 2*row*tile_size
+    x1 = min(x0 + 2*tile_size, child_w)
+    y1 = min(y0 + 2*tile_size, child_h)
+    block = Image.new('RGB', (x1 - x0, y1 - y0))
+    for dy in range(2):
+        for dx in range(2):
+            ccol, crow = 2*col + dx, 2*row + dy
+            if ccol*tile_size >= child_w or crow*tile_size >= child_h:
+                continue
+            with Image.open(tile_path(root, level + 1, ccol, crow, layout,
+                                      fmt)) as child:
+                block.paste(child, (dx*tile_size, dy*tile_size))
+    size = (math.ceil(block.width / 2), math.ceil(block.height / 2))
+    return block.resize(size, Image.BOX)
+
+
+def export_pyramid(mand, name, width, height=None, tile_size=256,
+                   oversampling=None, layout='dzi', fmt='png', workers=None,
+                   progress=None):
+    """Write a multi-level tile pyramid of the view of mand
+
+    Args:
+        mand: Mandelbrot
+            view and coloring parameters, left unmodified
+        name: str
+            DZI: files <name>.dzi and <name>_files/; XYZ: directory <name>/
+        width: int
+            full resolution width, in pixels. XYZ: rounded up to the smallest
+            square of tile_size * 2**level pixels around the view, see
+            xyz_levels
+        height: int
+            full resolution height, defaults to the aspect ratio of the view
+        tile_size: int
+            tile width and height, in pixels (no overlap)
+        oversampling: int
+            oversampling of the full resolution level, defaults to the one
+            of mand
+        layout: str
+            'dzi' (Deep Zoom Image) or 'xyz' (web map tiles,
+            <level>/<col>/<row> files)
+        fmt: str
+            tile format: 'png' or 'jpg'
+        workers: int
+            number of render processes, defaults to the number of CPUs
+        progress: function
+            called as progress(tiles_done, tiles_total) after each tile
+
+    Returns:
+        dict: full resolution size, number of levels, and tiles rendered,
+        downsampled and skipped (already on disk)
+    """
+    if height is None:
+        height = round(width / (mand.coord[1]-mand.coord[0]) *
+                       (mand.coord[3]-mand.coord[2]))
+    view = copy.copy(mand)
+    view.xpixels, view.ypixels = int(width), int(height)
+    if oversampling is not None:
+        view.os = int(oversampling)
+    # Tiles are top row first
+    view.origin = 'upper'
+    # The image is not needed by the workers
+    view.set = None
+    view.explorer = None
+
+    if layout == 'xyz':
+        # Square world around the view, as tile_server, with the shading of
+        # the view
+        view.diag = mand.frame_diag()
+        xc = (mand.coord[0] + mand.coord[1]) / 2
+        yc = (mand.coord[2] + mand.coord[3]) / 2
+        side = max(mand.coord[1] - mand.coord[0], mand.coord[3] - mand.coord[2])
+        view.coord = [xc - side/2, xc + side/2, yc - side/2, yc + side/2]
+        nlevels = xyz_levels(width, height, tile_size)
+        width = height = tile_size * 2**(nlevels - 1)
+        view.xpixels = view.ypixels = width
+        root = name
+    else:
+        nlevels = pyramid_levels(width, height)
+        root = name + '_files'
+
+    def tiles_of(level):
+        level_w, level_h = level_size(width, height, level, nlevels)
+        return [(col, row)
+                for row in range(math.ceil(level_h / tile_size))
+                for col in range(math.ceil(level_w / tile_size))]
+
+    total = sum(len(tiles_of(level)) for level in range(nlevels))
+    stats = {'width': width, 'height': height, 'levels': nlevels,
+             'rendered': 0, 'downsampled': 0, 'skipped': 0}
+
+    def done():
+        if progress is not None:
+            progress(stats['rendered'] + stats['downsampled'] +
+                     stats['skipped'], total)
+
+    # Full resolution level: render missing tiles in parallel
+    top = nlevels - 1
+    jobs = []
+    for col, row in tiles_of(top):
+        path = tile_path(root, top, col, row, layout, fmt)
+        if os.path.exists(path):
+            stats['skipped'] += 1
+            continue
+        x0, y0 = col*tile_size, row*tile_size
+        jobs.append((x0, y0, min(x0 + tile_size, width),
+                     min(y0 + tile_size, height), path))
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(view,)) as pool:
+            futures = [pool.submit(_render_tile, *job) for job in jobs]
+            for future in futures:
+                future.result()
+                stats['rendered'] += 1
+                done()
+
+    # Coarser levels: downsample the level below, one tile at a time
+    for level in range(top - 1, -1, -1):
+        for col, row in tiles_of(level):
+            path = tile_path(root, level, col, row, layout, fmt)
+            if os.path.exists(path):
+                stats['skipped'] += 1
+            else:
+                tile = _downsample_tile(root, level, col, row, nlevels, width,
+                                        height, tile_size, layout, fmt)
+                _save_tile(tile, path)
+                stats['downsampled'] += 1
+            done()
+
+    if layout == 'dzi':
+        with open(name + '.dzi', 'w') as dzi:
+            dzi.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+                f'Format="{fmt}" Overlap="0" TileSize="{tile_size}">\n'
+                f'  <Size Width="{width}" Height="{height}"/>\n'
+                '</Image>\n')
+    return stats
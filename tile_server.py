@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio HTTP server of map tiles of the Mandelbrot set.
+
+Tiles follow the usual web map scheme: level 0 is a single tile covering a
+square around the base view, and each level splits the tiles of the previous
+one in four. They are served as /{level}/{x}/{y}.png, x from the left and y
+from the top, so that map viewers (e.g. Leaflet) can browse them.
+
+Kernels run in a pool of worker processes, the event loop only parses
+requests and sends bytes. Concurrent requests of the same tile share one
+render, and rendered tiles are kept in an LRU cache. Request latency, cache
+hits and the number of renders in flight are served as JSON at /metrics.
+
+  python tile_server.py --port 8000
+  curl http://127.0.0.1:8000/3/4/2.png -o tile.png
+"""
+
+import argparse
+import asyncio
+import collections
+import copy
+import functools
+import io
+import json
+import math
+import multiprocessing
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from mandelbrot import Mandelbrot
+
+TILE_PATH = re.compile(r'^/(\d+)/(\d+)/(\d+)\.png$')
+
+# Base view of the worker processes, set by _init_worker
+_worker_base = None
+
+
+def tile_view(base, level, x, y, tile_size=256, level_iterations=200,
+              viewport_tiles=4):
+    """View of a tile
+
+    Args:
+        base: Mandelbrot
+            base view, whose center and largest side define level 0
+        level, x, y: int
+            tile level and position, y from the top
+        tile_size: int
+            tile width and height, in pixels
+        level_iterations: int
+            iterations added to base.maxiter at each level
+        viewport_tiles: float
+            width, in tiles, of the viewport whose diagonal normalizes the
+            distance estimate: the same for every tile of a level, so that
+            the shading has no seams
+
+    Returns:
+        Mandelbrot: view of the tile, set not computed
+    """
+    xc = (base.coord[0] + base.coord[1]) / 2
+    yc = (base.coord[2] + base.coord[3]) / 2
+    side = max(base.coord[1] - base.coord[0], base.coord[3] - base.coord[2])
+    size = side / 2**level
+    xmin = xc - side/2 + x*size
+    ymax = yc + side/2 - y*size
+    view = copy.copy(base)
+    view.explorer = None
+    view.set = None
+    view.coord = [xmin, xmin + size, ymax - size, ymax]
+    view.xpixels = view.ypixels = tile_size
+    view.maxiter = base.maxiter + level*level_iterations
+    view.origin = 'upper'
+    view.diag = viewport_tiles * size * math.sqrt(2)
+    return view
+
+
+def _init_worker(base):
+    """Worker process initialization: keep the base view, compile kernels"""
+    global _worker_base
+    _worker_base = base
+    Mandelbrot(xpixels=8, maxiter=10, oversampling=1, gpu=base.gpu,
+               compute=False).update_set()
+
+
+def _render_tile(level, x, y, tile_size, level_iterations):
+    """Worker process job: render a tile, encoded as PNG"""
+    view = tile_view(_worker_base, level, x, y, tile_size, level_iterations)
+    view.update_set()
+    data = io.BytesIO()
+    Image.fromarray(view.set, 'RGB').save(data, format='PNG')
+    return data.getvalue()
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of a list of values, None if empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+class TileServer:
+    """Serve tiles of a view over HTTP"""
+
+    def __init__(self, mand, host='127.0.0.1', port=8000, tile_size=256,
+                 workers=None, cache_entries=1024, level_iterations=200,
+                 max_level=40, latency_window=1000):
+        """Serve tiles of a view over HTTP
+
+        Args:
+            mand: Mandelbrot
+                base view and coloring parameters
+            host: str
+                listening address, loopback by default
+            port: int
+                listening port, 0 for any free port
+            tile_size: int
+                tile width and height, in pixels
+            workers: int
+                number of render processes, defaults to the number of CPUs
+            cache_entries: int
+                number of encoded tiles kept in memory
+            level_iterations: int
+                iterations added to mand.maxiter at each level
+            max_level: int
+                deepest level served (float64 precision ends around 45)
+            latency_window: int
+                number of last requests in the latency percentiles
+        """
+        self.base = copy.copy(mand)
+        self.base.explorer = None
+        self.base.set = None
+        self.host = host
+        self.port = port
+        self.tile_size = tile_size
+        self.workers = workers
+        self.cache_entries = cache_entries
+        self.level_iterations = level_iterations
+        self.max_level = max_level
+        self._cache = collections.OrderedDict()
+        self._in_flight = {}
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._render_times = collections.deque(maxlen=latency_window)
+        self.counters = {'requests': 0, 'tiles': 0, 'cache_hits': 0,
+                         'coalesced': 0, 'renders': 0, 'errors': 0}
+        self._pool = None
+        self._server = None
+
+    async def start(self):
+        """Start the render pool and listen; self.port is the actual port"""
+        # Spawned, not forked: forking from the running event loop can
+        # deadlock the workers
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.base,))
+        self._server = await asyncio.start_server(self._handle, self.host,
+                                                  self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Start if needed and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop listening and shut the render pool down"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._pool is not None:
+            # Waits for the renders in progress without blocking the loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self._pool.shutdown,
+                                        cancel_futures=True))
+
+    async def get_tile(self, level, x, y):
+        """PNG bytes of a tile, from the cache, a render in flight or a new
+        render"""
+        key = (level, x, y)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return self._cache[key]
+        if key in self._in_flight:
+            # Same tile already being rendered: wait for it
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self._in_flight[key])
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._in_flight[key] = future
+        start = time.perf_counter()
+        try:
+            self.counters['renders'] += 1
+            data = await loop.run_in_executor(
+                self._pool, _render_tile, level, x, y, self.tile_size,
+                self.level_iterations)
+        except Exception as exc:
+            future.set_exception(exc)
+            # Retrieved here, so waiters-less failures are not logged
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled (e.g. at shutdown): so are the coalesced requests,
+            # rather than waiting forever
+            future.cancel()
+            raise
+        finally:
+            del self._in_flight[key]
+        self._render_times.append(time.perf_counter() - start)
+        future.set_result(data)
+        self._cache[key] = data
+        if len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return data
+
+    def metrics(self):
+        """Counters, cache and queue sizes, and latencies in milliseconds"""
+        latencies = list(self._latencies)
+        renders = list(self._render_times)
+
+        def ms(value):
+            return None if value is None else round(value * 1000, 3)
+
+        metrics = dict(self.counters)
+        metrics.update({
+            'queue_depth': len(self._in_flight),
+            'cache_entries': len(self._cache),
+            'latency_ms': {f'p{q}': ms(percentile(latencies, q))
+                           for q in (50, 90, 99)},
+            'render_ms': {f'p{q}': ms(percentile(renders, q))
+                          for q in (50, 90, 99)},
+        })
+        return metrics
+
+    async def _respond(self, writer, status, body, content_type):
+        """Write an HTTP response and close the connection"""
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                   405: 'Method Not Allowed', 500: 'Internal Server Error'}
+        header = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Content-Length: {len(body)}\r\n"
+                  "Access-Control-Allow-Origin: *\r\n"
+                  "Connection: close\r\n\r\n")
+        writer.write(header.encode() + body)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        """Serve one HTTP request"""
+        start = time.perf_counter()
+        self.counters['requests'] += 1
+        try:
+            request = await reader.readline()
+            # Skip the headers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) < 2:
+                await self._respond(writer, 400, b"Bad request\n",
+                                    'text/plain')
+                return
+            method, path = parts[0], parts[1].split('?')[0]
+            if method != 'GET':
+                await self._respond(writer, 405, b"GET only\n", 'text/plain')
+                return
+            if path == '/metrics':
+                body = json.dumps(self.metrics(), indent=1).encode()
+                await self._respond(writer, 200, body, 'application/json')
+                return
+            match = TILE_PATH.match(path)
+            if match is None:
+                await self._respond(writer, 404, b"Not found\n", 'text/plain')
+                return
+            level, x, y = (int(v) for v in match.groups())
+            if level > self.max_level or x >= 2**level or y >= 2**level:
+                await self._respond(writer, 400, b"Tile out of range\n",
+                                    'text/plain')
+                return
+            self.counters['tiles'] += 1
+            try:
+                data = await self.get_tile(level, x, y)
+            except Exception as exc:
+                self.counters['errors'] += 1
+                await self._respond(writer, 500, f"{exc}\n".encode(),
+                                    'text/plain')
+                return
+            await self._respond(writer, 200, data, 'image/png')
+            self._latencies.append(time.perf_counter() - start)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mandelbrot tile server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of render processes")
+    parser.add_argument('--tile-size', type=int, default=256)
+    parser.add_argument('--maxiter', type=int, default=500,
+                        help="iterations at level 0")
+    parser.add_argument('--level-iterations', type=int, default=200,
+                        help="iterations added at each level")
+    parser.add_argument('--oversampling', type=int, default=1)
+    parser.add_argument('--gpu', action='store_true',
+                        help="compute on GPU with CUDA")
+    args = parser.parse_args(argv)
+
+    mand = Mandelbrot(maxiter=args.maxiter, oversampling=args.oversampling,
+                      gpu=args.gpu, compute=False)
+    server = TileServer(mand, args.host, args.port, args.tile_size,
+                        args.workers, level_iterations=args.level_iterations)
+
+    async def run():
+        await server.start()
+        print(f"Serving tiles on http://{server.host}:{server.port}"
+              "/{level}/{x}/{y}.png", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()